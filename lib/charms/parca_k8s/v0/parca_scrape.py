@@ -158,23 +158,83 @@ replace the current list of jobs with the list provided by `jobs()` as follows
             parca_scrape_config.append(job)
         ...
 
+The jobs of each relation are only generated once per dispatch, however many times they are
+fetched, and each call returns its own copy of them. Since the `TargetsChangedEvent` carries the
+ID of the relation that changed, a Parca charm may also update its configuration incrementally,
+by only replacing the jobs of that relation with the ones returned by
+`relation_jobs(event.relation_id)`.
+
+Parca charms with many related providers can avoid holding all jobs in memory at once, with
+`iter_jobs()`, which yields the jobs one relation at a time, or with `write_jobs()`, which streams
+them straight into a file-like object as the items of a YAML list
+
+    with open(PARCA_CONFIG_PATH, "w") as config:
+        print("scrape_configs:", file=config)
+        self.profiling_consumer.write_jobs(config)
+
 ## Relation Data
 
 Units of profiles provider charms advertise their names and addresses over unit relation data using
 the `parca_scrape_unit_name` and `parca_scrape_unit_address` keys. While the `scrape_metadata`,
 `scrape_jobs` and `alert_rules` keys in application relation data of profiles provider charms hold
-eponymous information.
+eponymous information. The leader of a profiling provider charm only writes application relation
+data when the canonical (sorted-key) serialization of those keys differs from what it last
+published to that relation, so that consumers only see `relation-changed` when the jobs change.
+The `publish_stats` attribute of `ProfilingEndpointProvider` holds the time it spent publishing,
+the number of relations it wrote to and the number of bytes it wrote during the current dispatch.
+Since resolving its own address may block when DNS is slow, each unit only resolves it once per
+dispatch, reuses it across dispatches for `UNIT_ADDRESS_TTL` seconds, and only writes it to unit
+relation data when it changes.
+
+Providers with large scrape jobs may opt into publishing them compressed, by instantiating
+`ProfilingEndpointProvider` with `compress_scrape_jobs=True`. The jobs are then published as the
+base64 encoding of the zlib-compressed JSON jobs under the `scrape_jobs_zlib_v1` key, instead of
+under `scrape_jobs`. `ProfilingEndpointConsumer` decodes either key transparently, but consumers
+using an older version of this library only understand `scrape_jobs`.
+
+Likewise, providers whose jobs share large CA certificates may opt into publishing each distinct
+CA certificate only once, by instantiating `ProfilingEndpointProvider` with
+`deduplicate_tls_ca=True`. The certificates are then published under the `tls_ca_certs` key as a
+JSON mapping of the SHA-256 digest of each certificate to the certificate itself, and the
+`tls_config` of each job holds a `ca_ref` digest instead of the `ca` certificate.
+`ProfilingEndpointConsumer.jobs()` resolves these references back into `ca` certificates.
+
+Units of scaled-out providers may also publish scrape jobs of their own, for instance each a
+different slice of the same targets, by instantiating `ProfilingEndpointProvider` with
+`unit_jobs`. Each unit then publishes its jobs in its unit relation data, under the same
+`scrape_jobs` or `scrape_jobs_zlib_v1` key as the application jobs, and only writes them when
+they change. The consumer names the jobs of each unit after that unit, and the wildcard targets
+of those jobs only stand for that unit. Parca charms with several replicas may divide the
+scrape work between them by provider unit, by passing a `unit_filter` predicate on the names of
+the provider units to `jobs()`, `iter_jobs()`, `relation_jobs()` or `write_jobs()`, e.g.
+
+    replica, replicas = int(self.unit.name.split("/")[1]), self.app.planned_units()
+    jobs = self.profiling_consumer.jobs(
+        unit_filter=lambda unit: zlib.crc32(unit.encode()) % replicas == replica
+    )
+
+The jobs published by the provider applications are kept by every replica.
+
+Providers related to several Parca applications may publish different jobs to each of them, by
+instantiating `ProfilingEndpointProvider` with `relation_jobs`, a mapping of relation IDs to the
+jobs published to those relations instead of `jobs`. The leader only serializes each distinct
+list of jobs once, and still only writes to the relations whose data changed.
 
 """  # noqa: W505
 
+import base64
+import copy
+import functools
+import hashlib
 import ipaddress
 import json
 import logging
 import socket
-from typing import List, Optional, Union, cast
+import time
+import zlib
+from typing import Callable, Dict, Iterator, List, Optional, TextIO, Tuple, Union, cast
 
 import ops
-from cosl import JujuTopology
 from ops.model import Relation
 
 # The unique Charmhub library identifier, never change it
@@ -185,7 +245,7 @@ LIBAPI = 0
 
 # Increment this PATCH version before using `charmcraft publish-lib` or reset
 # to 0 if you are raising the major API version
-LIBPATCH = 6
+LIBPATCH = 22
 
 
 logger = logging.getLogger(__name__)
@@ -202,6 +262,12 @@ ALLOWED_KEYS = {
 }
 DEFAULT_JOB = {"static_configs": [{"targets": ["*:80"]}]}
 DEFAULT_RELATION_NAME = "profiling-endpoint"
+# relation data key holding scrape jobs in the compressed encoding, see `_encode_scrape_jobs`
+COMPRESSED_SCRAPE_JOBS_KEY = "scrape_jobs_zlib_v1"
+# relation data key holding the CA certificates referenced by scrape jobs, see `_extract_tls_cas`
+TLS_CA_CERTS_KEY = "tls_ca_certs"
+# how long the resolved address of a unit is reused for, across dispatches, in seconds
+UNIT_ADDRESS_TTL = 300
 RELATION_INTERFACE_NAME = "parca_scrape"
 
 
@@ -310,6 +376,71 @@ def _validate_relation_by_interface_and_direction(
         raise Exception("Unexpected RelationDirection: {}".format(expected_relation_role))
 
 
+def _canonical_json(obj) -> str:
+    """Serialize an object to JSON deterministically.
+
+    Keys are sorted so that equal payloads always produce identical strings, which makes the
+    serialized form suitable for change detection.
+    """
+    return json.dumps(obj, sort_keys=True)
+
+
+def _encode_scrape_jobs(scrape_jobs: str) -> str:
+    """Compress serialized scrape jobs into a string that can be stored in relation data."""
+    return base64.b64encode(zlib.compress(scrape_jobs.encode("utf-8"), 9)).decode("ascii")
+
+
+def _decode_scrape_jobs(encoded_scrape_jobs: str) -> str:
+    """Decompress scrape jobs encoded by `_encode_scrape_jobs` back into their JSON form."""
+    return zlib.decompress(base64.b64decode(encoded_scrape_jobs)).decode("utf-8")
+
+
+def _load_scrape_jobs(app_data) -> list:
+    """Load the scrape jobs from application relation data, in whichever encoding they are."""
+    if encoded_scrape_jobs := app_data.get(COMPRESSED_SCRAPE_JOBS_KEY):
+        try:
+            return json.loads(_decode_scrape_jobs(encoded_scrape_jobs))
+        except (ValueError, zlib.error) as e:
+            logger.error("Failed to decode compressed scrape jobs: %s", e)
+            return []
+    return json.loads(app_data.get("scrape_jobs", "[]"))
+
+
+def _extract_tls_cas(jobs: list) -> Tuple[list, dict]:
+    """Replace the CA certificates inlined in scrape jobs with references to them.
+
+    Returns:
+        A copy of the jobs whose `tls_config` holds a `ca_ref` digest instead of a `ca`
+        certificate, and a mapping of those digests to the certificates.
+    """
+    tls_cas = {}
+    digests = {}
+    extracted_jobs = []
+    for job in jobs:
+        tls_config = job.get("tls_config") or {}
+        if ca := tls_config.get("ca"):
+            if (digest := digests.get(ca)) is None:
+                digest = digests[ca] = hashlib.sha256(ca.encode("utf-8")).hexdigest()
+                tls_cas[digest] = ca
+            tls_config = {key: value for key, value in tls_config.items() if key != "ca"}
+            tls_config["ca_ref"] = digest
+            job = {**job, "tls_config": tls_config}
+        extracted_jobs.append(job)
+    return extracted_jobs, tls_cas
+
+
+def _resolve_tls_cas(jobs: list, tls_cas: dict) -> None:
+    """Replace, in place, the CA certificate references of scrape jobs with the certificates."""
+    for job in jobs:
+        tls_config = job.get("tls_config") or {}
+        if (digest := tls_config.pop("ca_ref", None)) is None:
+            continue
+        if ca := tls_cas.get(digest):
+            tls_config["ca"] = ca
+        else:
+            logger.error("Scrape job references an unknown CA certificate: %s", digest)
+
+
 def _sanitize_scrape_configuration(job) -> dict:
     """Restrict permissible scrape configuration options.
 
@@ -330,19 +461,46 @@ def _sanitize_scrape_configuration(job) -> dict:
     return sanitized_job
 
 
-class ProviderTopology(JujuTopology):
-    """Class for initializing topology information for ProfilingEndpointProvider."""
+def _sanitize_relation_jobs(relation_jobs: Optional[Dict[int, list]]) -> Dict[int, list]:
+    """Restrict the scrape configuration options of the jobs of specific relations."""
+    return {
+        relation_id: [_sanitize_scrape_configuration(job) for job in jobs]
+        for relation_id, jobs in (relation_jobs or {}).items()
+    }
 
-    @property
-    def scrape_identifier(self):
-        """Format the topology information into a scrape identifier."""
-        # This is used only by Profiling[Consumer|Provider] and does not need a
-        # unit name, so only check for the charm name
-        return "juju_{}_parca_scrape".format(self.identifier)
+
+@functools.lru_cache(maxsize=None)
+def _provider_topology_class():
+    """Define `ProviderTopology` on first use, since importing cosl is slow."""
+    from cosl import JujuTopology
+
+    class ProviderTopology(JujuTopology):
+        """Class for initializing topology information for ProfilingEndpointProvider."""
+
+        @property
+        def scrape_identifier(self):
+            """Format the topology information into a scrape identifier."""
+            # This is used only by Profiling[Consumer|Provider] and does not need a
+            # unit name, so only check for the charm name
+            return "juju_{}_parca_scrape".format(self.identifier)
+
+    ProviderTopology.__qualname__ = ProviderTopology.__name__
+    ProviderTopology.__module__ = __name__
+    return ProviderTopology
+
+
+def __getattr__(name):
+    """Lazily define the module attributes that depend on slow imports."""
+    if name == "ProviderTopology":
+        return _provider_topology_class()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 class TargetsChangedEvent(ops.EventBase):
-    """Event emitted when Parca scrape targets change."""
+    """Event emitted when Parca scrape targets change.
+
+    The `relation_id` attribute holds the ID of the relation whose scrape targets changed.
+    """
 
     def __init__(self, handle, relation_id):
         super().__init__(handle)
@@ -367,6 +525,7 @@ class ProfilingEndpointConsumer(ops.Object):
     """Parca based monitoring service."""
 
     on = MonitoringEvents()  # type: ignore
+    _stored = ops.StoredState()
 
     def __init__(self, charm: ops.CharmBase, relation_name: str = DEFAULT_RELATION_NAME):
         """Construct a Parca based monitoring service.
@@ -393,6 +552,14 @@ class ProfilingEndpointConsumer(ops.Object):
         super().__init__(charm, relation_name)
         self._charm = charm
         self._relation_name = relation_name
+        # jobs cached across dispatches by earlier versions of this library, which are cleared
+        # so that they no longer take up room in the stored state
+        self._stored.set_default(jobs_cache={})
+        if self._stored.jobs_cache:
+            self._stored.jobs_cache = {}
+        # maps relation IDs to the jobs of the application and of each unit, as generated during
+        # this dispatch, since relation data does not change within a dispatch
+        self._jobs_cache: Dict[int, Tuple[list, dict]] = {}
         events = self._charm.on[relation_name]
         self.framework.observe(
             events.relation_changed, self.on_profiling_provider_relation_changed
@@ -428,63 +595,171 @@ class ProfilingEndpointConsumer(ops.Object):
         rel_id = event.relation.id
         self.on.targets_changed.emit(relation_id=rel_id)
 
-    def jobs(self) -> list:
+    def jobs(self, unit_filter: Optional[Callable[[str], bool]] = None) -> list:
         """Fetch the list of scrape jobs.
 
+        Args:
+            unit_filter: an optional predicate on the names of the provider units, which only
+                keeps the jobs published by the units it holds true for. The jobs published by
+                the provider applications are always kept.
+
         Returns:
             A list consisting of all the static scrape configurations for each related
             `ProfilingEndpointProvider` that has specified its scrape targets.
         """
-        scrape_jobs = []
+        return list(self.iter_jobs(unit_filter))
+
+    def iter_jobs(self, unit_filter: Optional[Callable[[str], bool]] = None) -> Iterator[dict]:
+        """Lazily generate the scrape jobs, one relation at a time.
+
+        Args:
+            unit_filter: an optional predicate on the names of the provider units, which only
+                keeps the jobs published by the units it holds true for.
 
+        Yields:
+            The static scrape configurations of each related `ProfilingEndpointProvider` that
+            has specified its scrape targets.
+        """
+        for job in self._iter_cached_jobs(unit_filter):
+            yield copy.deepcopy(job)
+
+    def _iter_cached_jobs(self, unit_filter: Optional[Callable[[str], bool]]) -> Iterator[dict]:
+        """Lazily generate the scrape jobs, without copying them out of the cache."""
+        for relation in self._charm.model.relations[self._relation_name]:
+            yield from self._cached_static_scrape_config(relation, unit_filter)
+
+    def write_jobs(
+        self, stream: TextIO, unit_filter: Optional[Callable[[str], bool]] = None
+    ) -> int:
+        """Stream the scrape jobs into a file-like object, as the items of a YAML list.
+
+        Jobs are serialized one at a time, as they are generated by `iter_jobs()`. Nothing is
+        written if there are no jobs.
+
+        Args:
+            stream: a text file-like object to write the jobs to.
+            unit_filter: an optional predicate on the names of the provider units, which only
+                keeps the jobs published by the units it holds true for.
+
+        Returns:
+            The number of jobs written.
+        """
+        import yaml
+
+        count = 0
+        # the jobs are only read, so they are not copied
+        for job in self._iter_cached_jobs(unit_filter):
+            yaml.safe_dump([job], stream, default_flow_style=False)
+            count += 1
+        return count
+
+    def relation_jobs(
+        self, relation_id: int, unit_filter: Optional[Callable[[str], bool]] = None
+    ) -> list:
+        """Fetch the list of scrape jobs of a single relation.
+
+        Args:
+            relation_id: the ID of the relation, e.g. as carried by a `TargetsChangedEvent`.
+            unit_filter: an optional predicate on the names of the provider units, which only
+                keeps the jobs published by the units it holds true for.
+
+        Returns:
+            A list consisting of all the static scrape configurations of the
+            `ProfilingEndpointProvider` on the other side of the relation, which is empty if the
+            relation does not exist (anymore).
+        """
         for relation in self._charm.model.relations[self._relation_name]:
-            static_scrape_jobs = self._static_scrape_config(relation)
-            if static_scrape_jobs:
-                scrape_jobs.extend(static_scrape_jobs)
+            if relation.id == relation_id:
+                return copy.deepcopy(self._cached_static_scrape_config(relation, unit_filter))
+        return []
+
+    def _cached_static_scrape_config(
+        self, relation, unit_filter: Optional[Callable[[str], bool]] = None
+    ) -> list:
+        """Get the static scrape configuration of a relation, only generating it if needed.
 
-        return scrape_jobs
+        The configuration is cached in memory for the rest of the dispatch. The returned jobs
+        are those of the cache, so they must be copied before being handed out.
+        """
+        if (cached := self._jobs_cache.get(relation.id)) is None:
+            cached = self._jobs_cache[relation.id] = self._static_scrape_config(relation)
+        scrape_jobs, unit_scrape_jobs = cached
 
-    def _static_scrape_config(self, relation) -> list:
+        if not unit_scrape_jobs:
+            return scrape_jobs
+        return scrape_jobs + [
+            job
+            for unit_name, jobs in unit_scrape_jobs.items()
+            if unit_filter is None or unit_filter(unit_name)
+            for job in jobs
+        ]
+
+    def _static_scrape_config(self, relation) -> Tuple[list, dict]:
         """Generate the static scrape configuration for a single relation.
 
         If the relation data includes `scrape_metadata` then the value of this key is used to
-        annotate the scrape jobs with Juju Topology labels before returning them.
+        annotate the scrape jobs with Juju Topology labels before returning them. The jobs
+        published by each unit are named after that unit, and their wildcard targets only
+        stand for that unit.
 
         Args:
             relation: an `ops.model.Relation` object whose static scrape configuration is required.
 
         Returns:
-            A list (possibly empty) of scrape jobs. Each job is a valid Parca scrape configuration
-            for that job, represented as a Python dictionary.
+            A list (possibly empty) of the scrape jobs published by the application, and a
+            mapping of unit names to the scrape jobs published by each unit. Each job is a valid
+            Parca scrape configuration for that job, represented as a Python dictionary.
         """
         if not relation.units:
-            return []
+            return [], {}
+
+        app_data = relation.data[relation.app]
+        scrape_jobs = _load_scrape_jobs(app_data)
+        unit_scrape_jobs = {
+            relation.data[unit].get("parca_scrape_unit_name") or unit.name: jobs
+            for unit in relation.units
+            if (jobs := _load_scrape_jobs(relation.data[unit]))
+        }
 
-        scrape_jobs = json.loads(relation.data[relation.app].get("scrape_jobs", "[]"))
+        if not (scrape_jobs or unit_scrape_jobs):
+            return [], {}
 
-        if not scrape_jobs:
-            return []
+        if tls_cas := app_data.get(TLS_CA_CERTS_KEY):
+            for jobs in (scrape_jobs, *unit_scrape_jobs.values()):
+                _resolve_tls_cas(jobs, json.loads(tls_cas))
 
-        scrape_metadata = json.loads(relation.data[relation.app].get("scrape_metadata", "{}"))
+        scrape_metadata = json.loads(app_data.get("scrape_metadata", "{}"))
 
         if not scrape_metadata:
-            return scrape_jobs
+            return scrape_jobs, unit_scrape_jobs
 
-        job_name_prefix = JujuTopology.from_dict(scrape_metadata).identifier
+        # the topology is the same for all jobs of the relation, so only build it once
+        topology = _provider_topology_class().from_dict(scrape_metadata)
+        job_name_prefix = topology.identifier
+        topology_labels = topology.label_matcher_dict
 
         hosts = self._relation_hosts(relation)
 
-        labeled_job_configs = []
-        for job in scrape_jobs:
-            config = self._labeled_static_job_config(
-                _sanitize_scrape_configuration(job),
-                job_name_prefix,
-                hosts,
-                scrape_metadata,
+        labeled_job_configs = [
+            self._labeled_static_job_config(
+                _sanitize_scrape_configuration(job), job_name_prefix, hosts, topology_labels
             )
-            labeled_job_configs.append(config)
+            for job in scrape_jobs
+        ]
+        labeled_unit_job_configs = {
+            unit_name: [
+                self._labeled_static_job_config(
+                    _sanitize_scrape_configuration(job),
+                    "{}_{}".format(job_name_prefix, unit_name.replace("/", "_")),
+                    {unit_name: hosts[unit_name]} if unit_name in hosts else {},
+                    topology_labels,
+                )
+                for job in jobs
+            ]
+            for unit_name, jobs in unit_scrape_jobs.items()
+        }
 
-        return labeled_job_configs
+        return labeled_job_configs, labeled_unit_job_configs
 
     def _relation_hosts(self, relation) -> dict:
         """Fetch unit names and address of all profiling provider units for a single relation.
@@ -509,7 +784,7 @@ class ProfilingEndpointConsumer(ops.Object):
 
         return hosts
 
-    def _labeled_static_job_config(self, job, job_name_prefix, hosts, scrape_metadata) -> dict:
+    def _labeled_static_job_config(self, job, job_name_prefix, hosts, topology_labels) -> dict:
         """Construct labeled job configuration for a single job.
 
         Args:
@@ -520,9 +795,9 @@ class ProfilingEndpointConsumer(ops.Object):
                 the job if it does have a job name.
             hosts: a dictionary mapping host names to host address for
                 all units of the relation for which this job configuration must be constructed.
-            scrape_metadata: scrape configuration metadata obtained
-                from `ProfilingEndpointProvider` from the same relation for
-                which this job configuration is being constructed.
+            topology_labels: Juju topology labels, with the exception of unit name, of the
+                `ProfilingEndpointProvider` from the same relation for which this job
+                configuration is being constructed.
 
         Returns:
             A dictionary representing a Parca job configuration for a single job.
@@ -533,8 +808,9 @@ class ProfilingEndpointConsumer(ops.Object):
         labeled_job = job.copy()
         labeled_job["job_name"] = job_name
 
-        static_configs = job.get("static_configs")
-        labeled_job["static_configs"] = []
+        static_configs = job.get("static_configs") or []
+        labeled_static_configs = []
+        has_unit_labels = False
 
         # relabel instance labels so that instance identifiers are globally unique
         # stable over unit recreation
@@ -548,7 +824,8 @@ class ProfilingEndpointConsumer(ops.Object):
         # label all static configs in the Parca job labeling inserts Juju topology information and
         # sets a relable config for instance labels
         for static_config in static_configs:
-            labels = static_config.get("labels", {}) if static_configs else {}
+            # the labels of the unitless targets are shared by the labels of each unit
+            juju_labels = self._set_juju_labels(static_config.get("labels", {}), topology_labels)
             all_targets = static_config.get("targets", [])
 
             # split all targets into those which will have unit labels and those which will not
@@ -563,67 +840,39 @@ class ProfilingEndpointConsumer(ops.Object):
 
             # label scrape targets that do not have unit labels
             if unitless_targets:
-                unitless_config = self._labeled_unitless_config(
-                    unitless_targets, labels, scrape_metadata
-                )
-                labeled_job["static_configs"].append(unitless_config)
-
-            # label scrape targets that do have unit labels
-            for host_name, host_address in hosts.items():
-                static_config = self._labeled_unit_config(
-                    host_name, host_address, ports, labels, scrape_metadata
-                )
-                labeled_job["static_configs"].append(static_config)
-                if "juju_unit" not in instance_relabel_config["source_labels"]:
-                    instance_relabel_config["source_labels"].append("juju_unit")  # type: ignore
-
-        # ensure topology relabeling of instance label is last in order of relabelings
-        relabel_configs = job.get("relabel_configs", [])
-        relabel_configs.append(instance_relabel_config)
-        labeled_job["relabel_configs"] = relabel_configs
+                labeled_static_configs.append({"targets": unitless_targets, "labels": juju_labels})
+
+            # label scrape targets that do have unit labels, i.e. the wildcard targets of each unit
+            if ports:
+                for host_name, host_address in hosts.items():
+                    labeled_static_configs.append(
+                        self._labeled_unit_config(host_name, host_address, ports, juju_labels)
+                    )
+                    has_unit_labels = True
+
+        if has_unit_labels:
+            instance_relabel_config["source_labels"].append("juju_unit")  # type: ignore
+
+        labeled_job["static_configs"] = labeled_static_configs
+        # ensure topology relabeling of instance label is last in order of relabelings, without
+        # modifying the relabel configs of the original job
+        labeled_job["relabel_configs"] = [*job.get("relabel_configs", []), instance_relabel_config]
         return labeled_job
 
-    def _set_juju_labels(self, labels, scrape_metadata) -> dict:
+    def _set_juju_labels(self, labels, topology_labels) -> dict:
         """Create a copy of metric labels with Juju topology information.
 
         Args:
             labels: a dictionary containing Parca metric labels.
-            scrape_metadata: scrape related metadata provided by `ProfilingEndpointProvider`.
+            topology_labels: Juju topology labels of the `ProfilingEndpointProvider`.
 
         Returns:
             a copy of the `labels` dictionary augmented with Juju topology information with the
             exception of unit name.
         """
-        juju_labels = labels.copy()  # deep copy not needed
-        juju_labels.update(ProviderTopology.from_dict(scrape_metadata).label_matcher_dict)
-
-        return juju_labels
-
-    def _labeled_unitless_config(self, targets, labels, scrape_metadata) -> dict:
-        """Return static scrape configuration for fully qualified host addresses.
-
-        Fully qualified hosts are those scrape targets for which the address are specified by the
-        `ProfilingEndpointProvider` as part of the scrape job specification set in application
-        relation data. The address specified need not belong to any unit of the
-        `ProfilingEndpointProvider` charm. As a result there is no reliable way to determine the
-        name (Juju topology unit name) for such a target.
-
-        Args:
-            targets: a list of addresses of fully qualified hosts.
-            labels: labels specified by `ProfilingEndpointProvider` clients which are associated
-                with `targets`.
-            scrape_metadata: scrape related metadata provided by `ProfilingEndpointProvider`.
-
-        Returns:
-            A dict containing the static scrape configuration for a list of fully qualified hosts.
-        """
-        juju_labels = self._set_juju_labels(labels, scrape_metadata)
-        unitless_config = {"targets": targets, "labels": juju_labels}
-        return unitless_config
+        return {**labels, **topology_labels}
 
-    def _labeled_unit_config(
-        self, unit_name, host_address, ports, labels, scrape_metadata
-    ) -> dict:
+    def _labeled_unit_config(self, unit_name, host_address, ports, juju_labels) -> dict:
         """Return static scrape configuration for a wildcard host.
 
         Wildcard hosts are those scrape targets whose name (Juju unit name) and address (unit IP
@@ -634,40 +883,33 @@ class ProfilingEndpointConsumer(ops.Object):
             unit_name: a string representing the unit name of the wildcard host.
             host_address: a string representing the address of the wildcard host.
             ports: list of ports on which this wildcard host exposes its profiles.
-            labels: a dictionary of labels provided by `ProfilingEndpointProvider` intended to be
-                associated with this wildcard host.
-            scrape_metadata: scrape related metadata provided by `ProfilingEndpointProvider`.
+            juju_labels: a dictionary of labels provided by `ProfilingEndpointProvider` intended
+                to be associated with this wildcard host, already augmented with Juju topology
+                information. It is not modified.
 
         Returns:
             A dictionary containing the static scrape configuration
             for a single wildcard host.
         """
-        juju_labels = self._set_juju_labels(labels, scrape_metadata)
-
-        juju_labels["juju_unit"] = unit_name
-
-        static_config = {"labels": juju_labels}
-
-        if ports:
-            targets = []
-            for port in ports:
-                targets.append("{}:{}".format(host_address, port))
-            static_config["targets"] = targets  # type: ignore
-        else:
-            static_config["targets"] = [host_address]  # type: ignore
-
-        return static_config
+        targets = ["{}:{}".format(host_address, port) for port in ports]
+        return {"labels": {**juju_labels, "juju_unit": unit_name}, "targets": targets}
 
 
 class ProfilingEndpointProvider(ops.Object):
     """Profiling endpoint for Parca."""
 
+    _stored = ops.StoredState()
+
     def __init__(
         self,
         charm,
         relation_name: str = DEFAULT_RELATION_NAME,
         jobs=None,
         refresh_event: Optional[Union[ops.BoundEvent, List[ops.BoundEvent]]] = None,
+        compress_scrape_jobs: bool = False,
+        deduplicate_tls_ca: bool = False,
+        unit_jobs: Optional[list] = None,
+        relation_jobs: Optional[Dict[int, list]] = None,
     ):
         """Construct a profiling provider for a Parca charm.
 
@@ -707,6 +949,22 @@ class ProfilingEndpointProvider(ops.Object):
                 `ProfilingEndpointProvider` object.
             refresh_event: an optional bound event or list of bound events which
                 will be observed to re-set scrape job data (IP address and others)
+            compress_scrape_jobs: whether to publish the scrape jobs compressed. This makes
+                large scrape jobs much smaller, but requires the related Parca charms to use
+                a version of this library that supports it.
+            deduplicate_tls_ca: whether to publish each distinct CA certificate of the
+                scrape jobs' `tls_config` only once, with the jobs referencing it by digest. This
+                requires the related Parca charms to use a version of this library that
+                supports it.
+            unit_jobs: an optional list of scrape jobs that this unit publishes in its own unit
+                relation data, in addition to the `jobs` published by the leader. This lets each
+                unit of a scaled-out charm publish a different slice of the targets. When
+                provided, `jobs` are published as they are even if empty, instead of falling
+                back to the default job. This requires the related Parca charms to use a version
+                of this library that supports it.
+            relation_jobs: an optional mapping of relation IDs to the scrape jobs published to
+                those relations instead of `jobs`, as they are even if empty. This lets a
+                provider split its targets between several related Parca applications.
 
         Raises:
             RelationNotFoundError: If there is no relation in the charm's metadata.yaml
@@ -723,13 +981,26 @@ class ProfilingEndpointProvider(ops.Object):
         )
 
         super().__init__(charm, relation_name)
-        self.topology = ProviderTopology.from_charm(charm)
+        self._topology = None
+        # maps relation IDs to the digest of the application data last published to them
+        self._stored.set_default(published_digests={})
+        # the address of this unit, as last resolved, and when it must be resolved again
+        self._stored.set_default(unit_address="", unit_address_expiry=0.0)
+        self._unit_address: Optional[str] = None
+        # statistics of the application data published by this object during this dispatch
+        self.publish_stats = {"seconds": 0.0, "relations_touched": 0, "bytes_published": 0}
 
         self._charm = charm
         self._relation_name = relation_name
+        self._compress_scrape_jobs = compress_scrape_jobs
+        self._deduplicate_tls_ca = deduplicate_tls_ca
         # sanitize job configurations to the supported subset of parameters
         jobs = [] if jobs is None else jobs
         self._jobs = [_sanitize_scrape_configuration(job) for job in jobs]
+        self._unit_jobs = (
+            None if unit_jobs is None else [_sanitize_scrape_configuration(j) for j in unit_jobs]
+        )
+        self._relation_jobs = _sanitize_relation_jobs(relation_jobs)
 
         events = self._charm.on[self._relation_name]
         self.framework.observe(events.relation_joined, self._publish_all_relation_data)
@@ -754,28 +1025,134 @@ class ProfilingEndpointProvider(ops.Object):
         for ev in refresh_event:
             self.framework.observe(ev, self._set_unit_ip)
 
-        self.framework.observe(self._charm.on.upgrade_charm, self._publish_all_relation_data)
+        self.framework.observe(self._charm.on.upgrade_charm, self._republish_all_relation_data)
         # If there is no leader during relation_joined we will still need to set alert rules.
-        self.framework.observe(self._charm.on.leader_elected, self._publish_all_relation_data)
+        self.framework.observe(self._charm.on.leader_elected, self._republish_all_relation_data)
 
-    def update_scrape_job_spec(self, jobs):
+    def update_scrape_job_spec(
+        self,
+        jobs,
+        unit_jobs: Optional[list] = None,
+        relation_jobs: Optional[Dict[int, list]] = None,
+    ):
         """Update scrape job specification.
 
-        This will override the job specs you passed to the constructor.
+        This will override the job specs you passed to the constructor, including the jobs of
+        this unit and of specific relations, which are cleared if `unit_jobs` and
+        `relation_jobs` are not provided.
         Use it if for some reason you can't rely on that being up to date.
         """
         self._jobs = [_sanitize_scrape_configuration(job) for job in jobs]
+        self._unit_jobs = (
+            None if unit_jobs is None else [_sanitize_scrape_configuration(j) for j in unit_jobs]
+        )
+        self._relation_jobs = _sanitize_relation_jobs(relation_jobs)
         self._publish_all_relation_data()
 
     def _publish_all_relation_data(self, _event=None):
+        start = time.perf_counter()
+        try:
+            self._do_publish_all_relation_data()
+        finally:
+            self.publish_stats["seconds"] += time.perf_counter() - start
+
+    def _do_publish_all_relation_data(self):
         self._set_unit_ip()
+        self._set_unit_jobs()
 
         if not self._charm.unit.is_leader():
+            # another unit may publish different data while we are not the leader, so whatever we
+            # remember having published can no longer be trusted
+            if self._stored.published_digests:
+                self._stored.published_digests = {}
             return
 
+        relations = self._charm.model.relations[self._relation_name]
+        # the topology is only built if there are relations to publish it to, since building it
+        # imports cosl, which is slow to import
+        scrape_metadata = _canonical_json(self._scrape_metadata) if relations else ""
+        # relations are grouped by the jobs published to them, so that each list of jobs is
+        # only serialized once
+        groups: Dict[int, Tuple[list, List[Relation]]] = {}
+        jobs = self._scrape_jobs
+        for relation in relations:
+            relation_jobs = self._relation_jobs.get(relation.id, jobs)
+            groups.setdefault(id(relation_jobs), (relation_jobs, []))[1].append(relation)
+
+        published_digests = {}
+        for group_jobs, group_relations in groups.values():
+            digest = self._publish_jobs(scrape_metadata, group_jobs, group_relations)
+            published_digests.update((str(relation.id), digest) for relation in group_relations)
+        # only keep track of the relations that still exist, and only write to the stored state
+        # if anything changed, since writing to it makes the whole state be saved again
+        if self._stored.published_digests != published_digests:
+            self._stored.published_digests = published_digests
+
+    def _publish_jobs(self, scrape_metadata: str, jobs: list, relations: List[Relation]) -> str:
+        """Publish scrape jobs to those of the relations they were not published to yet.
+
+        Returns:
+            The digest of the published application data.
+        """
+        tls_cas = {}
+        if self._deduplicate_tls_ca:
+            jobs, tls_cas = _extract_tls_cas(jobs)
+        scrape_jobs = _canonical_json(jobs)
+        tls_ca_certs = _canonical_json(tls_cas) if tls_cas else ""
+        # the same jobs must be published again if their encoding changes
+        digest = hashlib.sha256(
+            "\n".join(
+                (scrape_metadata, scrape_jobs, tls_ca_certs, str(self._compress_scrape_jobs))
+            ).encode("utf-8")
+        ).hexdigest()
+
+        if stale_relations := [
+            relation
+            for relation in relations
+            if self._stored.published_digests.get(str(relation.id)) != digest
+        ]:
+            jobs_data = self._jobs_data(scrape_jobs)
+            for relation in stale_relations:
+                relation.data[self._charm.app]["scrape_metadata"] = scrape_metadata
+                relation.data[self._charm.app][TLS_CA_CERTS_KEY] = tls_ca_certs
+                relation.data[self._charm.app].update(jobs_data)
+
+            published_bytes = len(scrape_metadata) + len(tls_ca_certs)
+            published_bytes += sum(len(value) for value in jobs_data.values())
+            self.publish_stats["relations_touched"] += len(stale_relations)
+            self.publish_stats["bytes_published"] += published_bytes * len(stale_relations)
+        return digest
+
+    def _jobs_data(self, scrape_jobs: str) -> dict:
+        """Get the relation data holding serialized scrape jobs, in the configured encoding."""
+        # only the key matching the current encoding holds the jobs, the other one is cleared
+        if self._compress_scrape_jobs:
+            return {
+                "scrape_jobs": "",
+                COMPRESSED_SCRAPE_JOBS_KEY: _encode_scrape_jobs(scrape_jobs),
+            }
+        return {"scrape_jobs": scrape_jobs, COMPRESSED_SCRAPE_JOBS_KEY: ""}
+
+    def _set_unit_jobs(self):
+        """Publish the jobs of this unit in its unit relation data, if they changed.
+
+        The jobs previously published by this unit are cleared if it no longer has any.
+        """
+        if self._unit_jobs is None:
+            jobs_data = {"scrape_jobs": "", COMPRESSED_SCRAPE_JOBS_KEY: ""}
+        else:
+            jobs_data = self._jobs_data(_canonical_json(self._unit_jobs))
+
         for relation in self._charm.model.relations[self._relation_name]:
-            relation.data[self._charm.app]["scrape_metadata"] = json.dumps(self._scrape_metadata)
-            relation.data[self._charm.app]["scrape_jobs"] = json.dumps(self._scrape_jobs)
+            unit_data = relation.data[self._charm.unit]
+            if changed := {k: v for k, v in jobs_data.items() if unit_data.get(k, "") != v}:
+                unit_data.update(changed)
+                self.publish_stats["bytes_published"] += sum(map(len, changed.values()))
+
+    def _republish_all_relation_data(self, _event=None):
+        """Publish all relation data, even if it seems unchanged since the last publication."""
+        self._stored.published_digests = {}
+        self._publish_all_relation_data()
 
     def set_scrape_job_spec(self):
         """Ensure the scrape target information (as passed to this object on __init__) is published.
@@ -794,11 +1171,31 @@ class ProfilingEndpointProvider(ops.Object):
         in the unit relation data for the Parca charm. The only argument specified is an event and
         it is ignored.
         """
+        unit_name = str(self._charm.model.unit.name)
         for relation in self._charm.model.relations[self._relation_name]:
-            relation.data[self._charm.unit]["parca_scrape_unit_address"] = socket.getfqdn()
-            relation.data[self._charm.unit]["parca_scrape_unit_name"] = str(
-                self._charm.model.unit.name
-            )
+            unit_data = relation.data[self._charm.unit]
+            # only write to the databag if it changed, to not trigger relation-changed needlessly
+            if unit_data.get("parca_scrape_unit_address") != self._resolved_unit_address:
+                unit_data["parca_scrape_unit_address"] = self._resolved_unit_address
+            if unit_data.get("parca_scrape_unit_name") != unit_name:
+                unit_data["parca_scrape_unit_name"] = unit_name
+
+    @property
+    def _resolved_unit_address(self) -> str:
+        """The fully qualified domain name of this unit.
+
+        Resolving it may block when DNS is slow, so it is resolved at most once per dispatch, and
+        reused across dispatches for `UNIT_ADDRESS_TTL` seconds.
+        """
+        if self._unit_address is None:
+            now = time.time()
+            if self._stored.unit_address and now < self._stored.unit_address_expiry:
+                self._unit_address = str(self._stored.unit_address)
+            else:
+                self._unit_address = socket.getfqdn()
+                self._stored.unit_address = self._unit_address
+                self._stored.unit_address_expiry = now + UNIT_ADDRESS_TTL
+        return self._unit_address
 
     def _is_valid_unit_address(self, address: str) -> bool:
         """Validate a unit address.
@@ -835,7 +1232,16 @@ class ProfilingEndpointProvider(ops.Object):
         Returns:
            A list of dictionaries, where each dictionary specifies a single scrape job for Parca.
         """
-        return self._jobs if self._jobs else [DEFAULT_JOB]
+        if self._jobs or self._unit_jobs is not None:
+            return self._jobs
+        return [DEFAULT_JOB]
+
+    @property
+    def topology(self):
+        """The Juju topology of the charm, only built when first needed."""
+        if self._topology is None:
+            self._topology = _provider_topology_class().from_charm(self._charm)
+        return self._topology
 
     @property
     def _scrape_metadata(self) -> dict:
@@ -0,0 +1,110 @@
+# Copyright 2025 Canonical
+# See LICENSE file for licensing details.
+
+"""Parsing of PEM bundles of X.509 certificates."""
+
+import base64
+import binascii
+import calendar
+import re
+from typing import List, Tuple
+
+_PEM_CERTIFICATE = re.compile(
+    r"-----BEGIN CERTIFICATE-----(.*?)-----END CERTIFICATE-----", re.DOTALL
+)
+
+# DER tags of the elements of a certificate that are read
+_SEQUENCE = 0x30
+_EXPLICIT_VERSION = 0xA0
+_UTC_TIME = 0x17
+_GENERALIZED_TIME = 0x18
+
+
+class CertificateError(Exception):
+    """Raised if a PEM bundle of certificates is malformed."""
+
+
+def _read_element(der: bytes, offset: int) -> Tuple[int, int, int]:
+    """Read the header of the DER element at `offset`.
+
+    Returns:
+        The tag of the element, and the offsets of the start and end of its contents.
+    """
+    if offset + 2 > len(der):
+        raise CertificateError("truncated certificate")
+    tag, length = der[offset], der[offset + 1]
+    offset += 2
+    if length & 0x80:
+        # long form, the length is encoded in the following bytes
+        size = length & 0x7F
+        if not 0 < size <= 4 or offset + size > len(der):
+            raise CertificateError("invalid length in certificate")
+        length = int.from_bytes(der[offset : offset + size], "big")
+        offset += size
+    if offset + length > len(der):
+        raise CertificateError("truncated certificate")
+    return tag, offset, offset + length
+
+
+def _parse_time(tag: int, value: bytes) -> float:
+    """Convert an ASN.1 UTCTime or GeneralizedTime to a timestamp."""
+    try:
+        text = value.decode("ascii")
+        if tag == _UTC_TIME and len(text) == 13 and text.endswith("Z"):
+            # two-digit years from 50 to 99 are in the 20th century, as per RFC 5280
+            year = int(text[:2])
+            text = "{}{}".format(1900 + year if year >= 50 else 2000 + year, text[2:])
+        elif not (tag == _GENERALIZED_TIME and len(text) == 15 and text.endswith("Z")):
+            raise ValueError(text)
+        year, month, day, hour, minute, second = (
+            int(text[i : i + n]) for i, n in ((0, 4), (4, 2), (6, 2), (8, 2), (10, 2), (12, 2))
+        )
+        return float(calendar.timegm((year, month, day, hour, minute, second, 0, 0, 0)))
+    except ValueError as e:
+        raise CertificateError("invalid validity time in certificate") from e
+
+
+def certificate_not_after(der: bytes) -> float:
+    """Get the timestamp after which a DER encoded certificate expires."""
+    tag, start, end = _read_element(der, 0)
+    if tag != _SEQUENCE or end != len(der):
+        raise CertificateError("not a certificate")
+    tag, offset, _ = _read_element(der, start)
+    if tag != _SEQUENCE:
+        raise CertificateError("not a certificate")
+
+    # tbsCertificate: [0] version (optional), serialNumber, signature, issuer, validity, ...
+    tag, _, end = _read_element(der, offset)
+    if tag == _EXPLICIT_VERSION:
+        offset = end
+    for _ in ("serialNumber", "signature", "issuer"):
+        _, _, offset = _read_element(der, offset)
+    tag, offset, _ = _read_element(der, offset)
+    if tag != _SEQUENCE:
+        raise CertificateError("invalid validity in certificate")
+    _, _, offset = _read_element(der, offset)  # notBefore
+    tag, start, end = _read_element(der, offset)
+    return _parse_time(tag, der[start:end])
+
+
+def ca_bundle_not_after(pem: str) -> List[float]:
+    """Parse every certificate of a PEM bundle.
+
+    Text outside of the certificates, such as the comments of system CA bundles, is ignored.
+
+    Returns:
+        The expiry timestamp of each certificate of the bundle.
+
+    Raises:
+        CertificateError: if the bundle has no certificates, or if any of them is malformed.
+    """
+    not_after = []
+    for index, body in enumerate(_PEM_CERTIFICATE.findall(pem)):
+        try:
+            der = base64.b64decode("".join(body.split()), validate=True)
+            not_after.append(certificate_not_after(der))
+        except (binascii.Error, CertificateError) as e:
+            raise CertificateError(f"certificate #{index} is invalid: {e}") from e
+    if not not_after:
+        raise CertificateError("no certificate found")
+    return not_after
@@ -4,17 +4,110 @@
 
 """Parca Scrape Target Charm."""
 
+import hashlib
+import json
 import logging
-import ssl
-from typing import Dict, List, Literal, Optional, TypedDict
-from urllib.parse import urlparse
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Literal, Optional, Set, Tuple, TypedDict, Union
 
 import ops
 from charms.parca_k8s.v0.parca_scrape import ProfilingEndpointProvider
 
+from certificates import CertificateError, ca_bundle_not_after
+from discovery import discover_profiles
+from instrumentation import Instrumentation, timed
+from jobs import JobsConfigError, JobSpec, load_job_specs
+from probe import host_port, probe_reachability
+from resolver import is_ip_address, resolve_hostnames
+from sharding import assign_static_configs, shard_static_configs
+from targets import (
+    MAX_EXPANDED_TARGETS,
+    MAX_TARGETS,
+    StaticConfig,
+    StaticConfigsError,
+    TargetGroup,
+    TargetsFileError,
+    TargetValidationError,
+    file_digest,
+    load_target_groups,
+    load_targets_file,
+    merge_static_configs,
+    validate_target_groups,
+)
+
 logger = logging.getLogger(__name__)
 
-ScrapeJob = Dict[str, List[str]]
+# config options that are parsed together into a single `ParsedConfig` snapshot
+CONFIG_KEYS = (
+    "targets",
+    "static_configs",
+    "jobs",
+    "scheme",
+    "tls_ca_cert",
+    "tls_server_name",
+    "tls_insecure_skip_verify",
+    "shards",
+    "shard_scrape_intervals",
+    "shard_scrape_timeouts",
+    "scrape_interval",
+    "scrape_timeout",
+    "profile_types",
+    "compress_scrape_jobs",
+    "deduplicate_tls_ca",
+    "probe_targets",
+    "probe_timeout",
+    "probe_concurrency",
+    "exclude_after_failures",
+    "discover_profile_types",
+    "resolve_targets",
+    "shard_across_units",
+    "partition_consumers",
+    "partition_replication_factor",
+)
+
+# Prometheus-style duration, e.g. "1m30s"
+# reference: https://prometheus.io/docs/prometheus/latest/configuration/configuration/#duration
+DURATION_PATTERN = re.compile(
+    r"^(?:(\d+)y)?(?:(\d+)w)?(?:(\d+)d)?(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s)?(?:(\d+)ms)?$"
+)
+DURATION_UNIT_SECONDS = (365 * 86400, 7 * 86400, 86400, 3600, 60, 1, 0.001)
+
+# profile types that can be toggled with the `profile_types` option, mapped to their Parca pprof
+# config name and to their Parca defaults
+# reference: https://github.com/parca-dev/parca/blob/main/pkg/config/config.go
+PPROF_PROFILES: Dict[str, Tuple[str, Dict[str, Union[str, bool]]]] = {
+    "cpu": ("process_cpu", {"path": "/debug/pprof/profile", "delta": True}),
+    "memory": ("memory", {"path": "/debug/pprof/allocs"}),
+    "goroutine": ("goroutine", {"path": "/debug/pprof/goroutine"}),
+    "block": ("block", {"path": "/debug/pprof/block"}),
+    "mutex": ("mutex", {"path": "/debug/pprof/mutex"}),
+}
+# names under which the pprof index lists each profile type
+PPROF_INDEX_NAMES = {
+    profile_type: str(defaults["path"]).rsplit("/", 1)[-1]
+    for profile_type, (_, defaults) in PPROF_PROFILES.items()
+}
+# how long a target excluded for being unreachable waits before being probed again, in seconds,
+# doubling with each further failure up to the maximum
+EXCLUDED_TARGET_RETRY_BACKOFF = 60
+EXCLUDED_TARGET_MAX_RETRY_BACKOFF = 3600
+# how long the profile types discovered for a target are reused for, in seconds
+DISCOVERY_TTL = 3600
+# how long a target whose profile types could not be discovered waits before being tried again
+DISCOVERY_FAILURE_TTL = 300
+# how long the address a target hostname resolved to is used for, in seconds
+RESOLUTION_TTL = 300
+# label holding the hostname of the targets published by address
+HOSTNAME_LABEL = "hostname"
+# peer relation over which the units sharing the targets see each other
+PEER_RELATION_NAME = "replicas"
+# relation with the Parca applications that scrape the targets
+PROFILING_RELATION_NAME = "profiling-endpoint"
+# how long before a certificate of `tls_ca_cert` expires to start warning about it, in seconds
+CA_EXPIRY_WARNING = 30 * 86400
 
 
 class TLSConfig(TypedDict, total=False):
@@ -28,35 +121,147 @@ class TLSConfig(TypedDict, total=False):
 class ScrapeJobsConfig(TypedDict, total=False):
     """Scrape job config type."""
 
-    static_configs: List[ScrapeJob]
+    job_name: str
+    static_configs: List[StaticConfig]
+    scrape_interval: str
+    scrape_timeout: str
+    profiling_config: Dict[str, Any]
     scheme: Optional[Literal["https", "http"]]
     tls_config: TLSConfig
 
 
-class TargetValidationError(Exception):
-    """Raised if some external scrape target as provided by config is invalid."""
+@dataclass(frozen=True)
+class ParsedConfig:
+    """Parsed and validated snapshot of the charm config."""
+
+    static_configs: List[StaticConfig]
+    invalid_targets: Tuple[str, ...]
+    static_configs_error: str
+    targets_file_error: str
+    named_jobs: List[ScrapeJobsConfig]
+    jobs_error: str
+    scheme: str
+    tls_ca_cert: str
+    tls_ca_valid: bool
+    tls_ca_not_after: Optional[float]
+    tls_server_name: str
+    tls_insecure_skip_verify: bool
+    shards: int
+    shard_scrape_intervals: List[str]
+    shard_scrape_timeouts: List[str]
+    sharding_error: str
+    scrape_interval: str
+    scrape_timeout: str
+    profile_types: Tuple[str, ...]
+    scrape_config_error: str
+    compress_scrape_jobs: bool
+    deduplicate_tls_ca: bool
+    probe_targets: bool
+    probe_timeout: float
+    probe_concurrency: int
+    exclude_after_failures: int
+    probe_config_error: str
+    discover_profile_types: bool
+    resolve_targets: bool
+    shard_across_units: bool
+    partition_consumers: bool
+    partition_replication_factor: int
+    partition_config_error: str
+
+
+def _duration_seconds(duration: str) -> Optional[float]:
+    """Convert a Prometheus duration to seconds, or return None if it is invalid."""
+    if duration == "0":
+        return 0.0
+    if not duration or not (match := DURATION_PATTERN.match(duration)):
+        return None
+    return sum(
+        int(value) * unit for value, unit in zip(match.groups(), DURATION_UNIT_SECONDS) if value
+    )
+
+
+def _timeout_exceeds_interval(timeout: str, interval: str) -> bool:
+    """Check whether a valid scrape timeout is longer than a valid scrape interval."""
+    return (_duration_seconds(timeout) or 0) > (_duration_seconds(interval) or 0)
+
+
+def _split_list(value: str) -> List[str]:
+    """Split a comma-separated config value, ignoring whitespace around each item."""
+    return [item.strip() for item in value.split(",")] if value.strip() else []
+
+
+def _profiling_config(profile_types: Tuple[str, ...]) -> Dict[str, Any]:
+    """Build a Parca profiling config that only enables the given profile types."""
+    return {
+        "pprof_config": {
+            name: {"enabled": profile_type in profile_types, **defaults}
+            for profile_type, (name, defaults) in PPROF_PROFILES.items()
+        }
+    }
 
 
 class ParcaScrapeTargetCharm(ops.CharmBase):
     """Parca Scrape Target Charm."""
 
+    _stored = ops.StoredState()
+
     def __init__(self, *args):
+        start = time.perf_counter()
         super().__init__(*args)
+        self._instrumentation: Optional[Instrumentation] = None
+        if instrumentation_file := str(self.model.config.get("instrumentation_file", "")):
+            self._instrumentation = Instrumentation(instrumentation_file)
+            self.framework.observe(self.framework.on.commit, self._on_commit)
+
+        # parsed config snapshots for this dispatch, keyed by the raw config values
+        self._parsed_configs: Dict[tuple, ParsedConfig] = {}
+        # reachability of each target, probed at most once per dispatch
+        self._reachability: Optional[Dict[str, bool]] = None
+        self._excluded: Optional[Set[str]] = None
+        # consecutive failed probes of each unreachable target, and when the targets excluded
+        # for failing too many of them are due to be probed again
+        self._stored.set_default(target_failures={}, target_retry_at={})
+        # profile types discovered for each target, and the settings they were discovered with
+        self._stored.set_default(discovered_profiles={})
+        # digest of the last `tls_ca_cert` parsed, and when its first certificate expires
+        self._stored.set_default(tls_ca={})
+        # digest, static configs and invalid targets of the last `targets-file` resource parsed
+        self._stored.set_default(targets_file={})
+        self._discovered: Optional[Dict[str, Tuple[str, ...]]] = None
+        # address each target hostname resolved to, and when it must be resolved again
+        self._stored.set_default(resolved_hostnames={})
+        self._addresses: Optional[Dict[str, str]] = None
+        # static configs of the targets owned by this unit, when sharding them across units
+        self._owned_static_configs: Optional[List[StaticConfig]] = None
 
         # ENDPOINT WRAPPERS
-        self._profiling = ProfilingEndpointProvider(self, jobs=self._scrape_jobs)
+        self._profiling = ProfilingEndpointProvider(
+            self,
+            relation_name=PROFILING_RELATION_NAME,
+            jobs=self._scrape_jobs,
+            unit_jobs=self._unit_scrape_jobs,
+            relation_jobs=self._relation_scrape_jobs,
+            compress_scrape_jobs=self._config.compress_scrape_jobs,
+            deduplicate_tls_ca=self._config.deduplicate_tls_ca,
+        )
 
         # event handlers
         self.framework.observe(self.on.collect_unit_status, self._on_collect_unit_status)
+        self.framework.observe(self.on.update_status, self._on_update_status)
+        self.framework.observe(self.on.config_changed, self._on_config_changed)
 
         # unconditional logic
         self._reconcile()
 
+        if self._instrumentation:
+            self._instrumentation.record("init", time.perf_counter() - start)
+
     # RECONCILERS
     def _reconcile(self):
         """Unconditional logic to run regardless of the event we're processing."""
         self._reconcile_relations()
 
+    @timed("reconcile_relations")
     def _reconcile_relations(self):
         self._profiling.set_scrape_job_spec()
 
@@ -64,18 +269,346 @@ class ParcaScrapeTargetCharm(ops.CharmBase):
     @property
     def _scrape_jobs(self) -> Optional[List[ScrapeJobsConfig]]:
         """Set up Parca scrape configuration for external targets."""
+        config = self._config
+        if config.shard_across_units:
+            # the jobs of the targets are published by each unit, see `_unit_scrape_jobs`
+            return config.named_jobs
         # return None if no targets are configured
-        if not self._targets:
+        if not (config.static_configs or config.named_jobs):
+            return None
+        jobs = self._target_jobs(self._live_static_configs()) if config.static_configs else []
+        return jobs + config.named_jobs
+
+    @property
+    def _unit_scrape_jobs(self) -> Optional[List[ScrapeJobsConfig]]:
+        """Get the scrape jobs of the targets owned by this unit, when sharding them across units.
+
+        Returns None if the targets are not sharded across units, in which case the leader
+        publishes all of their jobs.
+        """
+        config = self._config
+        if not config.shard_across_units:
             return None
+        return self._target_jobs(self._live_static_configs()) if config.static_configs else []
+
+    @property
+    def _relation_scrape_jobs(self) -> Optional[Dict[int, List[ScrapeJobsConfig]]]:
+        """Get the scrape jobs of each related Parca application, when partitioning the targets.
+
+        Each target is assigned to `partition_replication_factor` of the related applications,
+        chosen by rendezvous hashing over their names, so that only a minimal share of the
+        targets moves when an application joins or leaves. The named jobs are published to all
+        of them.
 
-        job: ScrapeJobsConfig = {
-            "static_configs": [{"targets": self._targets}],
+        Returns None if the targets are not partitioned, in which case all the jobs are
+        published to every related application.
+        """
+        config = self._config
+        if not (config.partition_consumers and config.static_configs):
+            return None
+        relations = {
+            relation.app.name if relation.app else str(relation.id): relation
+            for relation in self.model.relations[PROFILING_RELATION_NAME]
         }
-        if self._scheme == "https":
-            job["scheme"] = "https"
-            job["tls_config"] = self._tls_config
+        if len(relations) < 2:
+            return None
+
+        assigned = assign_static_configs(
+            self._live_static_configs(), sorted(relations), config.partition_replication_factor
+        )
+        return {
+            relation.id: self._target_jobs(assigned[name]) + config.named_jobs
+            for name, relation in relations.items()
+        }
+
+    def _target_jobs(self, static_configs: List[StaticConfig]) -> List[ScrapeJobsConfig]:
+        """Build the scrape jobs of a selection of the configured static configs."""
+        config = self._config
+
+        jobs = []
+        sharded = shard_static_configs(static_configs, config.shards)
+        for shard, shard_configs in enumerate(sharded):
+            for profile_types, group in self._group_by_profile_types(shard_configs):
+                job: ScrapeJobsConfig = {
+                    "static_configs": self._resolve_static_configs(group),
+                }
+                if job_name := self._job_name(shard, profile_types):
+                    job["job_name"] = job_name
+                if scrape_interval := (
+                    config.shard_scrape_intervals[shard]
+                    if config.shard_scrape_intervals
+                    else config.scrape_interval
+                ):
+                    job["scrape_interval"] = scrape_interval
+                if scrape_timeout := (
+                    config.shard_scrape_timeouts[shard]
+                    if config.shard_scrape_timeouts
+                    else config.scrape_timeout
+                ):
+                    job["scrape_timeout"] = scrape_timeout
+                if profile_types is not None:
+                    job["profiling_config"] = _profiling_config(profile_types)
+                elif config.profile_types:
+                    job["profiling_config"] = _profiling_config(config.profile_types)
+                if self._scheme == "https":
+                    job["scheme"] = "https"
+                    job["tls_config"] = self._tls_config
+                jobs.extend(self._split_by_server_name(job))
+
+        return jobs
+
+    def _resolve_static_configs(self, static_configs: List[StaticConfig]) -> List[StaticConfig]:
+        """Replace the hostnames of targets with the addresses they resolve to, if enabled.
+
+        Each resolved target gets its own static config, labeled with its hostname. Targets
+        that could not be resolved are kept as they are.
+        """
+        if not self._config.resolve_targets:
+            return static_configs
+
+        addresses = self._resolved_addresses()
+        resolved_static_configs = []
+        for static_config in static_configs:
+            unresolved, resolved = [], []
+            for target in static_config.get("targets", []):
+                host, _ = host_port(target, self._scheme)
+                if (address := addresses.get(host)) is None:
+                    unresolved.append(target)
+                    continue
+                # keep the port of the target, if any
+                address = f"[{address}]" if ":" in address else address
+                resolved_static_config: StaticConfig = {
+                    "targets": [address + target[len(host) :]],
+                    "labels": {**static_config.get("labels", {}), HOSTNAME_LABEL: host},
+                }
+                resolved.append(resolved_static_config)
+            if unresolved:
+                unresolved_static_config = static_config.copy()
+                unresolved_static_config["targets"] = unresolved
+                resolved_static_configs.append(unresolved_static_config)
+            resolved_static_configs.extend(resolved)
+        return resolved_static_configs
+
+    def _split_by_server_name(self, job: ScrapeJobsConfig) -> List[ScrapeJobsConfig]:
+        """Split a job scraped over TLS into one job per hostname of its resolved targets.
+
+        Targets published by address are validated against their hostname, unless
+        `tls_server_name` is set.
+        """
+        config = self._config
+        if not (config.resolve_targets and job.get("scheme") == "https") or config.tls_server_name:
+            return [job]
+
+        by_hostname: Dict[str, List[StaticConfig]] = {}
+        for static_config in job.get("static_configs", []):
+            hostname = static_config.get("labels", {}).get(HOSTNAME_LABEL, "")
+            by_hostname.setdefault(hostname, []).append(static_config)
+        if list(by_hostname) == [""]:
+            return [job]
+
+        jobs = []
+        for hostname, static_configs in by_hostname.items():
+            hostname_job = job.copy()
+            hostname_job["static_configs"] = static_configs
+            if hostname:
+                hostname_job["job_name"] = "-".join(filter(None, (job.get("job_name"), hostname)))
+                hostname_job["tls_config"] = {**job.get("tls_config", {}), "server_name": hostname}
+            jobs.append(hostname_job)
+        return jobs
+
+    def _target_hostnames(self) -> List[str]:
+        """Get the unique hostnames of the targets, leaving out IP addresses."""
+        hosts = (
+            host_port(target, self._scheme)[0]
+            for static_config in self._unit_static_configs()
+            for target in static_config.get("targets", [])
+        )
+        return list(dict.fromkeys(host for host in hosts if not is_ip_address(host)))
+
+    def _resolve(self, hostnames: List[str]):
+        """Resolve hostnames, and keep the addresses they resolve to for `RESOLUTION_TTL`."""
+        expiry = time.time() + RESOLUTION_TTL
+        resolved_hostnames = {
+            hostname: dict(resolution)
+            for hostname, resolution in self._stored.resolved_hostnames.items()
+        }
+        for hostname, address in resolve_hostnames(
+            hostnames, self._config.probe_concurrency
+        ).items():
+            if address is None:
+                logger.warning("Failed to resolve %s, publishing it as is", hostname)
+            resolved_hostnames[hostname] = {"address": address or "", "expiry": expiry}
+        self._stored.resolved_hostnames = resolved_hostnames
+        self._addresses = None
+
+    @timed("resolve_targets")
+    def _resolved_addresses(self) -> Dict[str, str]:
+        """Get the address each target hostname resolves to.
+
+        Only the hostnames that were never resolved are resolved, the others are refreshed on
+        update-status once they expire.
+        """
+        if self._addresses is None:
+            hostnames = self._target_hostnames()
+            if missing := [h for h in hostnames if h not in self._stored.resolved_hostnames]:
+                self._resolve(missing)
+            # forget about the hostnames of the targets that are no longer configured
+            resolved_hostnames = {
+                hostname: dict(self._stored.resolved_hostnames[hostname]) for hostname in hostnames
+            }
+            self._stored.resolved_hostnames = resolved_hostnames
+            self._addresses = {
+                hostname: resolution["address"]
+                for hostname, resolution in resolved_hostnames.items()
+                if resolution["address"]
+            }
+        return self._addresses
+
+    def _job_name(self, shard: int, profile_types: Optional[Tuple[str, ...]]) -> str:
+        """Get a unique and stable name for the job of a shard and of discovered profile types."""
+        parts = []
+        if self._config.shards > 1:
+            parts.append(f"shard-{shard}")
+        if profile_types is not None:
+            parts.append("profiles-{}".format("-".join(profile_types) or "none"))
+        return "-".join(parts)
+
+    def _group_by_profile_types(
+        self, static_configs: List[StaticConfig]
+    ) -> List[Tuple[Optional[Tuple[str, ...]], List[StaticConfig]]]:
+        """Split static configs into groups of targets that serve the same profile types.
+
+        Returns:
+            `(profile_types, static_configs)` tuples, in order of first appearance, where
+            `profile_types` is None for the targets whose profile types are not known.
+        """
+        if not static_configs:
+            return []
+        # the targets' certificates cannot be validated against an invalid CA certificate
+        if not self._config.discover_profile_types or not self._config.tls_ca_valid:
+            return [(None, static_configs)]
+
+        discovered = self._discovered_profile_types()
+        groups: Dict[Optional[Tuple[str, ...]], List[StaticConfig]] = {}
+        for static_config in static_configs:
+            targets_by_types: Dict[Optional[Tuple[str, ...]], List[str]] = {}
+            for target in static_config.get("targets", []):
+                targets_by_types.setdefault(discovered.get(target), []).append(target)
+            for profile_types, targets in targets_by_types.items():
+                group_static_config = static_config.copy()
+                group_static_config["targets"] = targets
+                groups.setdefault(profile_types, []).append(group_static_config)
+        return list(groups.items())
+
+    @property
+    def _discovers_profile_types(self) -> bool:
+        """Whether this unit discovers the profile types of the targets whose jobs it publishes."""
+        config = self._config
+        # the targets' certificates cannot be validated against an invalid CA certificate
+        return (
+            config.discover_profile_types
+            and config.tls_ca_valid
+            and bool(config.static_configs)
+            and self._publishes_target_jobs
+        )
+
+    def _discovery_settings(self) -> str:
+        """Get a digest of the settings the profile types of the targets are discovered with."""
+        config = self._config
+        return hashlib.sha256(
+            json.dumps(
+                [
+                    config.scheme,
+                    config.tls_ca_cert,
+                    config.tls_server_name,
+                    config.tls_insecure_skip_verify,
+                    config.profile_types,
+                ]
+            ).encode("utf-8")
+        ).hexdigest()
+
+    def _discovered_profile_types(self) -> Dict[str, Tuple[str, ...]]:
+        """Get the profile types served by each target, as last discovered from its pprof index.
+
+        Only the profile types discovered with the current settings and less than
+        `DISCOVERY_TTL` seconds ago are returned, see `_discover_profile_types`.
+        """
+        if self._discovered is None:
+            stored = self._stored.discovered_profiles
+            if (
+                stored.get("settings") == self._discovery_settings()
+                and stored.get("expiry", 0) > time.time()
+            ):
+                self._discovered = {
+                    t: tuple(types) for t, types in stored.get("profiles", {}).items()
+                }
+            else:
+                self._discovered = {}
+        return self._discovered
+
+    @timed("discover_profile_types")
+    def _discover_profile_types(self) -> bool:
+        """Discover the profile types served by the targets whose types are not known yet.
+
+        Only the configured profile types are considered, if any. Discovered profile types are
+        reused for `DISCOVERY_TTL` seconds, as long as the scheme and TLS config do not change,
+        and targets whose index could not be fetched are only tried again after
+        `DISCOVERY_FAILURE_TTL` seconds.
+
+        Returns:
+            Whether the profile types of any target changed.
+        """
+        config = self._config
+        settings = self._discovery_settings()
+        stored = self._stored.discovered_profiles
+        now = time.time()
+        discovered: Dict[str, List[str]] = {}
+        failed: Dict[str, float] = {}
+        expiry = now + DISCOVERY_TTL
+        if stored.get("settings") == settings:
+            if stored.get("expiry", 0) > now:
+                discovered = {t: list(types) for t, types in stored["profiles"].items()}
+                expiry = stored["expiry"]
+            failed = {t: at for t, at in stored.get("failed", {}).items() if at > now}
 
-        return [job]
+        targets = [t for sc in self._unit_static_configs() for t in sc.get("targets", [])]
+        if missing := [t for t in targets if t not in discovered and t not in failed]:
+            indexes = discover_profiles(
+                missing,
+                config.scheme,
+                config.probe_timeout,
+                config.probe_concurrency,
+                ca_cert=config.tls_ca_cert,
+                server_name=config.tls_server_name,
+                insecure_skip_verify=config.tls_insecure_skip_verify,
+            )
+            for target, index in indexes.items():
+                if index is None:
+                    logger.warning("Failed to discover the profile types of %s", target)
+                    failed[target] = now + DISCOVERY_FAILURE_TTL
+                    continue
+                discovered[target] = [
+                    profile_type
+                    for profile_type, name in PPROF_INDEX_NAMES.items()
+                    if name in index
+                    and (not config.profile_types or profile_type in config.profile_types)
+                ]
+
+        # forget about the targets that are no longer configured
+        discovered = {t: discovered[t] for t in targets if t in discovered}
+        failed = {t: failed[t] for t in targets if t in failed}
+        discoveries = {
+            "settings": settings,
+            "expiry": expiry,
+            "profiles": discovered,
+            "failed": failed,
+        }
+        if self._stored.discovered_profiles != discoveries:
+            self._stored.discovered_profiles = discoveries
+
+        previous = self._discovered_profile_types()
+        self._discovered = {t: tuple(types) for t, types in discovered.items()}
+        return self._discovered != previous
 
     # CONFIG PROPERTIES
     @property
@@ -91,128 +624,670 @@ class ParcaScrapeTargetCharm(ops.CharmBase):
 
         return tls_config
 
+    @property
+    def _config(self) -> ParsedConfig:
+        """Get the parsed config, parsing it only once per set of raw config values."""
+        raw_config = tuple(self.model.config.get(key) for key in CONFIG_KEYS)
+        if (parsed := self._parsed_configs.get(raw_config)) is None:
+            parsed = self._parsed_configs[raw_config] = self._parse_config()
+        return parsed
+
+    @timed("parse_config")
+    def _parse_config(self) -> ParsedConfig:
+        """Parse and validate the charm config."""
+        static_configs, invalid_targets, static_configs_error = [], (), ""
+        targets_file_error = ""
+        try:
+            static_configs = self._load_and_validate_targets()
+        except StaticConfigsError as e:
+            logger.error("Invalid `static_configs` provided: %s", e)
+            static_configs_error = str(e)
+        except TargetsFileError as e:
+            logger.error("Invalid `targets-file` resource provided: %s", e)
+            targets_file_error = str(e)
+        except TargetValidationError as e:
+            invalid_targets = tuple(e.invalid_targets)
+        named_jobs, jobs_error = [], ""
+        try:
+            named_jobs = self._load_named_jobs(static_configs)
+        except JobsConfigError as e:
+            logger.error("Invalid `jobs` provided: %s", e)
+            jobs_error = str(e)
+
+        tls_ca_cert = str(self.model.config.get("tls_ca_cert", ""))
+        tls_ca_valid, tls_ca_not_after = self._check_tls_ca(tls_ca_cert)
+        scrape_interval = str(self.model.config.get("scrape_interval", "")).strip()
+        scrape_timeout = str(self.model.config.get("scrape_timeout", "")).strip()
+        profile_types = tuple(_split_list(str(self.model.config.get("profile_types", ""))))
+        if scrape_config_error := self._scrape_config_error(
+            scrape_interval, scrape_timeout, profile_types
+        ):
+            logger.error("Invalid scrape config, using Parca's defaults: %s", scrape_config_error)
+            scrape_interval, scrape_timeout, profile_types = "", "", ()
+
+        shards = int(self.model.config.get("shards", 1))
+        shard_scrape_intervals = _split_list(
+            str(self.model.config.get("shard_scrape_intervals", ""))
+        )
+        shard_scrape_timeouts = _split_list(
+            str(self.model.config.get("shard_scrape_timeouts", ""))
+        )
+        if sharding_error := self._sharding_error(
+            shards,
+            shard_scrape_intervals or [scrape_interval] * shards,
+            shard_scrape_timeouts or [scrape_timeout] * shards,
+        ):
+            logger.error(
+                "Invalid sharding config, scraping all targets in a single job: %s", sharding_error
+            )
+            shards, shard_scrape_intervals, shard_scrape_timeouts = 1, [], []
+
+        probe_targets = bool(self.model.config.get("probe_targets", False))
+        probe_timeout = str(self.model.config.get("probe_timeout", "2s")).strip()
+        probe_concurrency = int(self.model.config.get("probe_concurrency", 64))
+        exclude_after_failures = int(self.model.config.get("exclude_after_failures", 0))
+        if probe_config_error := self._probe_config_error(
+            probe_timeout, probe_concurrency, exclude_after_failures
+        ):
+            logger.error("Invalid probe config, not probing targets: %s", probe_config_error)
+            probe_targets = False
+
+        shard_across_units = bool(self.model.config.get("shard_across_units", False))
+        partition_consumers, partition_replication_factor, partition_config_error = (
+            self._parse_partition_config(shard_across_units)
+        )
+        return ParsedConfig(
+            static_configs=static_configs,
+            invalid_targets=invalid_targets,
+            static_configs_error=static_configs_error,
+            targets_file_error=targets_file_error,
+            named_jobs=named_jobs,
+            jobs_error=jobs_error,
+            scheme=str(self.model.config.get("scheme", "http")),
+            tls_ca_cert=tls_ca_cert,
+            tls_ca_valid=tls_ca_valid,
+            tls_ca_not_after=tls_ca_not_after,
+            tls_server_name=str(self.model.config.get("tls_server_name", "")),
+            tls_insecure_skip_verify=bool(
+                self.model.config.get("tls_insecure_skip_verify", False)
+            ),
+            shards=shards,
+            shard_scrape_intervals=shard_scrape_intervals,
+            shard_scrape_timeouts=shard_scrape_timeouts,
+            sharding_error=sharding_error,
+            scrape_interval=scrape_interval,
+            scrape_timeout=scrape_timeout,
+            profile_types=profile_types,
+            scrape_config_error=scrape_config_error,
+            compress_scrape_jobs=bool(self.model.config.get("compress_scrape_jobs", False)),
+            deduplicate_tls_ca=bool(self.model.config.get("deduplicate_tls_ca", False)),
+            probe_targets=probe_targets,
+            probe_timeout=_duration_seconds(probe_timeout) or 0.0,
+            probe_concurrency=probe_concurrency,
+            exclude_after_failures=exclude_after_failures if probe_targets else 0,
+            probe_config_error=probe_config_error,
+            discover_profile_types=bool(self.model.config.get("discover_profile_types", False))
+            and not probe_config_error,
+            resolve_targets=bool(self.model.config.get("resolve_targets", False))
+            and not probe_config_error,
+            shard_across_units=shard_across_units,
+            partition_consumers=partition_consumers,
+            partition_replication_factor=partition_replication_factor,
+            partition_config_error=partition_config_error,
+        )
+
+    def _parse_partition_config(self, shard_across_units: bool) -> Tuple[bool, int, str]:
+        """Parse and validate the options partitioning the targets between Parca applications.
+
+        Returns:
+            Whether to partition the targets, the replication factor of each target, and a
+            description of the problem with these options, if any.
+        """
+        partition_consumers = bool(self.model.config.get("partition_consumers", False))
+        replication_factor = int(self.model.config.get("partition_replication_factor", 1))
+        error = ""
+        if partition_consumers and replication_factor < 1:
+            error = "`partition_replication_factor` must be at least 1."
+        elif partition_consumers and shard_across_units:
+            error = "`partition_consumers` cannot be combined with `shard_across_units`."
+        if error:
+            logger.error("Invalid partition config, not partitioning targets: %s", error)
+        return partition_consumers and not error, replication_factor, error
+
     @property
     def _scheme(self) -> str:
         """Get scheme option from config data."""
-        return str(self.model.config.get("scheme", "http"))
+        return self._config.scheme
 
     @property
     def _tls_ca_cert(self) -> str:
         """Get tls_ca_cert option from config data."""
-        return str(self.model.config.get("tls_ca_cert", ""))
+        return self._config.tls_ca_cert
 
     @property
     def _tls_server_name(self) -> str:
         """Get tls_server_name option from config data."""
-        return str(self.model.config.get("tls_server_name", ""))
+        return self._config.tls_server_name
 
     @property
     def _tls_insecure_skip_verify(self) -> bool:
         """Get tls_insecure_skip_verify option from config data."""
-        return bool(self.model.config.get("tls_insecure_skip_verify", False))
+        return self._config.tls_insecure_skip_verify
 
-    def _load_and_validate_targets(self):
-        """Get a sanitised list of external scrape targets.
+    @timed("load_and_validate_targets")
+    def _load_and_validate_targets(self) -> List[StaticConfig]:
+        """Get sanitised static configs of unique external scrape targets.
 
-        Raises TargetValidationError if any target is invalid.
+        The targets of the `targets` option come first, without any labels, followed by the
+        labeled groups of targets of the `static_configs` option, and then by those of the
+        `targets-file` resource.
+
+        Raises StaticConfigsError if `static_configs` is malformed, TargetsFileError if the
+        `targets-file` resource is malformed and TargetValidationError if any target is invalid.
         """
-        if not (raw_targets := str(self.model.config.get("targets", ""))):
-            return []
+        groups: List[TargetGroup] = [({}, [str(self.model.config.get("targets", ""))])]
+        groups.extend(load_target_groups(str(self.model.config.get("static_configs", ""))))
+        file_static_configs, invalid_targets = self._targets_file_static_configs()
+        file_targets = sum(len(sc.get("targets", [])) for sc in file_static_configs)
+        static_configs: List[StaticConfig] = []
+        try:
+            static_configs = validate_target_groups(groups, MAX_TARGETS - file_targets)
+        except TargetValidationError as e:
+            invalid_targets = e.invalid_targets + invalid_targets
+        if invalid_targets:
+            if self._instrumentation:
+                self._instrumentation.count("targets_invalid", len(invalid_targets))
+            logger.error(
+                "Targets must be specified in host:port format, and be comma-separated. "
+                "For example: targets='foo.com:1232, boo.org:4234, 10.0.0.0/24:7000, "
+                "bar.org:7000-7010'. Ranges may expand to at most %d targets, and there may be "
+                "at most %d targets in total. Invalid targets: %s",
+                MAX_EXPANDED_TARGETS,
+                MAX_TARGETS,
+                ", ".join(map(repr, invalid_targets)),
+            )
+            raise TargetValidationError(invalid_targets)
+        static_configs = merge_static_configs(static_configs, file_static_configs)
+
+        if self._instrumentation:
+            self._instrumentation.count(
+                "targets_validated", sum(len(sc.get("targets", [])) for sc in static_configs)
+            )
+        return static_configs
+
+    @timed("probe_targets")
+    def _probe_targets(self) -> Dict[str, bool]:
+        """Get whether each target is reachable, probing them at most once per dispatch.
+
+        Excluded targets that are not due to be probed again yet are not probed, and neither
+        are the targets of units that do not publish their jobs.
+        """
+        if self._reachability is None:
+            if not self._publishes_target_jobs:
+                self._reachability = {}
+                return self._reachability
+            config = self._config
+            now = time.time()
+            resting = {t for t, retry_at in self._stored.target_retry_at.items() if retry_at > now}
+            targets = [
+                t
+                for sc in self._unit_static_configs()
+                for t in sc.get("targets", [])
+                if t not in resting
+            ]
+            self._reachability = probe_reachability(
+                targets, config.scheme, config.probe_timeout, config.probe_concurrency
+            )
+        return self._reachability
 
-        targets = []
-        for config_target in raw_targets.split(","):
-            if valid_address := self._validated_address(config_target):
-                targets.append(valid_address)
+    def _excluded_targets(self) -> Set[str]:
+        """Get the targets excluded from the scrape jobs for failing too many consecutive probes.
+
+        Failed probes are only counted on update-status, see `_count_target_failures`.
+        """
+        if self._excluded is None:
+            config = self._config
+            if config.exclude_after_failures and self._publishes_target_jobs:
+                targets = {t for sc in self._unit_static_configs() for t in sc.get("targets", [])}
+                self._excluded = targets.intersection(self._stored.target_retry_at)
             else:
-                logger.error(
-                    "Targets must be specified in host:port format, and be comma-separated. "
-                    "For example: targets='foo.com:1232, boo.org:4234'",
+                self._excluded = set()
+        return self._excluded
+
+    def _count_target_failures(self) -> bool:
+        """Probe the targets, counting the consecutive failed probes of each of them.
+
+        This only runs on update-status, so that failures are spaced by the update status
+        interval rather than by however many hooks happen to run in a row. Each excluded target
+        is probed again after a backoff that doubles with each further failure, and is no
+        longer excluded as soon as it is reachable again.
+
+        Returns:
+            Whether the excluded targets changed.
+        """
+        config = self._config
+        if not (config.exclude_after_failures and self._publishes_target_jobs):
+            # only write to the stored state if anything changed, as writing saves all of it
+            if self._stored.target_failures or self._stored.target_retry_at:
+                self._stored.target_failures, self._stored.target_retry_at = {}, {}
+            return False
+
+        now = time.time()
+        failures: Dict[str, int] = dict(self._stored.target_failures)
+        retry_at: Dict[str, float] = dict(self._stored.target_retry_at)
+        for target, reachable in self._probe_targets().items():
+            if reachable:
+                failures.pop(target, None)
+                retry_at.pop(target, None)
+                continue
+            failures[target] = failures.get(target, 0) + 1
+            if (excess := failures[target] - config.exclude_after_failures) >= 0:
+                retry_at[target] = now + min(
+                    EXCLUDED_TARGET_RETRY_BACKOFF * 2**excess, EXCLUDED_TARGET_MAX_RETRY_BACKOFF
                 )
-                raise TargetValidationError(config_target)
-        return targets
+
+        # forget about the targets that are no longer configured
+        targets = {t for sc in self._unit_static_configs() for t in sc.get("targets", [])}
+        failures = {t: n for t, n in failures.items() if t in targets}
+        retry_at = {t: at for t, at in retry_at.items() if t in targets}
+        if self._stored.target_failures != failures:
+            self._stored.target_failures = failures
+        if self._stored.target_retry_at != retry_at:
+            self._stored.target_retry_at = retry_at
+
+        excluded = self._excluded_targets()
+        self._excluded = set(retry_at)
+        if self._excluded:
+            logger.warning(
+                "Excluding unreachable targets from the scrape jobs: %s",
+                ", ".join(sorted(self._excluded)),
+            )
+        return self._excluded != excluded
 
     @property
-    def _targets(self) -> list:
-        """Get a sanitised list of external scrape targets."""
+    def _publishes_target_jobs(self) -> bool:
+        """Whether this unit publishes the jobs of its targets.
+
+        The leader publishes the jobs of all the targets, unless they are sharded across units,
+        in which case every unit publishes the jobs of the targets it owns.
+        """
+        return self._config.shard_across_units or self.unit.is_leader()
+
+    def _shard_units(self) -> List[str]:
+        """Get the names of the units sharing the targets, leaving out any departing unit."""
+        units = {self.unit.name}
+        if relation := self.model.get_relation(PEER_RELATION_NAME):
+            units.update(unit.name for unit in relation.units)
+        units.discard(os.environ.get("JUJU_DEPARTING_UNIT", ""))
+        return sorted(units)
+
+    def _unit_static_configs(self) -> List[StaticConfig]:
+        """Get the static configs of the targets owned by this unit.
+
+        When sharding the targets across units, each target is owned by a single unit, chosen
+        by rendezvous hashing over the names of the units, so that only a minimal share of the
+        targets moves when units are added or removed. Otherwise, this unit owns every target.
+        """
+        config = self._config
+        if not config.shard_across_units:
+            return config.static_configs
+        if self._owned_static_configs is None:
+            assigned = assign_static_configs(config.static_configs, self._shard_units())
+            self._owned_static_configs = assigned.get(self.unit.name, [])
+        return self._owned_static_configs
+
+    def _live_static_configs(self) -> List[StaticConfig]:
+        """Get the static configs without their excluded targets.
+
+        If every target is excluded, all of them are kept instead, since publishing no targets
+        at all would make Parca fall back to scraping the default job.
+        """
+        static_configs = self._unit_static_configs()
+        if not (excluded := self._excluded_targets()):
+            return static_configs
+
+        live_static_configs = []
+        for static_config in static_configs:
+            if targets := [t for t in static_config.get("targets", []) if t not in excluded]:
+                live_static_config = static_config.copy()
+                live_static_config["targets"] = targets
+                live_static_configs.append(live_static_config)
+        return live_static_configs or static_configs
+
+    @timed("load_named_jobs")
+    def _load_named_jobs(self, static_configs: List[StaticConfig]) -> List[ScrapeJobsConfig]:
+        """Build the named scrape jobs of the `jobs` option.
+
+        Raises JobsConfigError if any named job is invalid, or if it is named like a job of
+        the other targets, `static_configs`.
+        """
+        specs = load_job_specs(str(self.model.config.get("jobs", "")))
+        if self.model.config.get("resolve_targets", False):
+            # the jobs of resolved targets are named after their hostname, see `_split_by_server_name`
+            hostnames = {
+                host_port(target, "http")[0]
+                for static_config in static_configs
+                for target in static_config.get("targets", [])
+            }
+            if clashing := sorted(hostnames.intersection(spec["job_name"] for spec in specs)):
+                raise JobsConfigError(
+                    "job names must differ from the hostnames of resolved targets: {}".format(
+                        ", ".join(clashing)
+                    )
+                )
+
+        return [self._build_named_job(spec) for spec in specs]
+
+    def _build_named_job(self, spec: JobSpec) -> ScrapeJobsConfig:
+        """Build the scrape job of a named job, validating its targets and options.
+
+        Raises JobsConfigError if any of them is invalid.
+        """
+        name = spec["job_name"]
         try:
-            return self._load_and_validate_targets()
-        except TargetValidationError:
-            logger.exception(
-                "Invalid targets found.",
-            )
-            return []
+            static_configs = validate_target_groups([(spec["labels"], spec["targets"])])
+        except TargetValidationError as e:
+            invalid_targets = ", ".join(map(repr, e.invalid_targets))
+            raise JobsConfigError(f"job {name!r} has invalid targets: {invalid_targets}") from e
+        if (scheme := spec.get("scheme", "http")) not in ("http", "https"):
+            raise JobsConfigError(f"job {name!r} has an invalid scheme: {scheme!r}")
+        interval = spec.get("scrape_interval", "").strip()
+        timeout = spec.get("scrape_timeout", "").strip()
+        profile_types = tuple(spec.get("profile_types", ()))
+        if scrape_config_error := self._scrape_config_error(interval, timeout, profile_types):
+            raise JobsConfigError(f"job {name!r} is invalid: {scrape_config_error}")
+
+        job: ScrapeJobsConfig = {"job_name": name, "static_configs": static_configs}
+        if interval:
+            job["scrape_interval"] = interval
+        if timeout:
+            job["scrape_timeout"] = timeout
+        if profile_types:
+            job["profiling_config"] = _profiling_config(profile_types)
+        if scheme == "https":
+            job["scheme"] = "https"
+            job["tls_config"] = self._named_job_tls_config(spec)
+        return job
 
-    # CONFIG VALIDATIONS
     @staticmethod
-    def _validated_address(address: str) -> str:
-        """Validate address using urllib.parse.urlparse.
+    def _named_job_tls_config(spec: JobSpec) -> TLSConfig:
+        """Build the TLS config of a named job, validating its CA cert.
 
-        Args:
-            address: must not include scheme.
+        Raises JobsConfigError if the CA cert is invalid.
         """
-        # allow spaces around the address
-        address = address.strip()
+        tls_config: TLSConfig = {
+            "insecure_skip_verify": spec.get("tls_insecure_skip_verify", False),
+        }
+        if ca := spec.get("tls_ca_cert"):
+            try:
+                ca_bundle_not_after(ca)
+            except CertificateError as e:
+                raise JobsConfigError(
+                    f"job {spec['job_name']!r} has an invalid CA cert: {e}"
+                ) from e
+            tls_config["ca"] = ca
+        if server_name := spec.get("tls_server_name"):
+            tls_config["server_name"] = server_name
+        return tls_config
 
-        # Add '//' prefix per RFC 1808, if not already there
-        # This is needed by urlparse, https://docs.python.org/3/library/urllib.parse.html
-        if not address.startswith("//"):
-            address = "//" + address
+    def _targets_file_static_configs(self) -> Tuple[List[StaticConfig], List[str]]:
+        """Get the static configs of the `targets-file` resource, if it is attached.
 
-        parsed = urlparse(address)
-        if not parsed.netloc or any([parsed.scheme, parsed.path, parsed.params, parsed.query]):
-            logger.error(
-                "Invalid target : '%s'. Targets must be specified in host:port format", address
-            )
-            return ""
+        The file is only parsed and validated again when its digest changes.
+
+        Returns:
+            The static configs of the valid targets of the file, and its invalid targets.
 
+        Raises TargetsFileError if the file is malformed.
+        """
         try:
-            _ = parsed.port  # the port property would raise an exception if the port is invalid
-            target = parsed.netloc
-        except ValueError:
-            logger.error("Invalid port for target: %s", parsed.netloc)
-            return ""
+            path = str(self.model.resources.fetch("targets-file"))
+        except (NameError, ops.ModelError):
+            return [], []
+
+        digest = file_digest(path)
+        stored = self._stored.targets_file
+        if stored.get("digest") != digest or "static_configs" not in stored:
+            static_configs, invalid_targets = [], []
+            try:
+                static_configs = validate_target_groups(load_targets_file(path))
+            except TargetValidationError as e:
+                invalid_targets = e.invalid_targets
+            self._stored.targets_file = {
+                "digest": digest,
+                "static_configs": [dict(static_config) for static_config in static_configs],
+                "invalid_targets": invalid_targets,
+            }
+            return static_configs, invalid_targets
+
+        static_configs = []
+        for stored_static_config in stored["static_configs"]:
+            static_config: StaticConfig = {"targets": list(stored_static_config["targets"])}
+            if labels := stored_static_config.get("labels"):
+                static_config["labels"] = dict(labels)
+            static_configs.append(static_config)
+        return static_configs, list(stored["invalid_targets"])
+
+    # CONFIG VALIDATIONS
+    @staticmethod
+    def _scrape_config_error(interval: str, timeout: str, profile_types: Tuple[str, ...]) -> str:
+        """Validate the scrape options, returning a description of the problem if any."""
+        for option, duration in (("scrape_interval", interval), ("scrape_timeout", timeout)):
+            if duration and _duration_seconds(duration) is None:
+                return f"`{option}` must be a valid duration."
+        if interval and timeout and _timeout_exceeds_interval(timeout, interval):
+            return "`scrape_timeout` must not exceed `scrape_interval`."
+        if unknown := sorted(set(profile_types).difference(PPROF_PROFILES)):
+            return f"Unknown profile types: {', '.join(unknown)}."
+        return ""
+
+    @staticmethod
+    def _sharding_error(shards: int, intervals: List[str], timeouts: List[str]) -> str:
+        """Validate the sharding options, returning a description of the problem if any.
+
+        The intervals and timeouts of the shards default to the global scrape interval and
+        timeout, or to an empty string if those are unset.
+        """
+        if shards < 1:
+            return "`shards` must be at least 1."
+        for option, durations in (
+            ("shard_scrape_intervals", intervals),
+            ("shard_scrape_timeouts", timeouts),
+        ):
+            if len(durations) != shards:
+                return f"`{option}` must list exactly one duration per shard."
+            if any(duration and _duration_seconds(duration) is None for duration in durations):
+                return f"`{option}` must only contain valid durations."
+        for interval, timeout in zip(intervals, timeouts):
+            if interval and timeout and _timeout_exceeds_interval(timeout, interval):
+                return "Shard scrape timeouts must not exceed the shard scrape intervals."
+        return ""
 
-        return target
+    @staticmethod
+    def _probe_config_error(timeout: str, concurrency: int, exclude_after_failures: int) -> str:
+        """Validate the probe options, returning a description of the problem if any."""
+        if not _duration_seconds(timeout):
+            return "`probe_timeout` must be a valid, positive duration."
+        if concurrency < 1:
+            return "`probe_concurrency` must be at least 1."
+        if exclude_after_failures < 0:
+            return "`exclude_after_failures` must not be negative."
+        return ""
 
     def _is_scheme_valid(self) -> bool:
         return self._scheme in ("http", "https")
 
-    def _is_tls_ca_valid(self) -> bool:
-        if ca_cert := self._tls_ca_cert:
+    def _check_tls_ca(self, ca_cert: str) -> Tuple[bool, Optional[float]]:
+        """Validate every certificate of a CA bundle, and get when the first of them expires.
+
+        The result is kept across dispatches, so that the bundle is only parsed again when it
+        changes.
+
+        Returns:
+            Whether the bundle is valid, and the expiry timestamp of its first certificate to
+            expire, or None if there is no bundle or if it is invalid.
+        """
+        if not ca_cert:
+            return True, None
+
+        digest = hashlib.sha256(ca_cert.encode("utf-8")).hexdigest()
+        if self._stored.tls_ca.get("digest") != digest:
+            not_after = None
             try:
-                # An exception will be raised if the certificate string is improperly formatted.
-                ssl.PEM_cert_to_DER_cert(ca_cert)
-            except ValueError as e:
+                not_after = min(ca_bundle_not_after(ca_cert))
+            except CertificateError as e:
                 logger.error("Invalid CA cert provided %s", str(e))
-                return False
-
-        return True
+            self._stored.tls_ca = {"digest": digest, "not_after": not_after}
 
-    # EVENT HANDLERS
-    def _on_collect_unit_status(self, event: ops.CollectStatusEvent):
-        """Set unit status depending on the state."""
-        no_targets = targets_invalid = None
-        try:
-            no_targets = not self._load_and_validate_targets()
-        except TargetValidationError:
-            targets_invalid = True
+        not_after = self._stored.tls_ca["not_after"]
+        return not_after is not None, not_after
 
-        if no_targets:
-            event.add_status(
+    def _targets_statuses(self) -> List[ops.StatusBase]:
+        """Report missing targets, and invalid targets or groups of targets."""
+        config = self._config
+        statuses: List[ops.StatusBase] = []
+        if not (
+            config.static_configs
+            or config.invalid_targets
+            or config.static_configs_error
+            or config.targets_file_error
+            or config.named_jobs
+            or config.jobs_error
+        ):
+            statuses.append(
                 ops.BlockedStatus(
                     f"No targets specified. "
                     f"Please run: `juju config {self.app.name} "
                     f"targets='<scrape target1>, <scrape target2>, ...'"
                 )
             )
-        if targets_invalid:
-            event.add_status(ops.BlockedStatus("Targets config invalid. See logs for more."))
+        if invalid_count := len(config.invalid_targets):
+            statuses.append(
+                ops.BlockedStatus(
+                    f"Targets config invalid: {invalid_count} invalid target(s). See logs for more."
+                )
+            )
+        if config.static_configs_error:
+            statuses.append(
+                ops.BlockedStatus("Invalid `static_configs` provided. See logs for more.")
+            )
+        if config.targets_file_error:
+            statuses.append(
+                ops.BlockedStatus("Invalid `targets-file` resource provided. See logs for more.")
+            )
+        if config.jobs_error:
+            statuses.append(ops.BlockedStatus("Invalid `jobs` provided. See logs for more."))
+        return statuses
+
+    def _tls_ca_status(self) -> Optional[ops.StatusBase]:
+        """Report invalid or expired certificates in `tls_ca_cert`, and those about to expire."""
+        config = self._config
+        if not config.tls_ca_valid:
+            return ops.BlockedStatus("Invalid certificate provided for `tls_ca_cert`.")
+        if config.tls_ca_not_after is None:
+            return None
+        if (remaining := config.tls_ca_not_after - time.time()) <= 0:
+            return ops.BlockedStatus("Expired certificate provided for `tls_ca_cert`.")
+        if remaining < CA_EXPIRY_WARNING:
+            return ops.ActiveStatus(
+                f"A certificate of `tls_ca_cert` expires in {int(remaining // 86400)} day(s)."
+            )
+        return None
+
+    def _reachability_status(self) -> ops.ActiveStatus:
+        """Report how many targets are reachable, unreachable and excluded."""
+        reachability = self._probe_targets()
+        reachable = sum(reachability.values())
+        message = f"{reachable} reachable, {len(reachability) - reachable} unreachable target(s)"
+        if excluded := self._excluded_targets():
+            message += f", {len(excluded)} excluded"
+        return ops.ActiveStatus(message)
+
+    # EVENT HANDLERS
+    @timed("collect_unit_status")
+    def _on_collect_unit_status(self, event: ops.CollectStatusEvent):
+        """Set unit status depending on the state."""
+        config = self._config
+        for status in self._targets_statuses():
+            event.add_status(status)
         if not self._is_scheme_valid():
             event.add_status(ops.BlockedStatus("Invalid `scheme` provided."))
-        if not self._is_tls_ca_valid():
-            event.add_status(ops.BlockedStatus("Invalid certificate provided for `tls_ca_cert`."))
+        if config.scrape_config_error:
+            event.add_status(
+                ops.BlockedStatus(f"Invalid scrape config: {config.scrape_config_error}")
+            )
+        if config.sharding_error:
+            event.add_status(
+                ops.BlockedStatus(f"Invalid sharding config: {config.sharding_error}")
+            )
+        if tls_ca_status := self._tls_ca_status():
+            event.add_status(tls_ca_status)
+        if config.probe_config_error:
+            event.add_status(
+                ops.BlockedStatus(f"Invalid probe config: {config.probe_config_error}")
+            )
+        if config.partition_config_error:
+            event.add_status(
+                ops.BlockedStatus(f"Invalid partition config: {config.partition_config_error}")
+            )
+        if config.probe_targets and config.static_configs and self._publishes_target_jobs:
+            event.add_status(self._reachability_status())
         event.add_status(ops.ActiveStatus())
 
+    def _on_update_status(self, _event: ops.UpdateStatusEvent):
+        """Count failed probes, resolve expired target hostnames and discover profile types.
+
+        Any change to the scrape jobs is published.
+        """
+        changed = self._count_target_failures()
+        changed = self._refresh_resolutions() or changed
+        if self._discovers_profile_types:
+            changed = self._discover_profile_types() or changed
+        if changed:
+            self._update_scrape_jobs()
+
+    def _on_config_changed(self, _event: ops.ConfigChangedEvent):
+        """Discover the profile types of newly configured targets, and publish any change."""
+        if self._discovers_profile_types and self._discover_profile_types():
+            self._update_scrape_jobs()
+
+    def _update_scrape_jobs(self):
+        """Publish the scrape jobs again, after they changed during this dispatch."""
+        self._profiling.update_scrape_job_spec(
+            self._scrape_jobs or [],
+            unit_jobs=self._unit_scrape_jobs,
+            relation_jobs=self._relation_scrape_jobs,
+        )
+
+    def _refresh_resolutions(self) -> bool:
+        """Resolve the target hostnames whose addresses expired.
+
+        Returns:
+            Whether the address of any target hostname changed.
+        """
+        if not self._config.resolve_targets:
+            return False
+        now = time.time()
+        addresses = self._resolved_addresses()
+        if expired := [
+            hostname
+            for hostname, resolution in self._stored.resolved_hostnames.items()
+            if resolution["expiry"] <= now
+        ]:
+            self._resolve(expired)
+            return self._resolved_addresses() != addresses
+        return False
+
+    def _on_commit(self, _event: ops.CommitEvent):
+        """Save the instrumentation of this dispatch, once all handlers have run."""
+        if not self._instrumentation:
+            return
+        publish_stats = self._profiling.publish_stats
+        self._instrumentation.record("publish_all_relation_data", publish_stats["seconds"])
+        self._instrumentation.count("relations_touched", int(publish_stats["relations_touched"]))
+        self._instrumentation.count("bytes_published", int(publish_stats["bytes_published"]))
+        self._instrumentation.dump(os.environ.get("JUJU_DISPATCH_PATH", ""))
+
 
 if __name__ == "__main__":
     ops.main(ParcaScrapeTargetCharm)
@@ -0,0 +1,148 @@
+# Copyright 2025 Canonical
+# See LICENSE file for licensing details.
+
+"""Discovery of the profiles served by scrape targets, from their pprof index."""
+
+import re
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Optional
+
+from probe import host_port
+
+if TYPE_CHECKING:
+    import asyncio
+
+PPROF_INDEX_PATH = "/debug/pprof/"
+# the index of a handful of profiles is a few KiB, anything much larger is not a pprof index
+MAX_INDEX_SIZE = 1024 * 1024
+
+# links to the profiles listed by the index, e.g. <a href='allocs?debug=1'>allocs</a>
+_PROFILE_LINK = re.compile(r"""href=['"]?(?:\./|/debug/pprof/)?([\w.-]+)(?:\?[^'"\s>]*)?['"\s>]""")
+
+
+def parse_pprof_index(index: str) -> FrozenSet[str]:
+    """Get the names of the profiles linked from a pprof index page, e.g. "profile" or "block"."""
+    return frozenset(_PROFILE_LINK.findall(index))
+
+
+async def _fetch_index(
+    target: str,
+    scheme: str,
+    ssl_context,
+    server_name: str,
+    timeout: float,
+    semaphore: "asyncio.Semaphore",
+) -> Optional[FrozenSet[str]]:
+    import asyncio
+
+    host, port = host_port(target, scheme)
+    # HTTP/1.0, so that the response is neither chunked nor kept alive
+    request = (
+        f"GET {PPROF_INDEX_PATH} HTTP/1.0\r\nHost: {target}\r\nAccept: text/html\r\n\r\n"
+    ).encode("ascii")
+
+    async def fetch() -> bytes:
+        reader, writer = await asyncio.open_connection(
+            host,
+            port,
+            ssl=ssl_context,
+            server_hostname=(server_name or host) if ssl_context else None,
+        )
+        try:
+            writer.write(request)
+            await writer.drain()
+            # the response may arrive in several segments, so it is read until the server closes
+            # the connection, as it does after responding to HTTP/1.0 requests
+            response = b""
+            while len(response) < MAX_INDEX_SIZE:
+                chunk = await reader.read(MAX_INDEX_SIZE - len(response))
+                if not chunk:
+                    break
+                response += chunk
+            return response
+        finally:
+            writer.close()
+
+    async with semaphore:
+        try:
+            response = await asyncio.wait_for(fetch(), timeout)
+        # the idna codec raises UnicodeError for hostnames with empty or over-long labels
+        except (OSError, UnicodeError, asyncio.TimeoutError):
+            return None
+
+    head, _, body = response.partition(b"\r\n\r\n")
+    status_line = head.split(b"\r\n", 1)[0].split()
+    if len(status_line) < 2 or status_line[1] != b"200":
+        return None
+    # an index that links to no profile is more likely truncated or not a pprof index at all
+    # than served by a target that has no profiles
+    return parse_pprof_index(body.decode("utf-8", errors="replace")) or None
+
+
+async def _discover_all(
+    targets: List[str],
+    scheme: str,
+    ca_cert: str,
+    server_name: str,
+    insecure_skip_verify: bool,
+    timeout: float,
+    concurrency: int,
+) -> List[Optional[FrozenSet[str]]]:
+    import asyncio
+
+    ssl_context = None
+    if scheme == "https":
+        import ssl
+
+        try:
+            ssl_context = ssl.create_default_context(cadata=ca_cert or None)
+        except ssl.SSLError:
+            return [None] * len(targets)
+        if insecure_skip_verify:
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+
+    # the semaphore must be created within the event loop it is used in
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(
+        *(
+            _fetch_index(target, scheme, ssl_context, server_name, timeout, semaphore)
+            for target in targets
+        )
+    )
+
+
+def discover_profiles(
+    targets: List[str],
+    scheme: str,
+    timeout: float,
+    concurrency: int,
+    ca_cert: str = "",
+    server_name: str = "",
+    insecure_skip_verify: bool = False,
+) -> Dict[str, Optional[FrozenSet[str]]]:
+    """Get the profiles served by each target, by requesting their pprof index concurrently.
+
+    Args:
+        targets: normalized `host[:port]` targets.
+        scheme: the scheme the targets are scraped with.
+        timeout: how long to wait for the index of each target, in seconds.
+        concurrency: the maximum number of indexes being requested at once.
+        ca_cert: the CA certificate to validate the targets' certificates with, for https.
+        server_name: the name to validate the targets' certificates against, for https.
+        insecure_skip_verify: whether not to validate the targets' certificates, for https.
+
+    Returns:
+        A mapping of each target to the names of the profiles its index links to, or to None if
+        its index could not be fetched or links to no profile.
+    """
+    if not targets:
+        return {}
+    # asyncio is only imported when profile types are discovered, see `probe_reachability`
+    import asyncio
+
+    indexes = asyncio.run(
+        _discover_all(
+            targets, scheme, ca_cert, server_name, insecure_skip_verify, timeout, concurrency
+        )
+    )
+    return dict(zip(targets, indexes))
@@ -0,0 +1,85 @@
+# Copyright 2025 Canonical
+# See LICENSE file for licensing details.
+
+"""Opt-in timing and counter instrumentation of charm dispatches."""
+
+import functools
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar, cast
+
+logger = logging.getLogger(__name__)
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+
+class Instrumentation:
+    """Timings and counters collected over a single dispatch.
+
+    Timings are in seconds and, like counters, accumulate if the same section runs several times.
+    When dumped, they are logged at debug level and appended as a single JSON line to a local
+    file, so that the records of successive dispatches can be collected and compared.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.timings: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+
+    def record(self, name: str, seconds: float):
+        """Add `seconds` to the timing of section `name`."""
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def count(self, name: str, value: int = 1):
+        """Add `value` to counter `name`."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as section `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def dump(self, dispatch: str):
+        """Log the collected timings and counters, and append them to the instrumentation file."""
+        record = json.dumps(
+            {
+                "dispatch": dispatch,
+                "timestamp": time.time(),
+                "timings": self.timings,
+                "counters": self.counters,
+            },
+            sort_keys=True,
+        )
+        logger.debug("instrumentation: %s", record)
+        try:
+            with open(self.path, "a") as f:
+                f.write(record + "\n")
+        except OSError as e:
+            logger.warning("failed to write instrumentation to %s: %s", self.path, e)
+
+
+def timed(name: str) -> Callable[[_F], _F]:
+    """Decorate a method so that its execution is timed as section `name`.
+
+    The instance must have an `_instrumentation` attribute, which is None when instrumentation
+    is disabled, in which case the method is called directly.
+    """
+
+    def decorator(method: _F) -> _F:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            instrumentation: Optional[Instrumentation] = self._instrumentation
+            if instrumentation is None:
+                return method(self, *args, **kwargs)
+            with instrumentation.timer(name):
+                return method(self, *args, **kwargs)
+
+        return cast(_F, wrapper)
+
+    return decorator
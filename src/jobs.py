@@ -0,0 +1,107 @@
+# Copyright 2025 Canonical
+# See LICENSE file for licensing details.
+
+"""Parsing of the named scrape jobs provided by config."""
+
+import re
+from typing import Any, Dict, List
+
+from targets import LABEL_NAME_PATTERN, load_json_or_yaml
+
+JOB_NAME_PATTERN = re.compile(r"^[a-zA-Z0-9_.-]+$")
+# names of the jobs the charm generates for the targets of its other options, see
+# `ParcaScrapeTargetCharm._job_name`
+GENERATED_JOB_NAME_PATTERN = re.compile(r"^(?:shard-\d+(?:-|$)|profiles-)")
+
+# options of a named job, mapped to the types of their values
+_JOB_SPEC_TYPES: Dict[str, type] = {
+    "job_name": str,
+    "targets": list,
+    "labels": dict,
+    "scheme": str,
+    "tls_ca_cert": str,
+    "tls_server_name": str,
+    "tls_insecure_skip_verify": bool,
+    "scrape_interval": str,
+    "scrape_timeout": str,
+    "profile_types": list,
+}
+
+# a named job, as provided by config
+JobSpec = Dict[str, Any]
+
+
+class JobsConfigError(Exception):
+    """Raised if the named scrape jobs provided by config are malformed."""
+
+
+def _string_list(name: str, option: str, items: Any) -> List[str]:
+    """Check a list option of a named job, splitting it if it is a comma-separated string."""
+    if isinstance(items, str):
+        items = [item.strip() for item in items.split(",") if item.strip()]
+    if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+        raise JobsConfigError(f"{option} of job {name!r} must be a list of strings")
+    return items
+
+
+def _normalize_job_spec(index: int, spec: Any) -> JobSpec:
+    """Check the options of a named job, splitting comma-separated targets and profile types."""
+    if not isinstance(spec, dict) or not isinstance(spec.get("job_name"), str):
+        raise JobsConfigError(f"job #{index} must be a mapping with a job_name")
+    name = spec["job_name"]
+    if not JOB_NAME_PATTERN.match(name):
+        raise JobsConfigError(f"job #{index} has an invalid job_name: {name!r}")
+    if GENERATED_JOB_NAME_PATTERN.match(name):
+        raise JobsConfigError(f"job {name!r} has a name reserved for the jobs of other targets")
+    if unknown := sorted(set(spec).difference(_JOB_SPEC_TYPES)):
+        raise JobsConfigError(f"job {name!r} has unknown options: {', '.join(unknown)}")
+
+    spec = dict(spec)
+    for option in ("targets", "profile_types"):
+        spec[option] = _string_list(name, option, spec.get(option, []))
+    if not spec["targets"]:
+        raise JobsConfigError(f"job {name!r} must have targets")
+    for option, value in spec.items():
+        if not isinstance(value, (expected := _JOB_SPEC_TYPES[option])):
+            raise JobsConfigError(f"{option} of job {name!r} must be a {expected.__name__}")
+
+    labels = spec.get("labels", {})
+    if not all(isinstance(label, str) and LABEL_NAME_PATTERN.match(label) for label in labels):
+        raise JobsConfigError(f"labels of job {name!r} must have valid names")
+    spec["labels"] = {label: str(value) for label, value in labels.items()}
+    return spec
+
+
+def load_job_specs(raw_jobs: str) -> List[JobSpec]:
+    """Load named scrape jobs, as a JSON or YAML list.
+
+    Each job is a mapping with a unique `job_name` and `targets`, and optionally its own
+    `labels`, `scheme`, `tls_ca_cert`, `tls_server_name`, `tls_insecure_skip_verify`,
+    `scrape_interval`, `scrape_timeout` and `profile_types`, e.g.
+
+        - job_name: checkout
+          targets: ["foo.com:1232", "10.0.0.0/24:7000"]
+          scheme: https
+          scrape_interval: 30s
+
+    Only the shape of the jobs is checked here. Their targets and the values of their options
+    are validated when building their scrape jobs.
+
+    Raises:
+        JobsConfigError: if the jobs are not a list of valid job mappings with unique names.
+    """
+    if not raw_jobs.strip():
+        return []
+
+    try:
+        raw_specs = load_json_or_yaml(raw_jobs)
+    except ValueError as e:
+        raise JobsConfigError(f"jobs are neither valid JSON nor YAML: {e}") from e
+    if not isinstance(raw_specs, list):
+        raise JobsConfigError("jobs must be a list")
+
+    specs = [_normalize_job_spec(index, spec) for index, spec in enumerate(raw_specs)]
+    names = [spec["job_name"] for spec in specs]
+    if duplicates := sorted({name for name in names if names.count(name) > 1}):
+        raise JobsConfigError(f"job names must be unique: {', '.join(duplicates)}")
+    return specs
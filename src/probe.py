@@ -0,0 +1,74 @@
+# Copyright 2025 Canonical
+# See LICENSE file for licensing details.
+
+"""Concurrent reachability probing of scrape targets."""
+
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    import asyncio
+
+# ports that targets without an explicit port are scraped on, by scheme
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def host_port(target: str, scheme: str) -> Tuple[str, int]:
+    """Split a normalized `host[:port]` target, defaulting the port according to the scheme."""
+    if target.startswith("["):
+        host, _, port = target[1:].partition("]")
+        port = port.lstrip(":")
+    else:
+        host, _, port = target.partition(":")
+    return host, int(port) if port else DEFAULT_PORTS.get(scheme, 80)
+
+
+async def _probe(target: str, scheme: str, timeout: float, semaphore: "asyncio.Semaphore") -> bool:
+    import asyncio
+
+    host, port = host_port(target, scheme)
+    async with semaphore:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        # the idna codec raises UnicodeError for hostnames it cannot encode, e.g. those whose
+        # labels are over 63 characters long once punycode-encoded
+        except (OSError, UnicodeError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+
+
+async def _probe_all(
+    targets: List[str], scheme: str, timeout: float, concurrency: int
+) -> List[bool]:
+    import asyncio
+
+    # the semaphore must be created within the event loop it is used in
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*(_probe(t, scheme, timeout, semaphore) for t in targets))
+
+
+def probe_reachability(
+    targets: List[str], scheme: str, timeout: float, concurrency: int
+) -> Dict[str, bool]:
+    """Check whether a TCP connection can be opened to each target, concurrently.
+
+    Args:
+        targets: normalized `host[:port]` targets.
+        scheme: the scheme the targets are scraped with, which determines their default port.
+        timeout: how long to wait for each connection to be established, in seconds.
+        concurrency: the maximum number of connections being established at once.
+
+    Returns:
+        A mapping of each target to whether it is reachable.
+    """
+    if not targets:
+        return {}
+    # importing asyncio takes longer than importing the rest of the charm, so it is only
+    # imported when targets are actually probed
+    import asyncio
+
+    return dict(zip(targets, asyncio.run(_probe_all(targets, scheme, timeout, concurrency))))
@@ -0,0 +1,44 @@
+# Copyright 2025 Canonical
+# See LICENSE file for licensing details.
+
+"""Concurrent resolution of the hostnames of scrape targets."""
+
+import ipaddress
+import socket
+from typing import Dict, List, Optional
+
+
+def is_ip_address(host: str) -> bool:
+    """Check whether the host of a target is an IP address rather than a hostname."""
+    try:
+        # IPv6 addresses may have a zone identifier
+        ipaddress.ip_address(host.split("%", 1)[0])
+    except ValueError:
+        return False
+    return True
+
+
+def _resolve(hostname: str) -> Optional[str]:
+    try:
+        addresses = socket.getaddrinfo(hostname, None, type=socket.SOCK_STREAM)
+    # the idna codec raises UnicodeError for hostnames it cannot encode
+    except (OSError, UnicodeError):
+        return None
+    # getaddrinfo sorts the addresses by preference, as per RFC 6724
+    return str(addresses[0][4][0]) if addresses else None
+
+
+def resolve_hostnames(hostnames: List[str], workers: int) -> Dict[str, Optional[str]]:
+    """Resolve hostnames concurrently, in a pool of at most `workers` threads.
+
+    Returns:
+        A mapping of each hostname to its preferred IP address, or to None if it could not be
+        resolved.
+    """
+    if not hostnames:
+        return {}
+    # concurrent.futures is only imported when hostnames are resolved, as it is slow to import
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(hostnames))) as pool:
+        return dict(zip(hostnames, pool.map(_resolve, hostnames)))
@@ -0,0 +1,99 @@
+# Copyright 2025 Canonical
+# See LICENSE file for licensing details.
+
+"""Stable assignment of scrape targets to shards."""
+
+import hashlib
+import heapq
+from typing import Dict, Iterable, List, Sequence
+
+from targets import StaticConfig
+
+
+def _key(target: str) -> int:
+    """Hash a target to a 64-bit integer that is stable across processes."""
+    return int.from_bytes(hashlib.blake2b(target.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Map a 64-bit key to one of `buckets` buckets with Lamping and Veach's jump hash.
+
+    When the number of buckets grows from n to n+1, only 1/(n+1) of the keys move, and they all
+    move to the new bucket.
+    """
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+def shard_of(target: str, shards: int) -> int:
+    """Get the shard a target belongs to.
+
+    The shard only depends on the target itself, so adding or removing other targets never moves
+    a target to another shard.
+    """
+    return jump_hash(_key(target), shards)
+
+
+def shard_targets(targets: Iterable[str], shards: int) -> List[List[str]]:
+    """Split targets into `shards` lists, preserving their relative order."""
+    if shards == 1:
+        return [list(targets)]
+
+    sharded: List[List[str]] = [[] for _ in range(shards)]
+    for target in targets:
+        sharded[shard_of(target, shards)].append(target)
+    return sharded
+
+
+def shard_static_configs(
+    static_configs: List[StaticConfig], shards: int
+) -> List[List[StaticConfig]]:
+    """Split static configs into `shards` lists of static configs.
+
+    Each static config is split according to the shards of its targets, keeping its labels.
+    """
+    if shards == 1:
+        return [static_configs]
+
+    sharded: List[List[StaticConfig]] = [[] for _ in range(shards)]
+    for static_config in static_configs:
+        for shard, targets in enumerate(shard_targets(static_config.get("targets", []), shards)):
+            if targets:
+                shard_static_config = static_config.copy()
+                shard_static_config["targets"] = targets
+                sharded[shard].append(shard_static_config)
+    return sharded
+
+
+def owners(target: str, members: Sequence[str], replicas: int = 1) -> List[str]:
+    """Get the members a target is assigned to, with rendezvous (highest random weight) hashing.
+
+    Each member weighs each target with a hash of both, and a target is assigned to the
+    `replicas` members that weigh it the most. When a member joins, it only takes over the
+    targets it weighs the most, and when a member leaves, only its targets are reassigned.
+    """
+    return heapq.nlargest(replicas, members, key=lambda member: _key(f"{member}\0{target}"))
+
+
+def assign_static_configs(
+    static_configs: List[StaticConfig], members: Sequence[str], replicas: int = 1
+) -> Dict[str, List[StaticConfig]]:
+    """Split static configs between members, assigning each target to `replicas` of them.
+
+    Each static config is split according to the owners of its targets, keeping its labels.
+    """
+    assigned: Dict[str, List[StaticConfig]] = {member: [] for member in members}
+    for static_config in static_configs:
+        member_targets: Dict[str, List[str]] = {}
+        for target in static_config.get("targets", []):
+            for member in owners(target, members, replicas):
+                member_targets.setdefault(member, []).append(target)
+        for member, targets in member_targets.items():
+            member_static_config = static_config.copy()
+            member_static_config["targets"] = targets
+            assigned[member].append(member_static_config)
+    return assigned
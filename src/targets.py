@@ -0,0 +1,353 @@
+# Copyright 2025 Canonical
+# See LICENSE file for licensing details.
+
+"""Parsing and validation of external scrape targets."""
+
+import hashlib
+import ipaddress
+import json
+import mmap
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypedDict
+
+import yaml
+
+MAX_PORT = 65535
+
+# the most targets a single entry with a network range and/or a port range may expand to
+MAX_EXPANDED_TARGETS = 4096
+# the most targets that may be configured in total, once expanded
+MAX_TARGETS = 65536
+
+# reference: https://prometheus.io/docs/concepts/data_model/#metric-names-and-labels
+LABEL_NAME_PATTERN = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_]*$")
+
+# labels and raw target entries of a group of targets, as provided by config
+TargetGroup = Tuple[Dict[str, str], Iterable[str]]
+
+# files of targets at least this large are memory-mapped, rather than read through a buffer
+MMAP_THRESHOLD = 1024 * 1024
+
+# Matches a single entry of a comma-separated list of targets, anchored to the start of the
+# string or to the comma preceding it. An entry is either a valid `host[:port]` target, where
+# host is a hostname, an IPv4 address or a bracketed IPv6 address, or anything else up to the
+# next comma, which is captured as invalid. The labels of hostnames must be 1 to 63 characters
+# long, so that they can be encoded. Addresses may have a network prefix length and ports may
+# be ranges, e.g. `10.0.0.0/24:7000` or `foo.com:7000-7010`.
+_TARGET_ENTRY = re.compile(
+    r"""
+    (?:^|,)
+    (?:
+        \s*
+        (?:
+            \[(?P<ipv6>[0-9A-Fa-f:.]+)(?P<zone>%[\w.~-]+)?   # IPv6 address, optional zone
+            (?:/(?P<ipv6_prefix>\d{1,3}))?\]                 # and prefix length
+            |
+            (?P<host>                                        # hostname or IPv4 address
+                [^\s:/?#@\[\],.]{1,63}(?:\.[^\s:/?#@\[\],.]{1,63})*\.?
+            )
+            (?:/(?P<prefix>\d{1,2}))?                        # and prefix length
+        )
+        (?::(?P<port>\d{1,5})(?:-(?P<last_port>\d{1,5}))?)?  # port or range of ports
+        \s*
+        (?=,|$)
+        |
+        (?P<invalid>[^,]*)
+    )
+    """,
+    re.VERBOSE,
+)
+
+
+class StaticConfig(TypedDict, total=False):
+    """Static config type."""
+
+    targets: List[str]
+    labels: Dict[str, str]
+
+
+class StaticConfigsError(Exception):
+    """Raised if the structured static configs provided by config are malformed."""
+
+
+class TargetsFileError(Exception):
+    """Raised if a file of targets is malformed."""
+
+
+class TargetValidationError(Exception):
+    """Raised if some external scrape target as provided by config is invalid."""
+
+    def __init__(self, invalid_targets: List[str]):
+        self.invalid_targets = invalid_targets
+        super().__init__("Invalid targets: {}".format(", ".join(map(repr, invalid_targets))))
+
+
+def _expand_ranges(
+    entry: str, host: str, prefix: Optional[str], port: Optional[str], last_port: Optional[str]
+) -> Iterator[Tuple[Optional[str], str]]:
+    """Lazily expand an entry with a network range and/or a port range into its targets.
+
+    The addresses of a network exclude its network and broadcast addresses, if it has more
+    than two. Entries that would expand to more than `MAX_EXPANDED_TARGETS` are invalid.
+    """
+    ports: Sequence[Optional[int]] = (int(port),) if port else (None,)
+    if last_port is not None:
+        if not port or not int(port) <= int(last_port) <= MAX_PORT:
+            yield None, entry
+            return
+        ports = range(int(port), int(last_port) + 1)
+
+    hosts: Iterable[str] = (host,)
+    size = len(ports)
+    if prefix is not None:
+        try:
+            network = ipaddress.ip_network(f"{host.strip('[]')}/{prefix}")
+        except ValueError:
+            yield None, entry
+            return
+        addresses = network.hosts() if network.num_addresses > 2 else iter(network)
+        template = "[{}]" if network.version == 6 else "{}"
+        hosts = map(template.format, addresses)
+        size *= network.num_addresses
+    if size > MAX_EXPANDED_TARGETS:
+        yield None, entry
+        return
+
+    for expanded_host in hosts:
+        for expanded_port in ports:
+            if expanded_port is None:
+                yield expanded_host, entry
+            else:
+                yield f"{expanded_host}:{expanded_port}", entry
+
+
+def scan_targets(raw_targets: str) -> Iterator[Tuple[Optional[str], str]]:
+    """Lazily scan a comma-separated list of scrape targets.
+
+    Valid targets are normalized: hostnames and addresses are lowercased, since they are case
+    insensitive, and ports are stripped of leading zeros. Entries with a network range or a
+    port range, e.g. `10.0.0.0/24:7000` or `foo.com:7000-7010`, are lazily expanded into one
+    target per address and port.
+
+    Args:
+        raw_targets: the comma-separated targets, e.g. "foo.com:1232, boo.org:4234".
+
+    Yields:
+        A `(target, entry)` tuple for each target of `raw_targets`, where `target` is the
+        normalized target, or None if `entry` is not a valid target or range of targets.
+    """
+    if not raw_targets:
+        return
+
+    for match in _TARGET_ENTRY.finditer(raw_targets):
+        entry = match.group().lstrip(",").strip()
+        host, ipv6, zone, port = match.group("host", "ipv6", "zone", "port")
+        if match.group("invalid") is not None or (port and int(port) > MAX_PORT):
+            yield None, entry
+            continue
+
+        if ipv6:
+            # the pattern only checks the characters of IPv6 addresses, not their syntax
+            try:
+                ipaddress.IPv6Address(ipv6)
+            except ValueError:
+                yield None, entry
+                continue
+            # IPv6 zone identifiers are interface names, which are case sensitive
+            target = "[{}{}]".format(ipv6.lower(), zone or "")
+        else:
+            target = host.lower()
+        prefix = match.group("ipv6_prefix") or match.group("prefix")
+        last_port = match.group("last_port")
+        if prefix is not None or last_port is not None:
+            yield from _expand_ranges(entry, target, prefix, port, last_port)
+            continue
+        if port:
+            target = "{}:{}".format(target, int(port))
+        yield target, entry
+
+
+def load_json_or_yaml(raw: str) -> Any:
+    """Load a JSON or YAML list, trying the JSON parser first.
+
+    Raises:
+        ValueError: if `raw` is neither valid JSON nor valid YAML.
+    """
+    # JSON is much faster to load than YAML, which it is a subset of
+    if raw.lstrip().startswith("["):
+        return json.loads(raw)
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    try:
+        return yaml.load(raw, Loader=loader)
+    except yaml.YAMLError as e:
+        raise ValueError(str(e)) from e
+
+
+def load_target_groups(raw_static_configs: str) -> List[TargetGroup]:
+    """Load structured static configs, as a JSON or YAML list of target groups.
+
+    Each group is a mapping with a `targets` key, holding either a list of targets or a
+    comma-separated string of targets, and an optional `labels` mapping, e.g.
+
+        - targets: ["foo.com:1232", "boo.org:4234"]
+          labels: {region: eu, tier: backend}
+
+    The targets themselves are not validated here, see `validate_target_groups`.
+
+    Raises:
+        StaticConfigsError: if the static configs are not a list of valid target groups.
+    """
+    if not raw_static_configs.strip():
+        return []
+
+    try:
+        static_configs = load_json_or_yaml(raw_static_configs)
+    except ValueError as e:
+        raise StaticConfigsError(f"static configs are neither valid JSON nor YAML: {e}") from e
+
+    if not isinstance(static_configs, list):
+        raise StaticConfigsError("static configs must be a list")
+
+    groups = []
+    for index, static_config in enumerate(static_configs):
+        if not isinstance(static_config, dict) or "targets" not in static_config:
+            raise StaticConfigsError(f"static config #{index} must be a mapping with targets")
+        targets, labels = static_config["targets"], static_config.get("labels") or {}
+        if isinstance(targets, str):
+            targets = [targets]
+        if not isinstance(targets, list) or not all(isinstance(t, str) for t in targets):
+            raise StaticConfigsError(f"targets of static config #{index} must be strings")
+        if not isinstance(labels, dict) or not all(
+            isinstance(name, str) and LABEL_NAME_PATTERN.match(name) for name in labels
+        ):
+            raise StaticConfigsError(f"labels of static config #{index} must have valid names")
+        groups.append(({name: str(value) for name, value in labels.items()}, targets))
+    return groups
+
+
+def validate_target_groups(
+    groups: Iterable[TargetGroup], max_targets: int = MAX_TARGETS
+) -> List[StaticConfig]:
+    """Validate groups of targets into static configs, one group at a time.
+
+    Each target must be in `host:port` format and must not include a scheme, a path or any
+    other URL component, see `scan_targets`. Whitespace around each target is ignored, and a
+    target that appears several times, after normalization, is only kept where it first
+    appears, so that it is never scraped twice. Groups without targets are dropped.
+
+    Args:
+        groups: `(labels, entries)` tuples, where each entry is a comma-separated list of
+            targets.
+        max_targets: the most unique targets the groups may have in total, once expanded.
+
+    Raises:
+        TargetValidationError: listing every invalid target across all groups, if there is any.
+            If the groups have more than `max_targets` targets, the entry that exceeds it is
+            invalid and the groups are not validated any further.
+    """
+    seen = set()
+    invalid_targets = []
+    static_configs = []
+    for labels, entries in groups:
+        targets = []
+        for entry in entries:
+            for target, raw_target in scan_targets(entry):
+                if target is None:
+                    invalid_targets.append(raw_target)
+                elif target not in seen:
+                    if len(seen) >= max_targets:
+                        # stop there, rather than expanding any further ranges of targets
+                        invalid_targets.append(raw_target)
+                        raise TargetValidationError(invalid_targets)
+                    seen.add(target)
+                    targets.append(target)
+
+        if targets:
+            static_config: StaticConfig = {"targets": targets}
+            if labels:
+                static_config["labels"] = labels
+            static_configs.append(static_config)
+
+    if invalid_targets:
+        raise TargetValidationError(invalid_targets)
+    return static_configs
+
+
+def merge_static_configs(
+    static_configs: List[StaticConfig], other_static_configs: List[StaticConfig]
+) -> List[StaticConfig]:
+    """Append validated static configs to others, leaving out the targets they already have.
+
+    This is equivalent to validating the groups of targets of both together, see
+    `validate_target_groups`, without validating them again.
+    """
+    seen = {t for static_config in static_configs for t in static_config.get("targets", [])}
+    merged = list(static_configs)
+    for static_config in other_static_configs:
+        other_targets = static_config.get("targets", [])
+        targets = [target for target in other_targets if target not in seen]
+        if len(targets) == len(other_targets):
+            merged.append(static_config)
+        elif targets:
+            merged_static_config = static_config.copy()
+            merged_static_config["targets"] = targets
+            merged.append(merged_static_config)
+    return merged
+
+
+def _read_lines(path: str) -> Iterator[bytes]:
+    """Lazily read the lines of a file, memory-mapping it if it is large."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            yield from f
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield from iter(mapped.readline, b"")
+
+
+def file_digest(path: str) -> str:
+    """Get the SHA-256 digest of a file, memory-mapping it if it is large."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                digest.update(chunk)
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+    return digest.hexdigest()
+
+
+def load_targets_file(path: str) -> List[TargetGroup]:
+    """Load a file of targets, one per line, optionally followed by labels, e.g.
+
+        # comments and blank lines are ignored
+        192.168.5.2:7000
+        192.168.5.3:7000 region=eu tier=backend
+
+    The file is read one line at a time. Targets with the same labels are grouped together, in
+    the order in which their labels first appear. The targets themselves are not validated
+    here, see `validate_target_groups`.
+
+    Raises:
+        TargetsFileError: if the file is not valid UTF-8, or if a label is malformed.
+    """
+    groups: Dict[Tuple[Tuple[str, str], ...], List[str]] = {}
+    for number, raw_line in enumerate(_read_lines(path), 1):
+        try:
+            line = raw_line.decode("utf-8").split("#", 1)[0].strip()
+        except UnicodeDecodeError as e:
+            raise TargetsFileError(f"line {number} is not valid UTF-8") from e
+        if not line:
+            continue
+
+        target, *raw_labels = line.split()
+        labels = []
+        for raw_label in raw_labels:
+            name, separator, value = raw_label.partition("=")
+            if not separator or not LABEL_NAME_PATTERN.match(name):
+                raise TargetsFileError(f"line {number} has an invalid label: {raw_label!r}")
+            labels.append((name, value))
+        groups.setdefault(tuple(sorted(labels)), []).append(target)
+    return [(dict(labels), targets) for labels, targets in groups.items()]
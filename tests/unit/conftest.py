@@ -1,6 +1,7 @@
 # Copyright 2025 Canonical.
 # See LICENSE file for licensing details.
 
+import socket
 from contextlib import ExitStack
 from unittest.mock import MagicMock, patch
 
@@ -30,3 +31,22 @@ def patch_all(mock_topology):
             )
         )
         yield
+
+
+@pytest.fixture
+def listening_port():
+    """Get a local port that accepts TCP connections."""
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        yield server.getsockname()[1]
+
+
+@pytest.fixture
+def closed_port():
+    """Get a local port that refuses TCP connections."""
+    with socket.socket() as server:
+        # bound but not listening, so that connections are refused and no other test server
+        # can be assigned the port in the meantime
+        server.bind(("127.0.0.1", 0))
+        yield server.getsockname()[1]
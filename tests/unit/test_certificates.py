@@ -0,0 +1,49 @@
+# Copyright 2025 Canonical.
+# See LICENSE file for licensing details.
+
+import base64
+import calendar
+
+import pytest
+from test_charm import EXPIRED_CA, TEST_CA
+
+from certificates import CertificateError, ca_bundle_not_after
+
+
+def test_ca_bundle_not_after():
+    bundle = f"# valid until 2125\n{TEST_CA}\n# expired\n{EXPIRED_CA}\n"
+
+    assert ca_bundle_not_after(bundle) == [
+        calendar.timegm((2125, 1, 1, 0, 0, 0)),
+        calendar.timegm((2001, 1, 1, 0, 0, 0)),
+    ]
+
+
+@pytest.mark.parametrize(
+    "bundle",
+    (
+        "",
+        "not a certificate",
+        "-----BEGIN CERTIFICATE-----\n-----END CERTIFICATE-----",
+        "-----BEGIN CERTIFICATE-----\nnot base64!\n-----END CERTIFICATE-----",
+        # truncated
+        TEST_CA.replace("+Vzdb2zNOwIgP58uiCReRuZQct7qk8w1F76D2qs0YGQJfUZNBMYuXJc=\n", ""),
+        # a valid certificate followed by a truncated one
+        TEST_CA
+        + "\n"
+        + EXPIRED_CA.replace("YahHXLICICRBPN0mKCacL0g5SdxMde49wvBxiZtyz7SL/XL/26rt\n", ""),
+    ),
+)
+def test_ca_bundle_not_after_rejects_malformed_bundles(bundle):
+    with pytest.raises(CertificateError):
+        ca_bundle_not_after(bundle)
+
+
+def test_ca_bundle_not_after_rejects_invalid_validity_time():
+    der = base64.b64decode("".join(TEST_CA.splitlines()[1:-1]))
+    # expires in the 13th month of 2125
+    der = der.replace(b"21250101000000Z", b"21251301000000Z")
+    body = base64.b64encode(der).decode("ascii")
+
+    with pytest.raises(CertificateError, match="invalid validity time"):
+        ca_bundle_not_after(f"-----BEGIN CERTIFICATE-----\n{body}\n-----END CERTIFICATE-----")
@@ -3,19 +3,55 @@
 
 import json
 from dataclasses import replace
+from unittest.mock import patch
 
 import pytest
-from charms.parca_k8s.v0.parca_scrape import DEFAULT_JOB
+from charms.parca_k8s.v0.parca_scrape import (
+    COMPRESSED_SCRAPE_JOBS_KEY,
+    DEFAULT_JOB,
+    TLS_CA_CERTS_KEY,
+    _decode_scrape_jobs,
+)
+from ops.framework import Framework, StoredStateData
 from ops.model import ActiveStatus, BlockedStatus
-from ops.testing import Relation, State
+from ops.testing import Context, PeerRelation, Relation, Resource, State
+
+from certificates import ca_bundle_not_after
+from charm import ParcaScrapeTargetCharm, _profiling_config
+from targets import load_targets_file, validate_target_groups
 
 TEST_JOB = {"static_configs": [{"targets": ["foo:1234"]}]}
-TEST_CA = "-----BEGIN CERTIFICATE-----\n-----END CERTIFICATE-----"
+# self-signed CA certificates, valid until 2125 and expired since 2001
+TEST_CA = (
+    "-----BEGIN CERTIFICATE-----\n"
+    "MIIBRTCB7aADAgECAgECMAoGCCqGSM49BAMCMBIxEDAOBgNVBAMMB3Rlc3QtY2Ew\n"
+    "IBcNMjUwMTAxMDAwMDAwWhgPMjEyNTAxMDEwMDAwMDBaMBIxEDAOBgNVBAMMB3Rl\n"
+    "c3QtY2EwWTATBgcqhkjOPQIBBggqhkjOPQMBBwNCAAQyimL6z3Slm9XzjMQtGVkm\n"
+    "q+6+CX/mWrjn1EMyL3cxVOGouEz6N1xOyv5cEU54VqHSZdX2HCmcq+qfjKeEQQ0A\n"
+    "ozIwMDAPBgNVHRMBAf8EBTADAQH/MB0GA1UdDgQWBBRzUKZM3qVNNYO/mMwt+6Ad\n"
+    "GT5lUjAKBggqhkjOPQQDAgNHADBEAiBHuXmq3ZVdD2DNbATedWwo0LR9rmgcAAcc\n"
+    "+Vzdb2zNOwIgP58uiCReRuZQct7qk8w1F76D2qs0YGQJfUZNBMYuXJc=\n"
+    "-----END CERTIFICATE-----"
+)
+EXPIRED_CA = (
+    "-----BEGIN CERTIFICATE-----\n"
+    "MIIBQzCB66ADAgECAgEBMAoGCCqGSM49BAMCMBIxEDAOBgNVBAMMB3Rlc3QtY2Ew\n"
+    "HhcNMDAwMTAxMDAwMDAwWhcNMDEwMTAxMDAwMDAwWjASMRAwDgYDVQQDDAd0ZXN0\n"
+    "LWNhMFkwEwYHKoZIzj0CAQYIKoZIzj0DAQcDQgAEMopi+s90pZvV84zELRlZJqvu\n"
+    "vgl/5lq459RDMi93MVThqLhM+jdcTsr+XBFOeFah0mXV9hwpnKvqn4ynhEENAKMy\n"
+    "MDAwDwYDVR0TAQH/BAUwAwEB/zAdBgNVHQ4EFgQUc1CmTN6lTTWDv5jMLfugHRk+\n"
+    "ZVIwCgYIKoZIzj0EAwIDRwAwRAIgHKRe6IfKB08F6pUiCq3iW/ugvWrVsZNed1qN\n"
+    "YahHXLICICRBPN0mKCacL0g5SdxMde49wvBxiZtyz7SL/XL/26rt\n"
+    "-----END CERTIFICATE-----"
+)
 
 
 @pytest.fixture
-def base_state():
-    return State(leader=True)
+def base_state(tmp_path):
+    # charms are published with an empty `targets-file` resource
+    targets_file = tmp_path / "targets.txt"
+    targets_file.touch()
+    return State(leader=True, resources={Resource(name="targets-file", path=targets_file)})
 
 
 def test_charm_blocks_if_no_targets_specified(context, base_state):
@@ -66,7 +102,7 @@ def test_charm_sets_relation_data_for_valid_targets(config, expected, context, b
     rel_out = state_out.get_relation(relation.id)
 
     assert state_out.unit_status == ActiveStatus()
-    assert rel_out.local_app_data["scrape_jobs"] == json.dumps(expected)
+    assert rel_out.local_app_data["scrape_jobs"] == json.dumps(expected, sort_keys=True)
 
 
 def test_non_leader_does_not_modify_relation_data(context, base_state):
@@ -82,7 +118,7 @@ def test_non_leader_does_not_modify_relation_data(context, base_state):
 
 @pytest.mark.parametrize(
     "target",
-    ("https://foo:1234", "foo:1234/ahah", "foo:123456789,bar:5678"),
+    ("https://foo:1234", "foo:1234/ahah", "foo:123456789,bar:5678", "foo..com:80"),
 )
 def test_charm_blocks_if_target_invalid(target, context, base_state, mock_topology):
     relation = Relation("profiling-endpoint")
@@ -113,7 +149,16 @@ def test_charm_blocks_if_scheme_invalid(scheme, context, base_state):
     assert state_out.unit_status.name == "blocked"
 
 
-@pytest.mark.parametrize("ca", ("test", "-----END CERTIFICATE-----"))
+@pytest.mark.parametrize(
+    "ca",
+    (
+        "test",
+        "-----END CERTIFICATE-----",
+        "-----BEGIN CERTIFICATE-----\n-----END CERTIFICATE-----",
+        # every certificate of the bundle is checked
+        TEST_CA + "\n" + TEST_CA.replace("MIIBRTCB7a", "MIIBRTCB"),
+    ),
+)
 def test_charm_blocks_if_ca_invalid(ca, context, base_state):
     relation = Relation("profiling-endpoint")
     state_out = context.run(
@@ -136,7 +181,7 @@ def test_charm_removes_job_when_empty_targets_are_specified(context, base_state,
     expected_jobs = [{"static_configs": [{"targets": ["foo:1234"]}]}]
 
     assert state_inter.unit_status == ActiveStatus()
-    assert rel_out.local_app_data["scrape_jobs"] == json.dumps(expected_jobs)
+    assert rel_out.local_app_data["scrape_jobs"] == json.dumps(expected_jobs, sort_keys=True)
 
     state_out = context.run(
         context.on.config_changed(),
@@ -149,3 +194,1055 @@ def test_charm_removes_job_when_empty_targets_are_specified(context, base_state,
         "scrape_metadata": json.dumps(mock_topology),
     }
     assert state_out.unit_status.name == "blocked"
+
+
+def test_charm_does_not_rewrite_unchanged_relation_data(context, base_state):
+    relation = Relation("profiling-endpoint")
+    state_inter = context.run(
+        context.on.relation_changed(relation),
+        replace(base_state, config={"targets": "foo:1234"}, relations={relation}),
+    )
+    rel_inter = state_inter.get_relation(relation.id)
+
+    # tamper with the databag behind the charm's back: since the jobs did not change, the charm
+    # has no reason to write to the databag again
+    stale_relation = replace(
+        rel_inter, local_app_data={**rel_inter.local_app_data, "scrape_jobs": "stale"}
+    )
+    state_out = context.run(
+        context.on.update_status(), replace(state_inter, relations={stale_relation})
+    )
+
+    assert state_out.get_relation(relation.id).local_app_data["scrape_jobs"] == "stale"
+
+
+def _stored_state_writes(context, event, state):
+    """Run the charm, also getting the paths of the stored states it saved."""
+    save_snapshot = Framework.save_snapshot
+    written = []
+
+    def save(framework, value):
+        if isinstance(value, StoredStateData):
+            written.append(value.handle.path)
+        return save_snapshot(framework, value)
+
+    with patch.object(Framework, "save_snapshot", autospec=True, side_effect=save):
+        state_out = context.run(event, state)
+    return written, state_out
+
+
+@pytest.mark.parametrize("leader", (True, False))
+def test_charm_does_not_rewrite_unchanged_published_digests(leader, context, base_state):
+    relation = Relation("profiling-endpoint")
+    state = replace(
+        base_state, leader=leader, config={"targets": "foo:1234"}, relations={relation}
+    )
+    state_inter = context.run(context.on.update_status(), state)
+
+    written, _ = _stored_state_writes(context, context.on.update_status(), state_inter)
+
+    assert not [path for path in written if "ProfilingEndpointProvider" in path]
+
+
+def test_charm_rewrites_relation_data_when_targets_change(context, base_state):
+    relation = Relation("profiling-endpoint")
+    state_inter = context.run(
+        context.on.relation_changed(relation),
+        replace(base_state, config={"targets": "foo:1234"}, relations={relation}),
+    )
+
+    state_out = context.run(
+        context.on.config_changed(),
+        replace(state_inter, config={"targets": "bar:1234"}),
+    )
+
+    expected = [{"static_configs": [{"targets": ["bar:1234"]}]}]
+    rel_out = state_out.get_relation(relation.id)
+    assert rel_out.local_app_data["scrape_jobs"] == json.dumps(expected, sort_keys=True)
+
+
+def test_charm_republishes_relation_data_on_leader_elected(context, base_state):
+    relation = Relation("profiling-endpoint")
+    state_inter = context.run(
+        context.on.relation_changed(relation),
+        replace(base_state, config={"targets": "foo:1234"}, relations={relation}),
+    )
+    rel_inter = state_inter.get_relation(relation.id)
+
+    stale_relation = replace(
+        rel_inter, local_app_data={**rel_inter.local_app_data, "scrape_jobs": "stale"}
+    )
+    state_out = context.run(
+        context.on.leader_elected(), replace(state_inter, relations={stale_relation})
+    )
+
+    rel_out = state_out.get_relation(relation.id)
+    assert rel_out.local_app_data["scrape_jobs"] == json.dumps([TEST_JOB], sort_keys=True)
+
+
+def test_charm_parses_config_once_per_dispatch(context, base_state):
+    relation = Relation("profiling-endpoint")
+    parse_config = ParcaScrapeTargetCharm._parse_config
+    with patch.object(
+        ParcaScrapeTargetCharm, "_parse_config", autospec=True, side_effect=parse_config
+    ) as parse_config_spy:
+        state_out = context.run(
+            context.on.relation_changed(relation),
+            replace(
+                base_state,
+                config={"targets": "foo:1234", "scheme": "https", "tls_ca_cert": TEST_CA},
+                relations={relation},
+            ),
+        )
+
+    assert state_out.unit_status == ActiveStatus()
+    assert parse_config_spy.call_count == 1
+
+
+def test_charm_blocks_if_too_many_targets(context, base_state):
+    # each network expands to 4094 targets, which is more than 65536 for all of them
+    targets = ", ".join(f"10.{i}.0.0/20:7000" for i in range(17))
+
+    state_out = context.run(
+        context.on.config_changed(), replace(base_state, config={"targets": targets})
+    )
+
+    assert state_out.unit_status == BlockedStatus(
+        "Targets config invalid: 1 invalid target(s). See logs for more."
+    )
+
+
+def test_charm_reports_every_invalid_target(context, base_state):
+    state_out = context.run(
+        context.on.config_changed(),
+        replace(base_state, config={"targets": "foo:1234, http://bar:1234, baz:99999"}),
+    )
+    assert state_out.unit_status == BlockedStatus(
+        "Targets config invalid: 2 invalid target(s). See logs for more."
+    )
+
+
+def test_charm_publishes_each_target_once(context, base_state):
+    relation = Relation("profiling-endpoint")
+    state_out = context.run(
+        context.on.relation_changed(relation),
+        replace(
+            base_state,
+            config={"targets": "Foo.com:80, bar:1234, foo.com:80 "},
+            relations={relation},
+        ),
+    )
+
+    expected = [{"static_configs": [{"targets": ["foo.com:80", "bar:1234"]}]}]
+    rel_out = state_out.get_relation(relation.id)
+    assert rel_out.local_app_data["scrape_jobs"] == json.dumps(expected, sort_keys=True)
+
+
+def test_charm_shards_targets_into_jobs(context, base_state):
+    relation = Relation("profiling-endpoint")
+    targets = [f"host-{i}:7000" for i in range(20)]
+    state_out = context.run(
+        context.on.relation_changed(relation),
+        replace(
+            base_state,
+            config={
+                "targets": ",".join(targets),
+                "shards": 3,
+                "shard_scrape_intervals": "10s, 15s, 20s",
+                "shard_scrape_timeouts": "5s, 5s, 10s",
+            },
+            relations={relation},
+        ),
+    )
+
+    jobs = json.loads(state_out.get_relation(relation.id).local_app_data["scrape_jobs"])
+    assert state_out.unit_status == ActiveStatus()
+    assert [job["job_name"] for job in jobs] == ["shard-0", "shard-1", "shard-2"]
+    assert [job["scrape_interval"] for job in jobs] == ["10s", "15s", "20s"]
+    assert [job["scrape_timeout"] for job in jobs] == ["5s", "5s", "10s"]
+    assert sorted(t for job in jobs for t in job["static_configs"][0]["targets"]) == sorted(
+        targets
+    )
+
+
+@pytest.mark.parametrize(
+    "config",
+    (
+        {"shards": 0},
+        {"shards": 2, "shard_scrape_intervals": "10s"},
+        {"shards": 2, "shard_scrape_intervals": "10s,forever"},
+        {"shards": 2, "shard_scrape_intervals": "10s,10s", "shard_scrape_timeouts": "5s,1m"},
+    ),
+)
+def test_charm_blocks_if_sharding_invalid(config, context, base_state):
+    relation = Relation("profiling-endpoint")
+    state_out = context.run(
+        context.on.relation_changed(relation),
+        replace(base_state, config={"targets": "foo:1234", **config}, relations={relation}),
+    )
+
+    # scraping carries on in a single job
+    rel_out = state_out.get_relation(relation.id)
+    assert rel_out.local_app_data["scrape_jobs"] == json.dumps([TEST_JOB], sort_keys=True)
+    assert state_out.unit_status.name == "blocked"
+
+
+def test_charm_sets_scrape_options(context, base_state):
+    relation = Relation("profiling-endpoint")
+    state_out = context.run(
+        context.on.relation_changed(relation),
+        replace(
+            base_state,
+            config={
+                "targets": "foo:1234",
+                "scrape_interval": "1m",
+                "scrape_timeout": "30s",
+                "profile_types": "cpu, memory",
+            },
+            relations={relation},
+        ),
+    )
+
+    (job,) = json.loads(state_out.get_relation(relation.id).local_app_data["scrape_jobs"])
+    assert state_out.unit_status == ActiveStatus()
+    assert job["scrape_interval"] == "1m"
+    assert job["scrape_timeout"] == "30s"
+    pprof_config = job["profiling_config"]["pprof_config"]
+    assert {name: config["enabled"] for name, config in pprof_config.items()} == {
+        "process_cpu": True,
+        "memory": True,
+        "goroutine": False,
+        "block": False,
+        "mutex": False,
+    }
+    assert pprof_config["process_cpu"]["path"] == "/debug/pprof/profile"
+
+
+@pytest.mark.parametrize(
+    ("scrape_timeout", "expected"),
+    (
+        # shard intervals override the global interval, the global timeout applies to all shards
+        ("5s", [("10s", "5s"), ("20s", "5s")]),
+        # the global timeout exceeds a shard interval, so sharding is disabled
+        ("15s", [("1m", "15s")]),
+    ),
+)
+def test_shard_scrape_options_override_global_ones(scrape_timeout, expected, context, base_state):
+    relation = Relation("profiling-endpoint")
+    state_out = context.run(
+        context.on.relation_changed(relation),
+        replace(
+            base_state,
+            config={
+                "targets": ",".join(f"host-{i}:7000" for i in range(20)),
+                "scrape_interval": "1m",
+                "scrape_timeout": scrape_timeout,
+                "shards": 2,
+                "shard_scrape_intervals": "10s,20s",
+            },
+            relations={relation},
+        ),
+    )
+
+    jobs = json.loads(state_out.get_relation(relation.id).local_app_data["scrape_jobs"])
+    assert [(job["scrape_interval"], job["scrape_timeout"]) for job in jobs] == expected
+
+
+@pytest.mark.parametrize(
+    "config",
+    (
+        {"scrape_interval": "often"},
+        {"scrape_timeout": "10"},
+        {"scrape_interval": "10s", "scrape_timeout": "1m"},
+        {"profile_types": "cpu,heap"},
+    ),
+)
+def test_charm_blocks_if_scrape_options_invalid(config, context, base_state):
+    relation = Relation("profiling-endpoint")
+    state_out = context.run(
+        context.on.relation_changed(relation),
+        replace(base_state, config={"targets": "foo:1234", **config}, relations={relation}),
+    )
+
+    # scraping carries on with Parca's defaults
+    rel_out = state_out.get_relation(relation.id)
+    assert rel_out.local_app_data["scrape_jobs"] == json.dumps([TEST_JOB], sort_keys=True)
+    assert state_out.unit_status.name == "blocked"
+
+
+def test_charm_publishes_labeled_static_configs(context, base_state):
+    relation = Relation("profiling-endpoint")
+    static_configs = """
+    - targets: [foo:1, bar:2]
+      labels: {region: eu, tier: backend}
+    - targets: [baz:3, foo:1234]
+      labels: {region: us}
+    """
+    state_out = context.run(
+        context.on.relation_changed(relation),
+        replace(
+            base_state,
+            config={"targets": "foo:1234", "static_configs": static_configs},
+            relations={relation},
+        ),
+    )
+
+    expected = [
+        {
+            "static_configs": [
+                {"targets": ["foo:1234"]},
+                {"targets": ["foo:1", "bar:2"], "labels": {"region": "eu", "tier": "backend"}},
+                {"targets": ["baz:3"], "labels": {"region": "us"}},
+            ]
+        }
+    ]
+    rel_out = state_out.get_relation(relation.id)
+    assert state_out.unit_status == ActiveStatus()
+    assert rel_out.local_app_data["scrape_jobs"] == json.dumps(expected, sort_keys=True)
+
+
+def test_charm_blocks_if_static_configs_malformed(context, base_state, mock_topology):
+    relation = Relation("profiling-endpoint")
+    state_out = context.run(
+        context.on.relation_changed(relation),
+        replace(
+            base_state,
+            config={"targets": "foo:1234", "static_configs": "targets: foo:1"},
+            relations={relation},
+        ),
+    )
+
+    rel_out = state_out.get_relation(relation.id)
+    assert rel_out.local_app_data["scrape_jobs"] == json.dumps([DEFAULT_JOB])
+    assert state_out.unit_status == BlockedStatus(
+        "Invalid `static_configs` provided. See logs for more."
+    )
+
+
+def test_charm_publishes_compressed_jobs(context, base_state):
+    relation = Relation("profiling-endpoint")
+    state_inter = context.run(
+        context.on.relation_changed(relation),
+        replace(base_state, config={"targets": "foo:1234"}, relations={relation}),
+    )
+
+    state_out = context.run(
+        context.on.config_changed(),
+        replace(state_inter, config={"targets": "foo:1234", "compress_scrape_jobs": True}),
+    )
+
+    rel_out = state_out.get_relation(relation.id)
+    assert "scrape_jobs" not in rel_out.local_app_data
+    assert _decode_scrape_jobs(rel_out.local_app_data[COMPRESSED_SCRAPE_JOBS_KEY]) == json.dumps(
+        [TEST_JOB], sort_keys=True
+    )
+
+
+def test_charm_publishes_deduplicated_ca(context, base_state):
+    relation = Relation("profiling-endpoint")
+    state_out = context.run(
+        context.on.relation_changed(relation),
+        replace(
+            base_state,
+            config={
+                "targets": ",".join(f"host-{i}:7000" for i in range(20)),
+                "shards": 3,
+                "scheme": "https",
+                "tls_ca_cert": TEST_CA,
+                "deduplicate_tls_ca": True,
+            },
+            relations={relation},
+        ),
+    )
+
+    rel_out = state_out.get_relation(relation.id)
+    (digest,) = json.loads(rel_out.local_app_data[TLS_CA_CERTS_KEY]).items()
+    assert digest[1] == TEST_CA
+    jobs = json.loads(rel_out.local_app_data["scrape_jobs"])
+    assert len(jobs) == 3
+    for job in jobs:
+        assert job["tls_config"] == {"insecure_skip_verify": False, "ca_ref": digest[0]}
+
+
+def test_charm_saves_instrumentation(context, base_state, tmp_path):
+    instrumentation_file = tmp_path / "instrumentation.jsonl"
+    config = {
+        "targets": "foo:1234,bar:1234,baz",
+        "instrumentation_file": str(instrumentation_file),
+    }
+    relation = Relation("profiling-endpoint")
+    state = replace(base_state, config=config, relations=[relation])
+
+    state_inter = context.run(context.on.config_changed(), state)
+    context.run(context.on.update_status(), state_inter)
+
+    first, second = map(json.loads, instrumentation_file.read_text().splitlines())
+    assert set(first["timings"]) == {
+        "init",
+        "parse_config",
+        "load_and_validate_targets",
+        "load_named_jobs",
+        "reconcile_relations",
+        "publish_all_relation_data",
+        "collect_unit_status",
+    }
+    assert first["counters"]["targets_validated"] == 3
+    assert first["counters"]["relations_touched"] == 1
+    assert first["counters"]["bytes_published"] > 0
+    # nothing is published again if the jobs did not change
+    assert second["counters"]["relations_touched"] == 0
+    assert second["counters"]["bytes_published"] == 0
+
+
+def test_charm_is_not_instrumented_by_default(context, base_state):
+    state = replace(base_state, config={"targets": "foo:1234"})
+
+    with context(context.on.config_changed(), state) as mgr:
+        assert mgr.charm._instrumentation is None
+        with patch("instrumentation.Instrumentation.dump") as dump:
+            mgr.run()
+        dump.assert_not_called()
+
+
+def test_non_leader_does_not_build_topology(context, base_state):
+    relation = Relation("profiling-endpoint")
+    state = replace(base_state, leader=False, config={"targets": "foo:1234"}, relations=[relation])
+
+    with patch("cosl.JujuTopology.from_charm") as from_charm:
+        context.run(context.on.update_status(), state)
+
+    from_charm.assert_not_called()
+
+
+def test_leader_without_relations_does_not_build_topology(context, base_state):
+    state = replace(base_state, config={"targets": "foo:1234"})
+
+    with patch("cosl.JujuTopology.from_charm") as from_charm:
+        context.run(context.on.update_status(), state)
+
+    from_charm.assert_not_called()
+
+
+def test_charm_resolves_unit_address_once(context, base_state):
+    relations = [Relation("profiling-endpoint") for _ in range(3)]
+    state = replace(base_state, config={"targets": "foo:1234"}, relations=relations)
+
+    with patch("socket.getfqdn", return_value="unit-0.example.com") as getfqdn:
+        state_inter = context.run(context.on.config_changed(), state)
+        # the address resolved by the previous dispatch has not expired yet
+        state_out = context.run(context.on.update_status(), state_inter)
+
+    getfqdn.assert_called_once()
+    for relation in relations:
+        unit_data = state_out.get_relation(relation.id).local_unit_data
+        assert unit_data["parca_scrape_unit_address"] == "unit-0.example.com"
+
+
+def test_charm_resolves_unit_address_again_once_expired(context, base_state):
+    relation = Relation("profiling-endpoint")
+    state = replace(base_state, config={"targets": "foo:1234"}, relations=[relation])
+    with patch("socket.getfqdn", return_value="unit-0.example.com"):
+        state_inter = context.run(context.on.config_changed(), state)
+
+    stored_states = {
+        replace(stored, content={**stored.content, "unit_address_expiry": 0.0})
+        if "unit_address_expiry" in stored.content
+        else stored
+        for stored in state_inter.stored_states
+    }
+    with patch("socket.getfqdn", return_value="unit-0.other.example.com") as getfqdn:
+        state_out = context.run(
+            context.on.update_status(), replace(state_inter, stored_states=stored_states)
+        )
+
+    getfqdn.assert_called_once()
+    unit_data = state_out.get_relation(relation.id).local_unit_data
+    assert unit_data["parca_scrape_unit_address"] == "unit-0.other.example.com"
+
+
+def test_charm_reports_target_reachability(context, base_state, listening_port, closed_port):
+    config = {
+        "targets": f"127.0.0.1:{listening_port}, 127.0.0.1:{closed_port}",
+        "probe_targets": True,
+    }
+    state_out = context.run(context.on.update_status(), replace(base_state, config=config))
+
+    assert state_out.unit_status == ActiveStatus("1 reachable, 1 unreachable target(s)")
+
+
+@pytest.mark.parametrize(
+    "config",
+    ({"probe_timeout": "soon"}, {"probe_timeout": "0"}, {"probe_concurrency": 0}),
+)
+def test_charm_blocks_if_probe_config_invalid(config, context, base_state):
+    config = {"targets": "foo:1234", "probe_targets": True, **config}
+    with patch("charm.probe_reachability") as probe:
+        state_out = context.run(context.on.update_status(), replace(base_state, config=config))
+
+    probe.assert_not_called()
+    assert isinstance(state_out.unit_status, BlockedStatus)
+    assert state_out.unit_status.message.startswith("Invalid probe config:")
+
+
+def _fake_probe(dead_targets, probed):
+    def probe(targets, *_):
+        probed.append(list(targets))
+        return {target: target not in dead_targets for target in targets}
+
+    return probe
+
+
+def _published_targets(state, relation):
+    jobs = json.loads(state.get_relation(relation.id).local_app_data["scrape_jobs"])
+    return [t for job in jobs for sc in job["static_configs"] for t in sc["targets"]]
+
+
+def test_charm_excludes_targets_after_consecutive_failures(context, base_state):
+    relation = Relation("profiling-endpoint")
+    config = {"targets": "foo:1234, bar:1234", "probe_targets": True, "exclude_after_failures": 2}
+    state = replace(base_state, config=config, relations=[relation])
+    dead_targets, probed = {"bar:1234"}, []
+
+    with patch("charm.probe_reachability", side_effect=_fake_probe(dead_targets, probed)):
+        state_inter = context.run(context.on.update_status(), state)
+        assert _published_targets(state_inter, relation) == ["foo:1234", "bar:1234"]
+
+        state_inter = context.run(context.on.update_status(), state_inter)
+        assert _published_targets(state_inter, relation) == ["foo:1234"]
+        assert state_inter.unit_status == ActiveStatus(
+            "1 reachable, 1 unreachable target(s), 1 excluded"
+        )
+
+        # the excluded target is not probed again until its backoff expires
+        state_inter = context.run(context.on.update_status(), state_inter)
+        assert probed[-1] == ["foo:1234"]
+        assert _published_targets(state_inter, relation) == ["foo:1234"]
+
+        # once the backoff expired, the target is probed again and added back if reachable
+        dead_targets.clear()
+        stored_states = {
+            replace(stored, content={**stored.content, "target_retry_at": {"bar:1234": 0.0}})
+            if "target_retry_at" in stored.content
+            else stored
+            for stored in state_inter.stored_states
+        }
+        state_out = context.run(
+            context.on.update_status(), replace(state_inter, stored_states=stored_states)
+        )
+
+    assert probed[-1] == ["foo:1234", "bar:1234"]
+    assert _published_targets(state_out, relation) == ["foo:1234", "bar:1234"]
+    assert state_out.unit_status == ActiveStatus("2 reachable, 0 unreachable target(s)")
+
+
+def test_charm_keeps_targets_if_all_are_unreachable(context, base_state):
+    relation = Relation("profiling-endpoint")
+    config = {"targets": "foo:1234, bar:1234", "probe_targets": True, "exclude_after_failures": 1}
+    state = replace(base_state, config=config, relations=[relation])
+
+    with patch("charm.probe_reachability", side_effect=_fake_probe({"foo:1234", "bar:1234"}, [])):
+        state_out = context.run(context.on.update_status(), state)
+
+    assert _published_targets(state_out, relation) == ["foo:1234", "bar:1234"]
+
+
+def test_charm_counts_failures_on_update_status_only(context, base_state):
+    relation = Relation("profiling-endpoint")
+    config = {"targets": "foo:1234, bar:1234", "probe_targets": True, "exclude_after_failures": 1}
+    state_out = replace(base_state, config=config, relations=[relation])
+
+    with patch("charm.probe_reachability", side_effect=_fake_probe({"bar:1234"}, [])):
+        for event in (
+            context.on.start(),
+            context.on.config_changed(),
+            context.on.leader_elected(),
+        ):
+            state_out = context.run(event, state_out)
+
+    assert _published_targets(state_out, relation) == ["foo:1234", "bar:1234"]
+
+
+def test_non_leader_does_not_probe_targets(context, base_state):
+    config = {"targets": "foo:1234", "probe_targets": True, "exclude_after_failures": 1}
+    state = replace(base_state, leader=False, config=config)
+
+    with patch("charm.probe_reachability") as probe:
+        context.run(context.on.update_status(), state)
+
+    probe.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "config",
+    (
+        {"targets": "foo:1234"},
+        {"targets": "foo:1234", "probe_targets": True, "exclude_after_failures": 2},
+    ),
+)
+def test_charm_does_not_rewrite_unchanged_target_failures(config, context, base_state):
+    state = replace(base_state, config=config, relations={Relation("profiling-endpoint")})
+
+    with patch("charm.probe_reachability", side_effect=_fake_probe(set(), [])):
+        state_inter = context.run(context.on.update_status(), state)
+        written, _ = _stored_state_writes(context, context.on.update_status(), state_inter)
+
+    assert "ParcaScrapeTargetCharm/StoredStateData[_stored]" not in written
+
+
+def _fake_discover(indexes, discovered):
+    def discover(targets, *_, **__):
+        discovered.append(list(targets))
+        return {target: indexes.get(target) for target in targets}
+
+    return discover
+
+
+def test_charm_groups_targets_by_discovered_profile_types(context, base_state):
+    relation = Relation("profiling-endpoint")
+    config = {
+        "targets": "foo:1234, bar:1234, baz:1234, qux:1234",
+        "profile_types": "cpu,memory,block",
+        "discover_profile_types": True,
+    }
+    indexes = {
+        "foo:1234": {"profile", "allocs", "goroutine"},
+        "bar:1234": {"profile", "allocs", "block", "mutex"},
+        "baz:1234": {"allocs", "profile"},
+    }
+    state = replace(base_state, config=config, relations=[relation])
+
+    with patch("charm.discover_profiles", side_effect=_fake_discover(indexes, [])):
+        state_out = context.run(context.on.update_status(), state)
+
+    jobs = json.loads(state_out.get_relation(relation.id).local_app_data["scrape_jobs"])
+    assert [
+        (job.get("job_name"), job["static_configs"][0]["targets"], job["profiling_config"])
+        for job in jobs
+    ] == [
+        ("profiles-cpu-memory", ["foo:1234", "baz:1234"], _profiling_config(("cpu", "memory"))),
+        (
+            "profiles-cpu-memory-block",
+            ["bar:1234"],
+            _profiling_config(("cpu", "memory", "block")),
+        ),
+        # the profile types of targets whose index could not be fetched are the configured ones
+        (None, ["qux:1234"], _profiling_config(("cpu", "memory", "block"))),
+    ]
+
+
+def test_charm_reuses_discovered_profile_types(context, base_state):
+    config = {"targets": "foo:1234, bar:1234", "discover_profile_types": True}
+    indexes = {"foo:1234": {"profile"}}
+    discovered = []
+
+    with patch("charm.discover_profiles", side_effect=_fake_discover(indexes, discovered)):
+        state_inter = context.run(context.on.update_status(), replace(base_state, config=config))
+        state_inter = context.run(context.on.update_status(), state_inter)
+        context.run(
+            context.on.config_changed(),
+            replace(state_inter, config={**config, "targets": "foo:1234, baz:1234"}),
+        )
+
+    # only the targets that were not discovered yet are requested, failed ones after a while
+    assert discovered == [["foo:1234", "bar:1234"], ["baz:1234"]]
+
+
+def test_charm_discovers_failed_targets_again_once_expired(context, base_state):
+    config = {"targets": "foo:1234, bar:1234", "discover_profile_types": True}
+    discovered = []
+
+    with patch("charm.discover_profiles", side_effect=_fake_discover({}, discovered)):
+        with patch("charm.DISCOVERY_FAILURE_TTL", 0):
+            state_inter = context.run(
+                context.on.update_status(), replace(base_state, config=config)
+            )
+        context.run(context.on.update_status(), state_inter)
+
+    assert discovered == [["foo:1234", "bar:1234"], ["foo:1234", "bar:1234"]]
+
+
+@pytest.mark.parametrize("leader, event", ((False, "update_status"), (True, "start")))
+def test_charm_discovers_profile_types_on_publishing_units_and_hooks_only(
+    leader, event, context, base_state
+):
+    config = {"targets": "foo:1234", "discover_profile_types": True}
+    state = replace(base_state, leader=leader, config=config)
+
+    with patch("charm.discover_profiles") as discover:
+        context.run(getattr(context.on, event)(), state)
+
+    discover.assert_not_called()
+
+
+def test_charm_does_not_discover_profile_types_with_invalid_ca(context, base_state):
+    config = {
+        "targets": "foo:1234",
+        "scheme": "https",
+        "tls_ca_cert": "test",
+        "discover_profile_types": True,
+    }
+    discovered = []
+
+    with patch("charm.discover_profiles", side_effect=_fake_discover({}, discovered)):
+        state_out = context.run(context.on.update_status(), replace(base_state, config=config))
+
+    assert state_out.unit_status.name == "blocked"
+    assert discovered == []
+
+
+def test_charm_blocks_if_ca_expired(context, base_state):
+    config = {"targets": "foo:1234", "tls_ca_cert": TEST_CA + "\n" + EXPIRED_CA}
+    state_out = context.run(context.on.update_status(), replace(base_state, config=config))
+
+    assert state_out.unit_status == BlockedStatus(
+        "Expired certificate provided for `tls_ca_cert`."
+    )
+
+
+def test_charm_warns_if_ca_expires_soon(context, base_state):
+    config = {"targets": "foo:1234", "tls_ca_cert": TEST_CA}
+    with patch("charm.CA_EXPIRY_WARNING", 200 * 365 * 86400):
+        state_out = context.run(context.on.update_status(), replace(base_state, config=config))
+
+    assert isinstance(state_out.unit_status, ActiveStatus)
+    assert state_out.unit_status.message.startswith("A certificate of `tls_ca_cert` expires in")
+
+
+def test_charm_parses_ca_only_when_it_changes(context, base_state):
+    config = {"targets": "foo:1234", "tls_ca_cert": TEST_CA}
+    with patch("charm.ca_bundle_not_after", wraps=ca_bundle_not_after) as parse_spy:
+        state_inter = context.run(context.on.update_status(), replace(base_state, config=config))
+        state_inter = context.run(context.on.update_status(), state_inter)
+        assert parse_spy.call_count == 1
+
+        context.run(
+            context.on.config_changed(),
+            replace(state_inter, config={**config, "tls_ca_cert": TEST_CA + "\n" + TEST_CA}),
+        )
+        assert parse_spy.call_count == 2
+
+
+def _with_targets_file(state, path):
+    return replace(state, resources={Resource(name="targets-file", path=path)})
+
+
+def test_charm_publishes_targets_file(context, base_state, tmp_path):
+    relation = Relation("profiling-endpoint")
+    targets_file = tmp_path / "targets.txt"
+    targets_file.write_text("foo:1234\nbar:1234 region=eu\nbaz:1234 region=eu\n")
+    state = replace(base_state, config={"targets": "foo:1234"}, relations=[relation])
+
+    state_out = context.run(context.on.update_status(), _with_targets_file(state, targets_file))
+
+    assert state_out.unit_status == ActiveStatus()
+    jobs = json.loads(state_out.get_relation(relation.id).local_app_data["scrape_jobs"])
+    assert jobs[0]["static_configs"] == [
+        {"targets": ["foo:1234"]},
+        {"targets": ["bar:1234", "baz:1234"], "labels": {"region": "eu"}},
+    ]
+
+
+def test_charm_blocks_if_targets_file_malformed(context, base_state, tmp_path):
+    targets_file = tmp_path / "targets.txt"
+    targets_file.write_text("foo:1234 region\n")
+
+    state_out = context.run(
+        context.on.update_status(), _with_targets_file(base_state, targets_file)
+    )
+
+    assert state_out.unit_status == BlockedStatus(
+        "Invalid `targets-file` resource provided. See logs for more."
+    )
+
+
+def test_charm_parses_targets_file_only_when_it_changes(context, base_state, tmp_path):
+    targets_file = tmp_path / "targets.txt"
+    targets_file.write_text("foo:1234\n")
+    state = _with_targets_file(base_state, targets_file)
+
+    with patch("charm.load_targets_file", wraps=load_targets_file) as parse_spy, patch(
+        "charm.validate_target_groups", wraps=validate_target_groups
+    ) as validate_spy:
+        state_inter = context.run(context.on.update_status(), state)
+        state_inter = context.run(context.on.update_status(), state_inter)
+        assert parse_spy.call_count == 1
+        # the targets of the file are only validated along with the file
+        assert validate_spy.call_count == 3
+
+        targets_file.write_text("foo:1234\nbar:1234\n")
+        context.run(context.on.update_status(), state_inter)
+        assert parse_spy.call_count == 2
+        assert validate_spy.call_count == 5
+
+
+def test_charm_blocks_if_targets_file_has_invalid_targets(context, base_state, tmp_path):
+    targets_file = tmp_path / "targets.txt"
+    targets_file.write_text("foo:1234\nhttp://bar:1234\n")
+    state = _with_targets_file(base_state, targets_file)
+
+    state_inter = context.run(context.on.update_status(), state)
+    # the invalid targets are remembered along with the file
+    state_out = context.run(context.on.update_status(), state_inter)
+
+    assert state_out.unit_status.name == "blocked"
+
+
+def _fake_resolve(addresses, resolved):
+    def resolve(hostnames, workers):
+        resolved.append(list(hostnames))
+        return {hostname: addresses.get(hostname) for hostname in hostnames}
+
+    return resolve
+
+
+def test_charm_publishes_resolved_targets_by_address(context, base_state):
+    relation = Relation("profiling-endpoint")
+    config = {"targets": "foo:1234, bar:1234, 10.0.0.3:1234, baz", "resolve_targets": True}
+    addresses = {"foo": "10.0.0.1", "baz": "2001:db8::1"}
+
+    with patch("charm.resolve_hostnames", side_effect=_fake_resolve(addresses, [])):
+        state_out = context.run(
+            context.on.update_status(), replace(base_state, config=config, relations=[relation])
+        )
+
+    jobs = json.loads(state_out.get_relation(relation.id).local_app_data["scrape_jobs"])
+    assert jobs[0]["static_configs"] == [
+        {"targets": ["bar:1234", "10.0.0.3:1234"]},
+        {"targets": ["10.0.0.1:1234"], "labels": {"hostname": "foo"}},
+        {"targets": ["[2001:db8::1]"], "labels": {"hostname": "baz"}},
+    ]
+
+
+def test_charm_validates_resolved_targets_against_their_hostname(context, base_state):
+    relation = Relation("profiling-endpoint")
+    config = {"targets": "foo:1234, bar:1234", "scheme": "https", "resolve_targets": True}
+    addresses = {"foo": "10.0.0.1", "bar": "10.0.0.2"}
+
+    with patch("charm.resolve_hostnames", side_effect=_fake_resolve(addresses, [])):
+        state_out = context.run(
+            context.on.update_status(), replace(base_state, config=config, relations=[relation])
+        )
+
+    jobs = json.loads(state_out.get_relation(relation.id).local_app_data["scrape_jobs"])
+    assert [
+        (job["tls_config"]["server_name"], job["static_configs"][0]["targets"]) for job in jobs
+    ] == [("foo", ["10.0.0.1:1234"]), ("bar", ["10.0.0.2:1234"])]
+    assert len({job["job_name"] for job in jobs}) == 2
+
+
+def test_charm_refreshes_expired_resolutions_on_update_status(context, base_state):
+    relation = Relation("profiling-endpoint")
+    config = {"targets": "foo:1234, bar:1234", "resolve_targets": True}
+    state = replace(base_state, config=config, relations=[relation])
+    addresses, resolved = {"foo": "10.0.0.1", "bar": "10.0.0.2"}, []
+
+    with patch("charm.resolve_hostnames", side_effect=_fake_resolve(addresses, resolved)):
+        state_inter = context.run(context.on.config_changed(), state)
+        state_inter = context.run(context.on.update_status(), state_inter)
+        # the resolutions are cached until they expire
+        assert resolved == [["foo", "bar"]]
+
+        addresses["foo"] = "10.0.0.3"
+        stored_states = {
+            replace(
+                stored,
+                content={
+                    **stored.content,
+                    "resolved_hostnames": {
+                        **stored.content["resolved_hostnames"],
+                        "foo": {"address": "10.0.0.1", "expiry": 0.0},
+                    },
+                },
+            )
+            if "resolved_hostnames" in stored.content
+            else stored
+            for stored in state_inter.stored_states
+        }
+        state_out = context.run(
+            context.on.update_status(), replace(state_inter, stored_states=stored_states)
+        )
+
+    assert resolved[-1] == ["foo"]
+    assert _published_targets(state_out, relation) == ["10.0.0.3:1234", "10.0.0.2:1234"]
+
+
+NAMED_JOBS = """
+- job_name: checkout
+  targets: ["foo:1234", "10.0.0.0/30:7000"]
+  labels: {tier: backend}
+  scheme: https
+  tls_server_name: checkout.example.com
+  scrape_interval: 30s
+- job_name: batch
+  targets: bar:1234, foo:1234
+  profile_types: [cpu]
+"""
+
+
+def test_charm_publishes_named_jobs(context, base_state):
+    relation = Relation("profiling-endpoint")
+    config = {"targets": "baz:1234", "jobs": NAMED_JOBS}
+
+    state_out = context.run(
+        context.on.config_changed(), replace(base_state, config=config, relations=[relation])
+    )
+
+    jobs = json.loads(state_out.get_relation(relation.id).local_app_data["scrape_jobs"])
+    assert [job["static_configs"] for job in jobs] == [
+        [{"targets": ["baz:1234"]}],
+        [
+            {
+                "targets": ["foo:1234", "10.0.0.1:7000", "10.0.0.2:7000"],
+                "labels": {"tier": "backend"},
+            }
+        ],
+        [{"targets": ["bar:1234", "foo:1234"]}],
+    ]
+    checkout, batch = jobs[1:]
+    assert checkout["job_name"] == "checkout"
+    assert checkout["scheme"] == "https"
+    assert checkout["tls_config"] == {
+        "insecure_skip_verify": False,
+        "server_name": "checkout.example.com",
+    }
+    assert checkout["scrape_interval"] == "30s"
+    assert batch["job_name"] == "batch"
+    assert batch["profiling_config"] == _profiling_config(("cpu",))
+    assert "scheme" not in batch
+    assert isinstance(state_out.unit_status, ActiveStatus)
+
+
+@pytest.mark.parametrize(
+    "jobs",
+    (
+        "- job_name: foo\n  targets: [http://foo:1234]",
+        "- job_name: foo\n  targets: [foo:1234]\n  scheme: ftp",
+        "- job_name: foo\n  targets: [foo:1234]\n  scrape_interval: soon",
+        "- job_name: foo\n  targets: [foo:1234]\n  scheme: https\n  tls_ca_cert: nope",
+        "- job_name: foo\n  targets: [foo:1234]\n- job_name: foo\n  targets: [bar:1234]",
+        "- job_name: shard-0\n  targets: [foo:1234]",
+    ),
+)
+def test_charm_blocks_if_named_jobs_invalid(context, base_state, jobs):
+    state_out = context.run(
+        context.on.config_changed(), replace(base_state, config={"jobs": jobs})
+    )
+
+    assert state_out.unit_status == BlockedStatus("Invalid `jobs` provided. See logs for more.")
+
+
+def test_charm_blocks_if_named_job_is_named_after_resolved_target(context, base_state):
+    config = {
+        "targets": "foo.com:1234",
+        "jobs": "- job_name: foo.com\n  targets: [bar:1234]",
+        "resolve_targets": True,
+    }
+
+    with patch("charm.resolve_hostnames", return_value={"foo.com": "10.0.0.1"}):
+        state_out = context.run(context.on.config_changed(), replace(base_state, config=config))
+
+    assert state_out.unit_status == BlockedStatus("Invalid `jobs` provided. See logs for more.")
+
+
+SHARDED_TARGETS = [f"host-{i}:1234" for i in range(30)]
+
+
+def _unit_targets(state, relation):
+    jobs = json.loads(state.get_relation(relation.id).local_unit_data.get("scrape_jobs", "[]"))
+    return [t for job in jobs for sc in job["static_configs"] for t in sc["targets"]]
+
+
+def _run_unit(unit_id, units, base_state, event=None, **peer_kwargs):
+    relation = Relation("profiling-endpoint")
+    peers = PeerRelation(
+        "replicas", peers_data={i: {} for i in range(units) if i != unit_id}, **peer_kwargs
+    )
+    state = replace(
+        base_state,
+        leader=unit_id == 0,
+        config={"targets": ", ".join(SHARDED_TARGETS), "shard_across_units": True},
+        relations=[relation, peers],
+    )
+    context = Context(ParcaScrapeTargetCharm, unit_id=unit_id)
+    state_out = context.run(event(context, peers) if event else context.on.config_changed(), state)
+    return _unit_targets(state_out, relation), state_out, relation
+
+
+def test_charm_shards_targets_across_units(base_state):
+    slices = [_run_unit(unit_id, 3, base_state)[0] for unit_id in range(3)]
+
+    assert sorted(sum(slices, [])) == sorted(SHARDED_TARGETS)
+    assert all(slices)
+    _, leader_state, relation = _run_unit(0, 3, base_state)
+    # the leader publishes no jobs of its own, rather than the default one
+    assert json.loads(leader_state.get_relation(relation.id).local_app_data["scrape_jobs"]) == []
+
+
+def test_charm_moves_few_targets_when_scaling_out(base_state):
+    before = [_run_unit(unit_id, 3, base_state)[0] for unit_id in range(3)]
+    after = [_run_unit(unit_id, 4, base_state)[0] for unit_id in range(4)]
+
+    # the new unit only takes over targets, the others keep theirs
+    for unit_id in range(3):
+        assert set(after[unit_id]) <= set(before[unit_id])
+    assert sorted(sum(after, [])) == sorted(SHARDED_TARGETS)
+
+
+def test_charm_departing_unit_publishes_no_targets(base_state):
+    def departed(context, peers):
+        # the unit being removed sees its peers depart
+        return context.on.relation_departed(peers, remote_unit=0, departing_unit=1)
+
+    targets, _, _ = _run_unit(1, 3, base_state, event=departed)
+
+    assert targets == []
+
+
+def _partitioned_targets(base_state, consumers, **config):
+    relations = [Relation("profiling-endpoint", remote_app_name=name) for name in consumers]
+    state = replace(
+        base_state,
+        config={"targets": ", ".join(SHARDED_TARGETS), "partition_consumers": True, **config},
+        relations=relations,
+    )
+    context = Context(ParcaScrapeTargetCharm)
+    state_out = context.run(context.on.config_changed(), state)
+    return {
+        relation.remote_app_name: _published_targets(state_out, relation) for relation in relations
+    }
+
+
+def test_charm_partitions_targets_between_consumers(base_state):
+    partitions = _partitioned_targets(base_state, ["parca-a", "parca-b", "parca-c"])
+
+    assert all(partitions.values())
+    assert sorted(sum(partitions.values(), [])) == sorted(SHARDED_TARGETS)
+
+
+def test_charm_replicates_partitioned_targets(base_state):
+    partitions = _partitioned_targets(
+        base_state, ["parca-a", "parca-b", "parca-c"], partition_replication_factor=2
+    )
+
+    for target in SHARDED_TARGETS:
+        assert sum(target in targets for targets in partitions.values()) == 2
+
+
+def test_charm_only_moves_the_targets_of_a_leaving_consumer(base_state):
+    before = _partitioned_targets(base_state, ["parca-a", "parca-b", "parca-c"])
+    after = _partitioned_targets(base_state, ["parca-a", "parca-c"])
+
+    for consumer in ("parca-a", "parca-c"):
+        assert set(before[consumer]) <= set(after[consumer])
+    assert sorted(sum(after.values(), [])) == sorted(SHARDED_TARGETS)
+
+
+def test_charm_blocks_if_partitioning_sharded_units(context, base_state):
+    config = {"targets": "foo:1234", "partition_consumers": True, "shard_across_units": True}
+
+    state_out = context.run(context.on.config_changed(), replace(base_state, config=config))
+
+    assert state_out.unit_status == BlockedStatus(
+        "Invalid partition config: "
+        "`partition_consumers` cannot be combined with `shard_across_units`."
+    )
@@ -0,0 +1,126 @@
+# Copyright 2025 Canonical.
+# See LICENSE file for licensing details.
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from discovery import discover_profiles, parse_pprof_index
+
+# abridged from the index served by Go's net/http/pprof
+PPROF_INDEX = """<html>
+<head><title>/debug/pprof/</title></head>
+<body>
+/debug/pprof/
+<table>
+<thead><td>Count</td><td>Profile</td></thead>
+<tr><td>0</td><td><a href='allocs?debug=1'>allocs</a></td></tr>
+<tr><td>0</td><td><a href='cmdline?debug=1'>cmdline</a></td></tr>
+<tr><td>8</td><td><a href='goroutine?debug=1'>goroutine</a></td></tr>
+<tr><td>0</td><td><a href='profile?debug=1'>profile</a></td></tr>
+</table>
+<a href="goroutine?debug=2">full goroutine stack dump</a>
+</body>
+</html>
+"""
+
+
+class PprofHandler(BaseHTTPRequestHandler):
+    def do_GET(self):  # noqa: N802
+        if self.path != "/debug/pprof/":
+            self.send_error(404)
+            return
+        body = PPROF_INDEX.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class NotFoundHandler(PprofHandler):
+    def do_GET(self):  # noqa: N802
+        self.send_error(404)
+
+
+class SplitResponseHandler(PprofHandler):
+    def do_GET(self):  # noqa: N802
+        body = PPROF_INDEX.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.end_headers()
+        # the headers are sent before the body, in a separate segment
+        time.sleep(0.05)
+        self.wfile.write(body)
+
+
+class EmptyIndexHandler(PprofHandler):
+    def do_GET(self):  # noqa: N802
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def _serve(handler):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"127.0.0.1:{server.server_address[1]}"
+
+    yield _serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_parse_pprof_index():
+    assert parse_pprof_index(PPROF_INDEX) == {"allocs", "cmdline", "goroutine", "profile"}
+
+
+def test_discover_profiles(serve, closed_port):
+    pprof_target, not_found_target = serve(PprofHandler), serve(NotFoundHandler)
+    unreachable_target = f"127.0.0.1:{closed_port}"
+
+    profiles = discover_profiles(
+        [pprof_target, not_found_target, unreachable_target], "http", 1.0, 8
+    )
+
+    assert profiles == {
+        pprof_target: {"allocs", "cmdline", "goroutine", "profile"},
+        not_found_target: None,
+        unreachable_target: None,
+    }
+
+
+def test_discover_profiles_reads_the_whole_response(serve):
+    target = serve(SplitResponseHandler)
+
+    profiles = discover_profiles([target], "http", 1.0, 8)
+
+    assert profiles == {target: {"allocs", "cmdline", "goroutine", "profile"}}
+
+
+def test_discover_profiles_of_empty_index_are_unknown(serve):
+    target = serve(EmptyIndexHandler)
+
+    assert discover_profiles([target], "http", 1.0, 8) == {target: None}
+
+
+@pytest.mark.parametrize("target", ("foo..com:80", f"{'a' * 64}.com:80"))
+def test_discover_profiles_of_unencodable_hostname_are_unknown(target):
+    assert discover_profiles([target], "http", 1.0, 8) == {target: None}
+
+
+def test_discover_profiles_with_invalid_ca_are_unknown():
+    profiles = discover_profiles(["foo.com:443"], "https", 1.0, 8, ca_cert="test")
+
+    assert profiles == {"foo.com:443": None}
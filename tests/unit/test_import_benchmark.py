@@ -0,0 +1,56 @@
+# Copyright 2025 Canonical.
+# See LICENSE file for licensing details.
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import List
+
+import pytest
+
+ROOT = Path(__file__).parents[2]
+# time spent importing the charm modules on top of ops, which every dispatch imports anyway,
+# relative to the time spent importing ops itself, so that it does not depend on how fast the
+# machine running the tests is
+IMPORT_TIME_BUDGET = 0.35
+
+
+def _python(*args: str) -> subprocess.CompletedProcess:
+    pythonpath = [str(ROOT / "src"), str(ROOT / "lib"), os.environ.get("PYTHONPATH", "")]
+    return subprocess.run(
+        [sys.executable, *args],
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(pythonpath)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def _cumulative_import_times_us(*modules: str) -> List[int]:
+    """Get the cumulative time spent importing each module in turn, in microseconds."""
+    imports = "; ".join(f"import {module}" for module in modules)
+    import_times = {}
+    for line in _python("-X", "importtime", "-c", imports).stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        _, cumulative, name = line.split("|")
+        if name.strip() in modules and not name.startswith("  "):
+            import_times[name.strip()] = int(cumulative)
+    if missing := [module for module in modules if module not in import_times]:
+        raise AssertionError(f"{', '.join(missing)} not imported")
+    return [import_times[module] for module in modules]
+
+
+@pytest.mark.parametrize("module", ("cosl", "pydantic", "asyncio", "concurrent.futures"))
+def test_charm_import_does_not_load_heavy_modules(module):
+    loaded = _python("-c", f"import sys, charm; print({module!r} in sys.modules)").stdout
+    assert loaded.strip() == "False"
+
+
+def test_charm_import_time_within_budget():
+    # take the best of a few runs, to rule out noise from other processes
+    ratio = min(
+        charm / ops
+        for ops, charm in (_cumulative_import_times_us("ops", "charm") for _ in range(3))
+    )
+    assert ratio < IMPORT_TIME_BUDGET
@@ -0,0 +1,75 @@
+# Copyright 2025 Canonical.
+# See LICENSE file for licensing details.
+
+import pytest
+
+from jobs import JobsConfigError, load_job_specs
+
+
+def test_load_job_specs():
+    specs = load_job_specs(
+        """
+        - job_name: checkout
+          targets: ["foo.com:1232", "10.0.0.0/24:7000"]
+          labels: {tier: backend, shard: 1}
+          scheme: https
+          tls_insecure_skip_verify: true
+        - job_name: batch
+          targets: bar.org:4234, baz.org:4234
+          profile_types: cpu, memory
+        """
+    )
+
+    assert specs == [
+        {
+            "job_name": "checkout",
+            "targets": ["foo.com:1232", "10.0.0.0/24:7000"],
+            "labels": {"tier": "backend", "shard": "1"},
+            "profile_types": [],
+            "scheme": "https",
+            "tls_insecure_skip_verify": True,
+        },
+        {
+            "job_name": "batch",
+            "targets": ["bar.org:4234", "baz.org:4234"],
+            "labels": {},
+            "profile_types": ["cpu", "memory"],
+        },
+    ]
+
+
+def test_load_job_specs_from_json():
+    specs = load_job_specs('[{"job_name": "foo", "targets": ["foo.com:1232"]}]')
+    assert [spec["job_name"] for spec in specs] == ["foo"]
+
+
+def test_load_job_specs_allows_names_like_generated_ones():
+    specs = load_job_specs("- {job_name: shard-a, targets: [foo:1]}")
+    assert [spec["job_name"] for spec in specs] == ["shard-a"]
+
+
+def test_load_job_specs_empty():
+    assert load_job_specs("  ") == []
+
+
+@pytest.mark.parametrize(
+    ("raw_jobs", "error"),
+    (
+        ("[", "neither valid JSON nor YAML"),
+        ("job_name: foo", "must be a list"),
+        ("- targets: [foo:1]", "must be a mapping with a job_name"),
+        ("- {job_name: 'foo bar', targets: [foo:1]}", "invalid job_name"),
+        ("- {job_name: foo, targets: [foo:1], port: 1}", "unknown options: port"),
+        ("- {job_name: foo}", "must have targets"),
+        ("- {job_name: foo, targets: [1]}", "targets of job 'foo' must be a list of strings"),
+        ("- {job_name: foo, targets: [foo:1], scheme: 1}", "scheme of job 'foo' must be a str"),
+        ("- {job_name: foo, targets: [foo:1], labels: {1a: b}}", "must have valid names"),
+        ("- {job_name: foo, targets: [a:1]}\n- {job_name: foo, targets: [b:1]}", "unique: foo"),
+        ("- {job_name: shard-0, targets: [foo:1]}", "'shard-0' has a name reserved"),
+        ("- {job_name: shard-1-foo, targets: [foo:1]}", "'shard-1-foo' has a name reserved"),
+        ("- {job_name: profiles-cpu, targets: [foo:1]}", "'profiles-cpu' has a name reserved"),
+    ),
+)
+def test_load_job_specs_rejects_invalid_jobs(raw_jobs, error):
+    with pytest.raises(JobsConfigError, match=error):
+        load_job_specs(raw_jobs)
@@ -0,0 +1,374 @@
+# Copyright 2025 Canonical.
+# See LICENSE file for licensing details.
+
+import io
+import json
+from dataclasses import replace
+from unittest.mock import patch
+
+import ops
+import pytest
+import yaml
+from charms.parca_k8s.v0.parca_scrape import (
+    COMPRESSED_SCRAPE_JOBS_KEY,
+    TLS_CA_CERTS_KEY,
+    ProfilingEndpointConsumer,
+    TargetsChangedEvent,
+    _encode_scrape_jobs,
+    _extract_tls_cas,
+)
+from ops.testing import Context, Relation, State, StoredState
+
+SCRAPE_METADATA = {
+    "model": "test-model",
+    "model_uuid": "00000000-0000-4000-8000-000000000000",
+    "application": "parca-scrape-target",
+    "unit": "parca-scrape-target/0",
+    "charm_name": "parca-scrape-target",
+}
+SCRAPE_JOBS = [{"static_configs": [{"targets": ["foo:1234"], "labels": {"tier": "backend"}}]}]
+
+
+class ConsumerCharm(ops.CharmBase):
+    def __init__(self, framework):
+        super().__init__(framework)
+        self.profiling_consumer = ProfilingEndpointConsumer(self)
+
+
+@pytest.fixture
+def consumer_context():
+    return Context(
+        ConsumerCharm,
+        meta={
+            "name": "parca",
+            "requires": {"profiling-endpoint": {"interface": "parca_scrape"}},
+        },
+    )
+
+
+def consumer_jobs(context, *relations):
+    with context(context.on.update_status(), State(relations=set(relations))) as mgr:
+        return mgr.charm.profiling_consumer.jobs()
+
+
+@pytest.mark.parametrize(
+    "app_data",
+    (
+        {"scrape_jobs": json.dumps(SCRAPE_JOBS)},
+        {COMPRESSED_SCRAPE_JOBS_KEY: _encode_scrape_jobs(json.dumps(SCRAPE_JOBS))},
+    ),
+)
+def test_consumer_loads_plain_and_compressed_jobs(app_data, consumer_context):
+    relation = Relation(
+        "profiling-endpoint",
+        remote_app_data={**app_data, "scrape_metadata": json.dumps(SCRAPE_METADATA)},
+    )
+
+    (job,) = consumer_jobs(consumer_context, relation)
+
+    assert job["job_name"] == "test-model_00000000_parca-scrape-target"
+    (static_config,) = job["static_configs"]
+    assert static_config["targets"] == ["foo:1234"]
+    assert static_config["labels"]["tier"] == "backend"
+    assert static_config["labels"]["juju_application"] == "parca-scrape-target"
+
+
+def test_consumer_ignores_corrupted_compressed_jobs(consumer_context):
+    relation = Relation(
+        "profiling-endpoint",
+        remote_app_data={
+            COMPRESSED_SCRAPE_JOBS_KEY: "not-compressed",
+            "scrape_metadata": json.dumps(SCRAPE_METADATA),
+        },
+    )
+    assert consumer_jobs(consumer_context, relation) == []
+
+
+def test_consumer_resolves_deduplicated_ca(consumer_context):
+    ca = "-----BEGIN CERTIFICATE-----\nfoo\n-----END CERTIFICATE-----"
+    tls_jobs = [
+        {
+            "job_name": f"shard-{i}",
+            "static_configs": [{"targets": [f"foo-{i}:1234"]}],
+            "scheme": "https",
+            "tls_config": {"ca": ca, "server_name": "foo"},
+        }
+        for i in range(3)
+    ]
+    jobs, tls_cas = _extract_tls_cas(tls_jobs)
+    assert len(tls_cas) == 1
+    relation = Relation(
+        "profiling-endpoint",
+        remote_app_data={
+            "scrape_jobs": json.dumps(jobs),
+            TLS_CA_CERTS_KEY: json.dumps(tls_cas),
+            "scrape_metadata": json.dumps(SCRAPE_METADATA),
+        },
+    )
+
+    resolved_jobs = consumer_jobs(consumer_context, relation)
+
+    assert [job["tls_config"] for job in resolved_jobs] == [{"ca": ca, "server_name": "foo"}] * 3
+
+
+def test_extract_tls_cas_does_not_modify_jobs():
+    job = {"static_configs": [], "tls_config": {"ca": "foo"}}
+    _extract_tls_cas([job])
+    assert job == {"static_configs": [], "tls_config": {"ca": "foo"}}
+
+
+def provider_relation(scrape_jobs=SCRAPE_JOBS, **kwargs):
+    return Relation(
+        "profiling-endpoint",
+        remote_app_data={
+            "scrape_jobs": json.dumps(scrape_jobs),
+            "scrape_metadata": json.dumps(SCRAPE_METADATA),
+        },
+        **kwargs,
+    )
+
+
+def run_counting_generations(
+    context, state, callback=lambda charm: charm.profiling_consumer.jobs()
+):
+    """Run callback against the consumer charm, counting how often jobs are generated."""
+    generate = ProfilingEndpointConsumer._static_scrape_config
+    with patch.object(
+        ProfilingEndpointConsumer, "_static_scrape_config", autospec=True, side_effect=generate
+    ) as generate_spy:
+        with context(context.on.update_status(), state) as mgr:
+            result = callback(mgr.charm)
+            state_out = mgr.run()
+    return result, generate_spy.call_count, state_out
+
+
+def test_consumer_generates_jobs_once_per_dispatch(consumer_context):
+    state = State(relations={provider_relation(), provider_relation()})
+
+    def jobs_twice(charm):
+        return charm.profiling_consumer.jobs(), charm.profiling_consumer.jobs()
+
+    (jobs, jobs_again), generations, _ = run_counting_generations(
+        consumer_context, state, jobs_twice
+    )
+
+    assert jobs == jobs_again
+    assert len(jobs) == 2
+    assert generations == 2
+
+
+def test_consumer_returns_copies_of_the_jobs(consumer_context):
+    def modify_jobs(charm):
+        consumer = charm.profiling_consumer
+        consumer.jobs()[0]["static_configs"].append({"targets": ["injected:1234"]})
+        (relation,) = charm.model.relations["profiling-endpoint"]
+        consumer.relation_jobs(relation.id)[0]["static_configs"].clear()
+        next(consumer.iter_jobs())["static_configs"].clear()
+        return consumer.jobs()
+
+    jobs, generations, _ = run_counting_generations(
+        consumer_context, State(relations={provider_relation()}), modify_jobs
+    )
+
+    assert generations == 1
+    assert [sc["targets"] for sc in jobs[0]["static_configs"]] == [["foo:1234"]]
+
+
+def test_consumer_clears_jobs_stored_by_earlier_versions(consumer_context):
+    owner_path = "ConsumerCharm/ProfilingEndpointConsumer[profiling-endpoint]"
+    stored = StoredState(
+        owner_path=owner_path,
+        content={"jobs_cache": {"1": {"digest": "0", "jobs": "[]", "unit_jobs": "{}"}}},
+    )
+    state = State(relations={provider_relation()}, stored_states={stored})
+
+    _, _, state_out = run_counting_generations(consumer_context, state)
+
+    assert state_out.get_stored_state("_stored", owner_path=owner_path).content == {
+        "jobs_cache": {}
+    }
+
+
+def test_consumer_regenerates_jobs_when_units_change(consumer_context):
+    relation = provider_relation(
+        scrape_jobs=[{"static_configs": [{"targets": ["*:7000"]}]}],
+        remote_units_data={0: {"parca_scrape_unit_address": "10.0.0.1"}},
+    )
+    _, _, state_inter = run_counting_generations(consumer_context, State(relations={relation}))
+
+    rescaled = replace(
+        state_inter.get_relation(relation.id),
+        remote_units_data={
+            0: {"parca_scrape_unit_address": "10.0.0.1"},
+            1: {"parca_scrape_unit_address": "10.0.0.2"},
+        },
+    )
+    jobs, generations, _ = run_counting_generations(
+        consumer_context, replace(state_inter, relations={rescaled})
+    )
+
+    assert generations == 1
+    (job,) = jobs
+    assert sorted(sc["targets"][0] for sc in job["static_configs"]) == [
+        "10.0.0.1:7000",
+        "10.0.0.2:7000",
+    ]
+
+
+def test_consumer_relation_jobs(consumer_context):
+    relation, other_relation = provider_relation(), provider_relation(scrape_jobs=[])
+    state = State(relations={relation, other_relation})
+
+    with consumer_context(consumer_context.on.update_status(), state) as mgr:
+        consumer = mgr.charm.profiling_consumer
+        assert consumer.relation_jobs(relation.id) == consumer.jobs()
+        assert consumer.relation_jobs(other_relation.id) == []
+        assert consumer.relation_jobs(1234) == []
+
+
+def test_targets_changed_carries_relation_id(consumer_context):
+    relation = provider_relation()
+    consumer_context.run(
+        consumer_context.on.relation_changed(relation), State(relations={relation})
+    )
+
+    (event,) = [e for e in consumer_context.emitted_events if isinstance(e, TargetsChangedEvent)]
+    assert event.relation_id == relation.id
+
+
+def test_consumer_labels_wildcard_and_unitless_targets(consumer_context):
+    relation = provider_relation(
+        scrape_jobs=[
+            {
+                "static_configs": [
+                    {"targets": ["*:7000", "ext:7000"], "labels": {"tier": "backend"}}
+                ],
+            }
+        ],
+        remote_units_data={
+            0: {"parca_scrape_unit_name": "provider/0", "parca_scrape_unit_address": "10.0.0.1"},
+            1: {"parca_scrape_unit_name": "provider/1", "parca_scrape_unit_address": "10.0.0.2"},
+        },
+    )
+
+    (job,) = consumer_jobs(consumer_context, relation)
+
+    unitless, *unit_configs = job["static_configs"]
+    unit_0, unit_1 = sorted(unit_configs, key=lambda config: config["labels"]["juju_unit"])
+    assert unitless["targets"] == ["ext:7000"]
+    assert "juju_unit" not in unitless["labels"]
+    assert unit_0["targets"] == ["10.0.0.1:7000"]
+    assert unit_0["labels"]["juju_unit"] == "provider/0"
+    assert unit_1["labels"]["juju_unit"] == "provider/1"
+    for static_config in job["static_configs"]:
+        assert static_config["labels"]["tier"] == "backend"
+        assert static_config["labels"]["juju_model"] == "test-model"
+    (relabel_config,) = job["relabel_configs"]
+    assert relabel_config["source_labels"][-1] == "juju_unit"
+
+
+def test_consumer_iter_jobs_yields_jobs_one_relation_at_a_time(consumer_context):
+    relations = {provider_relation(), provider_relation(), provider_relation(scrape_jobs=[])}
+
+    with consumer_context(consumer_context.on.update_status(), State(relations=relations)) as mgr:
+        consumer = mgr.charm.profiling_consumer
+        with patch.object(
+            consumer, "_cached_static_scrape_config", wraps=consumer._cached_static_scrape_config
+        ) as generate_spy:
+            jobs = consumer.iter_jobs()
+            next(jobs)
+            # the relations come in no particular order, so the one without jobs may come first
+            assert generate_spy.call_count <= 2
+            assert len(list(jobs)) == 1
+            assert generate_spy.call_count == 3
+
+
+def test_consumer_write_jobs(consumer_context):
+    relations = {provider_relation(), provider_relation()}
+
+    with consumer_context(consumer_context.on.update_status(), State(relations=relations)) as mgr:
+        consumer = mgr.charm.profiling_consumer
+        config = io.StringIO()
+        config.write("scrape_configs:\n")
+        assert consumer.write_jobs(config) == 2
+        assert yaml.safe_load(config.getvalue()) == {"scrape_configs": consumer.jobs()}
+
+
+def test_consumer_write_jobs_without_jobs(consumer_context):
+    with consumer_context(consumer_context.on.update_status(), State()) as mgr:
+        config = io.StringIO()
+        assert mgr.charm.profiling_consumer.write_jobs(config) == 0
+        assert config.getvalue() == ""
+
+
+def test_consumer_names_and_filters_unit_jobs(consumer_context):
+    unit_jobs = [{"job_name": "shard", "static_configs": [{"targets": ["*:7000", "ext:7000"]}]}]
+    relation = provider_relation(
+        scrape_jobs=[],
+        remote_units_data={
+            unit: {
+                "parca_scrape_unit_name": f"provider/{unit}",
+                "parca_scrape_unit_address": f"10.0.0.{unit + 1}",
+                "scrape_jobs": json.dumps(unit_jobs),
+            }
+            for unit in (0, 1)
+        },
+    )
+
+    with consumer_context(consumer_context.on.update_status(), State(relations={relation})) as mgr:
+        consumer = mgr.charm.profiling_consumer
+        jobs = consumer.jobs()
+        filtered_jobs = consumer.jobs(unit_filter=lambda unit: unit == "provider/1")
+
+    prefix = "test-model_00000000_parca-scrape-target"
+    assert sorted(job["job_name"] for job in jobs) == [
+        f"{prefix}_provider_0_shard",
+        f"{prefix}_provider_1_shard",
+    ]
+    (job,) = filtered_jobs
+    assert job["job_name"] == f"{prefix}_provider_1_shard"
+    # wildcard targets only stand for the unit that published the job
+    assert [sc["targets"] for sc in job["static_configs"]] == [["ext:7000"], ["10.0.0.2:7000"]]
+
+
+def test_consumer_only_adds_unit_targets_for_wildcard_targets(consumer_context):
+    unit_jobs = [
+        {"static_configs": [{"targets": ["ext:7000"]}, {"targets": ["ext2:7000", "*:7000"]}]}
+    ]
+    relation = provider_relation(
+        scrape_jobs=[{"static_configs": [{"targets": ["ext3:7000"]}]}],
+        remote_units_data={
+            0: {
+                "parca_scrape_unit_name": "provider/0",
+                "parca_scrape_unit_address": "10.0.0.1",
+                "scrape_jobs": json.dumps(unit_jobs),
+            },
+        },
+    )
+
+    app_job, unit_job = consumer_jobs(consumer_context, relation)
+
+    assert [sc["targets"] for sc in app_job["static_configs"]] == [["ext3:7000"]]
+    assert "juju_unit" not in app_job["relabel_configs"][-1]["source_labels"]
+    assert [sc["targets"] for sc in unit_job["static_configs"]] == [
+        ["ext:7000"],
+        ["ext2:7000"],
+        ["10.0.0.1:7000"],
+    ]
+    assert unit_job["relabel_configs"][-1]["source_labels"][-1] == "juju_unit"
+
+
+def test_consumer_regenerates_jobs_when_unit_jobs_change(consumer_context):
+    relation = provider_relation(remote_units_data={0: {}})
+    _, _, state_inter = run_counting_generations(consumer_context, State(relations={relation}))
+
+    changed = replace(
+        state_inter.get_relation(relation.id),
+        remote_units_data={0: {"scrape_jobs": json.dumps(SCRAPE_JOBS)}},
+    )
+    jobs, generations, _ = run_counting_generations(
+        consumer_context, replace(state_inter, relations={changed})
+    )
+
+    assert generations == 1
+    assert len(jobs) == 2
@@ -0,0 +1,85 @@
+# Copyright 2025 Canonical.
+# See LICENSE file for licensing details.
+
+import json
+
+import pytest
+from charms.parca_k8s.v0.parca_scrape import (
+    ProviderTopology,
+    _decode_scrape_jobs,
+    _encode_scrape_jobs,
+)
+from ops.testing import Context, State
+from test_parca_scrape import SCRAPE_METADATA, ConsumerCharm
+
+CA_CERT = "-----BEGIN CERTIFICATE-----\n{}\n-----END CERTIFICATE-----".format(
+    "\n".join(["MIIDazCCAlOgAwIBAgIUQ2VydGlmaWNhdGVBdXRob3JpdHlCdW5kbGVGb3JCZW5j"] * 20)
+)
+
+
+def scrape_jobs(count):
+    return json.dumps(
+        [
+            {
+                "static_configs": [
+                    {"targets": [f"host-{i}.example.com:7000" for i in range(count)]}
+                ],
+                "scheme": "https",
+                "tls_config": {"ca": CA_CERT, "insecure_skip_verify": False},
+            }
+        ],
+        sort_keys=True,
+    )
+
+
+@pytest.mark.parametrize("count", (10, 1_000, 10_000))
+def test_encode_scrape_jobs(benchmark, count):
+    plain = scrape_jobs(count)
+
+    encoded = benchmark(_encode_scrape_jobs, plain)
+
+    benchmark.extra_info["plain_bytes"] = len(plain)
+    benchmark.extra_info["encoded_bytes"] = len(encoded)
+    assert len(encoded) < len(plain)
+
+
+@pytest.mark.parametrize("count", (10, 1_000, 10_000))
+def test_decode_scrape_jobs(benchmark, count):
+    plain = scrape_jobs(count)
+    encoded = _encode_scrape_jobs(plain)
+
+    assert benchmark(_decode_scrape_jobs, encoded) == plain
+
+
+def test_relabel_jobs_of_large_provider(benchmark):
+    # a provider with 500 units and 20 static configs, each with wildcard and unitless targets
+    hosts = {f"provider/{i}": f"10.0.{i // 256}.{i % 256}" for i in range(500)}
+    job = {
+        "static_configs": [
+            {
+                "targets": [f"*:{7000 + i}", f"external-{i}.example.com:7000"],
+                "labels": {"static_config": str(i)},
+            }
+            for i in range(20)
+        ],
+        "relabel_configs": [],
+    }
+    context = Context(
+        ConsumerCharm,
+        meta={"name": "parca", "requires": {"profiling-endpoint": {"interface": "parca_scrape"}}},
+    )
+
+    with context(context.on.update_status(), State()) as mgr:
+        consumer = mgr.charm.profiling_consumer
+
+        def relabel():
+            topology = ProviderTopology.from_dict(SCRAPE_METADATA)
+            return consumer._labeled_static_job_config(
+                job, topology.identifier, hosts, topology.label_matcher_dict
+            )
+
+        labeled_job = benchmark(relabel)
+
+    assert len(labeled_job["static_configs"]) == 20 * (500 + 1)
+    # the provider's job is left untouched
+    assert job["relabel_configs"] == []
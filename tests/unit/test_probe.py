@@ -0,0 +1,65 @@
+# Copyright 2025 Canonical.
+# See LICENSE file for licensing details.
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from probe import host_port, probe_reachability
+
+
+@pytest.mark.parametrize(
+    ("target", "scheme", "expected"),
+    (
+        ("foo.com:1234", "http", ("foo.com", 1234)),
+        ("foo.com", "http", ("foo.com", 80)),
+        ("foo.com", "https", ("foo.com", 443)),
+        ("[::1]:1234", "http", ("::1", 1234)),
+        ("[fe80::1%eth0]", "https", ("fe80::1%eth0", 443)),
+    ),
+)
+def test_host_port(target, scheme, expected):
+    assert host_port(target, scheme) == expected
+
+
+def test_probe_reachability(listening_port, closed_port):
+    reachable, unreachable = f"127.0.0.1:{listening_port}", f"127.0.0.1:{closed_port}"
+
+    reachability = probe_reachability([reachable, unreachable], "http", 1.0, 8)
+
+    assert reachability == {reachable: True, unreachable: False}
+
+
+def test_probe_reachability_of_unencodable_hostname():
+    # the labels of the hostname are over 63 characters long once punycode-encoded
+    target = "{}.com:80".format("a\u00e9" * 31)
+
+    assert probe_reachability([target], "http", 1.0, 8) == {target: False}
+
+
+def test_probe_reachability_times_out():
+    async def hang(host, port):
+        await asyncio.sleep(60)
+
+    with patch("asyncio.open_connection", side_effect=hang):
+        assert probe_reachability(["foo.com:1234"], "http", 0.01, 8) == {"foo.com:1234": False}
+
+
+def test_probe_reachability_bounds_concurrency():
+    connecting, max_connecting = 0, 0
+
+    async def connect(host, port):
+        nonlocal connecting, max_connecting
+        connecting += 1
+        max_connecting = max(max_connecting, connecting)
+        await asyncio.sleep(0.001)
+        connecting -= 1
+        raise ConnectionRefusedError()
+
+    targets = [f"host-{i}.example.com:7000" for i in range(100)]
+    with patch("asyncio.open_connection", side_effect=connect):
+        reachability = probe_reachability(targets, "http", 1.0, 8)
+
+    assert reachability == dict.fromkeys(targets, False)
+    assert max_connecting == 8
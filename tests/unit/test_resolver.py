@@ -0,0 +1,63 @@
+# Copyright 2025 Canonical.
+# See LICENSE file for licensing details.
+
+import socket
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from resolver import is_ip_address, resolve_hostnames
+
+
+@pytest.mark.parametrize(
+    ("host", "expected"),
+    (
+        ("foo.com", False),
+        ("localhost", False),
+        ("10.0.0.1", True),
+        ("::1", True),
+        ("fe80::1%eth0", True),
+    ),
+)
+def test_is_ip_address(host, expected):
+    assert is_ip_address(host) is expected
+
+
+def test_resolve_hostnames():
+    def getaddrinfo(hostname, *_, **__):
+        if hostname == "bar.com":
+            raise socket.gaierror("Name or service not known")
+        return [(socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("2001:db8::1", 0, 0, 0))]
+
+    with patch("socket.getaddrinfo", side_effect=getaddrinfo):
+        addresses = resolve_hostnames(["foo.com", "bar.com"], 4)
+
+    assert addresses == {"foo.com": "2001:db8::1", "bar.com": None}
+
+
+def test_resolve_hostnames_bounds_concurrency():
+    lock, resolving, peak = threading.Lock(), [0], [0]
+
+    def getaddrinfo(*_, **__):
+        with lock:
+            resolving[0] += 1
+            peak[0] = max(peak[0], resolving[0])
+        time.sleep(0.01)
+        with lock:
+            resolving[0] -= 1
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.1", 0))]
+
+    with patch("socket.getaddrinfo", side_effect=getaddrinfo):
+        addresses = resolve_hostnames([f"host{i}.com" for i in range(20)], 3)
+
+    assert set(addresses.values()) == {"10.0.0.1"}
+    assert 1 < peak[0] <= 3
+
+
+def test_resolve_hostnames_of_unencodable_hostname():
+    # the labels of the hostname are over 63 characters long once punycode-encoded
+    hostname = "{}.com".format("a\u00e9" * 31)
+
+    assert resolve_hostnames([hostname], 4) == {hostname: None}
@@ -0,0 +1,118 @@
+# Copyright 2025 Canonical.
+# See LICENSE file for licensing details.
+
+import pytest
+
+from sharding import (
+    assign_static_configs,
+    jump_hash,
+    owners,
+    shard_of,
+    shard_static_configs,
+    shard_targets,
+)
+
+TARGETS = [f"host-{i}.example.com:7000" for i in range(1000)]
+
+
+def test_shard_targets_preserves_order_and_targets():
+    sharded = shard_targets(TARGETS, 4)
+
+    assert len(sharded) == 4
+    assert sorted(sum(sharded, [])) == sorted(TARGETS)
+    for shard in sharded:
+        assert shard == sorted(shard, key=TARGETS.index)
+
+
+def test_shard_targets_spreads_targets_evenly():
+    sizes = [len(shard) for shard in shard_targets(TARGETS, 4)]
+    assert all(200 < size < 300 for size in sizes)
+
+
+def test_shard_does_not_depend_on_other_targets():
+    before = {target: shard_of(target, 4) for target in TARGETS}
+    sharded = shard_targets(TARGETS[::3] + ["new.example.com:7000"], 4)
+
+    for shard, targets in enumerate(sharded):
+        for target in targets:
+            assert target == "new.example.com:7000" or before[target] == shard
+
+
+@pytest.mark.parametrize("shards", (1, 2, 7, 10))
+def test_adding_a_shard_only_moves_targets_to_the_new_shard(shards):
+    for target in TARGETS:
+        before, after = shard_of(target, shards), shard_of(target, shards + 1)
+        assert after in (before, shards)
+
+
+def test_jump_hash_single_bucket():
+    assert jump_hash(123456789, 1) == 0
+
+
+def test_shard_static_configs_keeps_labels():
+    static_configs = [
+        {"targets": TARGETS[:500], "labels": {"tier": "backend"}},
+        {"targets": TARGETS[500:]},
+    ]
+    sharded = shard_static_configs(static_configs, 2)
+
+    assert len(sharded) == 2
+    for shard, shard_static_configs_ in enumerate(sharded):
+        backend, other = shard_static_configs_
+        assert backend["labels"] == {"tier": "backend"}
+        assert "labels" not in other
+        for target in backend["targets"] + other["targets"]:
+            assert shard_of(target, 2) == shard
+
+
+MEMBERS = [f"member/{i}" for i in range(5)]
+
+
+def test_owners_spreads_targets_evenly():
+    counts = dict.fromkeys(MEMBERS, 0)
+    for target in TARGETS:
+        (owner,) = owners(target, MEMBERS)
+        counts[owner] += 1
+    assert all(150 < count < 250 for count in counts.values())
+
+
+def test_owners_replicates_targets_to_distinct_members():
+    for target in TARGETS[:100]:
+        replicas = owners(target, MEMBERS, 3)
+        assert len(set(replicas)) == 3
+        assert replicas[0] == owners(target, MEMBERS)[0]
+
+
+def test_only_the_targets_of_a_leaving_member_move():
+    remaining = MEMBERS[:2] + MEMBERS[3:]
+    for target in TARGETS:
+        (before,) = owners(target, MEMBERS)
+        (after,) = owners(target, remaining)
+        assert after == before or before == MEMBERS[2]
+
+
+def test_joining_member_only_takes_over_targets():
+    for target in TARGETS:
+        (before,) = owners(target, MEMBERS)
+        (after,) = owners(target, [*MEMBERS, "member/5"])
+        assert after in (before, "member/5")
+
+
+def test_assign_static_configs_keeps_labels_and_order():
+    static_configs = [
+        {"targets": TARGETS[:500], "labels": {"tier": "backend"}},
+        {"targets": TARGETS[500:]},
+    ]
+    assigned = assign_static_configs(static_configs, MEMBERS[:2], replicas=2)
+
+    for member in MEMBERS[:2]:
+        backend, other = assigned[member]
+        assert backend == {"targets": TARGETS[:500], "labels": {"tier": "backend"}}
+        assert other == {"targets": TARGETS[500:]}
+
+
+def test_assign_static_configs_without_targets_for_a_member():
+    assert assign_static_configs([{"targets": ["foo:1"]}], ["a", "b"]) in (
+        {"a": [{"targets": ["foo:1"]}], "b": []},
+        {"a": [], "b": [{"targets": ["foo:1"]}]},
+    )
@@ -0,0 +1,274 @@
+# Copyright 2025 Canonical.
+# See LICENSE file for licensing details.
+
+import hashlib
+from unittest.mock import patch
+
+import pytest
+
+from targets import (
+    MAX_EXPANDED_TARGETS,
+    MAX_TARGETS,
+    StaticConfigsError,
+    TargetsFileError,
+    TargetValidationError,
+    file_digest,
+    load_target_groups,
+    load_targets_file,
+    merge_static_configs,
+    scan_targets,
+    validate_target_groups,
+)
+
+
+def _validate(raw_targets):
+    """Validate the targets of a single group, without labels."""
+    static_configs = validate_target_groups([({}, [raw_targets])])
+    return [target for static_config in static_configs for target in static_config["targets"]]
+
+
+@pytest.mark.parametrize(
+    ("raw_targets", "expected"),
+    (
+        ("", []),
+        ("foo:1234", ["foo:1234"]),
+        ("foo.com:1232, boo.org:4234", ["foo.com:1232", "boo.org:4234"]),
+        (" 10.0.0.1:80 ,\t10.0.0.2:65535 ", ["10.0.0.1:80", "10.0.0.2:65535"]),
+        ("[::1]:7000,[fe80::1%eth0]:7000", ["[::1]:7000", "[fe80::1%eth0]:7000"]),
+        ("Foo.com:80,bar:0080", ["foo.com:80", "bar:80"]),
+        ("[FE80::A%Eth0]:7000", ["[fe80::a%Eth0]:7000"]),
+        (f"{'a' * 63}.com.:80", [f"{'a' * 63}.com.:80"]),
+    ),
+)
+def test_validate_group_targets(raw_targets, expected):
+    assert _validate(raw_targets) == expected
+
+
+@pytest.mark.parametrize(
+    ("raw_targets", "invalid"),
+    (
+        ("https://foo:1234", ["https://foo:1234"]),
+        ("foo:1234/ahah", ["foo:1234/ahah"]),
+        ("foo:1234?a=b", ["foo:1234?a=b"]),
+        ("foo:65536", ["foo:65536"]),
+        ("foo:123456789,bar:5678", ["foo:123456789"]),
+        ("foo:bar", ["foo:bar"]),
+        ("::1:7000", ["::1:7000"]),
+        ("[:::::]:80", ["[:::::]:80"]),
+        ("[1.2.3.4.5]:80", ["[1.2.3.4.5]:80"]),
+        ("[:]", ["[:]"]),
+        ("[::1::2/64]:80", ["[::1::2/64]:80"]),
+        ("foo:1234,", [""]),
+        ("foo..com:80", ["foo..com:80"]),
+        (".foo.com:80", [".foo.com:80"]),
+        (f"{'a' * 64}.com:80", [f"{'a' * 64}.com:80"]),
+    ),
+)
+def test_validate_group_targets_rejects_invalid_targets(raw_targets, invalid):
+    with pytest.raises(TargetValidationError) as e:
+        _validate(raw_targets)
+    assert e.value.invalid_targets == invalid
+
+
+def test_validate_group_targets_reports_every_invalid_target():
+    with pytest.raises(TargetValidationError) as e:
+        _validate("foo:1, http://bar:2, baz:3, qux:99999, quux:4")
+    assert e.value.invalid_targets == ["http://bar:2", "qux:99999"]
+
+
+def test_validate_group_targets_drops_duplicates_preserving_order():
+    assert _validate("Foo.com:80, bar:1, foo.com:80 , FOO.COM:080, baz:2, bar:1") == [
+        "foo.com:80",
+        "bar:1",
+        "baz:2",
+    ]
+
+
+def test_scan_targets_is_lazy():
+    scanned = scan_targets("foo:1, bar:2, http://baz:3")
+    assert next(scanned) == ("foo:1", "foo:1")
+    assert list(scanned) == [("bar:2", "bar:2"), (None, "http://baz:3")]
+
+
+@pytest.mark.parametrize(
+    ("raw_targets", "expected"),
+    (
+        ("10.0.0.0/30:7000", ["10.0.0.1:7000", "10.0.0.2:7000"]),
+        ("10.0.0.4/31, 10.0.0.9/32", ["10.0.0.4", "10.0.0.5", "10.0.0.9"]),
+        ("Foo.com:7000-7002", ["foo.com:7000", "foo.com:7001", "foo.com:7002"]),
+        (
+            "10.0.0.0/30:7000-7001",
+            ["10.0.0.1:7000", "10.0.0.1:7001", "10.0.0.2:7000", "10.0.0.2:7001"],
+        ),
+        ("[2001:DB8::/127]:7000", ["[2001:db8::]:7000", "[2001:db8::1]:7000"]),
+        ("10.0.0.1:7000, 10.0.0.0/30:7000", ["10.0.0.1:7000", "10.0.0.2:7000"]),
+    ),
+)
+def test_validate_group_targets_expands_ranges(raw_targets, expected):
+    assert _validate(raw_targets) == expected
+
+
+@pytest.mark.parametrize(
+    "raw_targets",
+    (
+        "10.0.0.1/24:7000",  # host bits set
+        "10.0.0.0/33:7000",
+        "foo.com/24:7000",
+        "foo.com:7002-7000",
+        "foo.com:7000-65536",
+        "foo.com:-7000",
+        "[fe80::%eth0/64]:7000",
+        "10.0.0.0/8:7000",  # too many targets
+        f"foo.com:1-{MAX_EXPANDED_TARGETS + 1}",
+    ),
+)
+def test_validate_group_targets_rejects_invalid_ranges(raw_targets):
+    with pytest.raises(TargetValidationError) as e:
+        _validate(raw_targets)
+    assert e.value.invalid_targets == [raw_targets]
+
+
+def test_scan_targets_expands_ranges_lazily():
+    scanned = scan_targets("10.0.0.0/20:7000, 10.0.0.0/30:1-2")
+    assert next(scanned) == ("10.0.0.1:7000", "10.0.0.0/20:7000")
+    assert sum(1 for _ in scanned) == 4093 + 4
+
+
+@pytest.mark.parametrize(
+    "raw_static_configs",
+    (
+        '[{"targets": ["foo:1", "bar:2"], "labels": {"region": "eu"}}, {"targets": "baz:3"}]',
+        """
+        - targets: [foo:1, bar:2]
+          labels:
+            region: eu
+        - targets: baz:3
+        """,
+    ),
+)
+def test_load_target_groups(raw_static_configs):
+    assert load_target_groups(raw_static_configs) == [
+        ({"region": "eu"}, ["foo:1", "bar:2"]),
+        ({}, ["baz:3"]),
+    ]
+
+
+@pytest.mark.parametrize(
+    "raw_static_configs",
+    (
+        "[{",
+        '{"targets": ["foo:1"]}',
+        '[{"labels": {"region": "eu"}}]',
+        '[{"targets": [1234]}]',
+        '[{"targets": ["foo:1"], "labels": {"not-a-label": "eu"}}]',
+    ),
+)
+def test_load_target_groups_rejects_malformed_static_configs(raw_static_configs):
+    with pytest.raises(StaticConfigsError):
+        load_target_groups(raw_static_configs)
+
+
+def test_validate_target_groups():
+    groups = [
+        ({}, ["foo:1, Bar:2"]),
+        ({"tier": "backend"}, ["bar:2", "baz:3"]),
+        ({"tier": "frontend"}, ["foo:1"]),
+    ]
+    assert validate_target_groups(groups) == [
+        {"targets": ["foo:1", "bar:2"]},
+        {"targets": ["baz:3"], "labels": {"tier": "backend"}},
+    ]
+
+
+def test_validate_target_groups_expands_ranges():
+    groups = [({}, ["10.0.0.0/30:7000"]), ({"tier": "backend"}, ["10.0.0.2:7000-7001"])]
+    assert validate_target_groups(groups) == [
+        {"targets": ["10.0.0.1:7000", "10.0.0.2:7000"]},
+        {"targets": ["10.0.0.2:7001"], "labels": {"tier": "backend"}},
+    ]
+
+
+def test_validate_target_groups_reports_every_invalid_target():
+    groups = [({}, ["foo:1, http://bar:2"]), ({"tier": "backend"}, ["baz:3", "qux:99999"])]
+    with pytest.raises(TargetValidationError) as e:
+        validate_target_groups(groups)
+    assert e.value.invalid_targets == ["http://bar:2", "qux:99999"]
+
+
+def test_validate_target_groups_caps_total_targets():
+    groups = [({}, ["foo:1, bar:2"]), ({"tier": "backend"}, ["10.0.0.0/30:7000, http://baz:3"])]
+
+    with pytest.raises(TargetValidationError) as e:
+        validate_target_groups(groups, max_targets=3)
+
+    # validation stops at the entry that exceeds the cap
+    assert e.value.invalid_targets == ["10.0.0.0/30:7000"]
+    assert validate_target_groups(groups[:1], max_targets=2) == [{"targets": ["foo:1", "bar:2"]}]
+
+
+def test_validate_target_groups_caps_total_expanded_targets():
+    # each network expands to fewer than `MAX_EXPANDED_TARGETS` targets, but not all together
+    networks = [f"10.{i}.0.0/20:7000" for i in range(MAX_TARGETS // MAX_EXPANDED_TARGETS + 1)]
+
+    with pytest.raises(TargetValidationError) as e:
+        validate_target_groups([({}, networks)])
+
+    assert e.value.invalid_targets == networks[-1:]
+
+
+def test_merge_static_configs():
+    groups = [
+        ({}, ["foo:1, Bar:2"]),
+        ({"tier": "backend"}, ["bar:2", "baz:3"]),
+        ({"tier": "frontend"}, ["foo:1"]),
+    ]
+    static_configs = validate_target_groups(groups[:1])
+    other_static_configs = validate_target_groups(groups[1:])
+
+    assert merge_static_configs(static_configs, other_static_configs) == (
+        validate_target_groups(groups)
+    )
+
+
+TARGETS_FILE = """\
+# comments and blank lines are ignored
+foo.com:1234
+
+boo.org:4234 region=eu tier=backend  # trailing comments too
+[::1]:7000
+bar.net:80 tier=backend region=eu
+"""
+
+
+@pytest.mark.parametrize("mmap_threshold", (1024 * 1024, 0))
+def test_load_targets_file(tmp_path, mmap_threshold):
+    path = tmp_path / "targets.txt"
+    path.write_text(TARGETS_FILE)
+
+    with patch("targets.MMAP_THRESHOLD", mmap_threshold):
+        groups = load_targets_file(str(path))
+
+    assert groups == [
+        ({}, ["foo.com:1234", "[::1]:7000"]),
+        ({"region": "eu", "tier": "backend"}, ["boo.org:4234", "bar.net:80"]),
+    ]
+
+
+@pytest.mark.parametrize("content", (b"foo.com:1234 region\n", b"foo.com:1234 1=a\n", b"\xff\n"))
+def test_load_targets_file_rejects_malformed_files(tmp_path, content):
+    path = tmp_path / "targets.txt"
+    path.write_bytes(content)
+
+    with pytest.raises(TargetsFileError):
+        load_targets_file(str(path))
+
+
+@pytest.mark.parametrize("mmap_threshold", (1024 * 1024, 0))
+def test_file_digest(tmp_path, mmap_threshold):
+    path = tmp_path / "targets.txt"
+    path.write_text(TARGETS_FILE)
+
+    with patch("targets.MMAP_THRESHOLD", mmap_threshold):
+        digest = file_digest(str(path))
+
+    assert digest == hashlib.sha256(TARGETS_FILE.encode()).hexdigest()
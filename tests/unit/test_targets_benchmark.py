@@ -0,0 +1,18 @@
+# Copyright 2025 Canonical.
+# See LICENSE file for licensing details.
+
+import pytest
+
+from targets import validate_target_groups
+
+
+@pytest.mark.parametrize("count", (10, 1_000, 10_000, 100_000))
+def test_validate_target_groups_throughput(benchmark, count):
+    raw_targets = ", ".join(f"host-{i}.example.com:{1024 + i % 60000}" for i in range(count))
+
+    # the throughput of validation is measured beyond the cap on the number of targets
+    static_configs = benchmark(validate_target_groups, [({}, [raw_targets])], max_targets=count)
+
+    assert len(static_configs[0]["targets"]) == count
+    if benchmark.stats:  # not collected when running with --benchmark-disable
+        benchmark.extra_info["targets_per_second"] = count / benchmark.stats.stats.mean